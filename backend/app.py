@@ -1,12 +1,57 @@
 # Corrected File: app.py (Completed endpoints, added missing ones if any, ensured CORS)
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, ValidationError
+from collections import OrderedDict
+import asyncio
+import base64
+import hashlib
 import json
+import os
+from contextlib import contextmanager
+import sqlite3
+import struct
+import threading
+import time
+import numpy as np
+import orjson
 from graph_logic import *
-from typing import List, Dict, Any, Optional
+from graph_store import DEFAULT_GRAPH, EMPTY_GRAPH, GraphNotFound, GraphStore, VersionConflict
+from worker_pool import ClientDisconnected, DeadlineExceeded, ExecutionLayer, JobCancelled, Overloaded, SliceScheduler, cancellable
+from typing import List, Dict, Any, Optional, Literal, Tuple, Union
 
-app = FastAPI()
+# orjson writes inf and nan as null, which is what the frontend expects for
+# unreachable distances, so results need no sanitizing copy before encoding
+JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def json_default(value: Any) -> Any:
+    # Called by orjson for values it has no encoding for
+    if isinstance(value, (ListView, JournalView, CircuitView)):
+        return value.value()
+    if isinstance(value, StepTrace):
+        return list(value)
+    if isinstance(value, AlgorithmStep):
+        return {"event": value.event, "args": value.args, **value.fields}
+    if isinstance(value, np.ndarray):  # non-contiguous or unsupported dtype
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, AlgorithmResult):
+        return value.__dict__
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def encode_body(data: Any) -> bytes:
+    """UTF-8 JSON for a response body, written in a single pass over data."""
+    return orjson.dumps(data, default=json_default, option=JSON_OPTIONS)
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return encode_body(content)
+
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # CORS for frontend
 app.add_middleware(
@@ -17,184 +62,867 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def sanitize_for_json(obj):
-    """Convert inf/nan values to None for JSON serialization"""
-    if hasattr(obj, '__dict__'):
-        # Handle custom objects like AlgorithmResult, AlgorithmStep
-        return sanitize_for_json(obj.__dict__)
-    elif isinstance(obj, dict):
-        return {k: sanitize_for_json(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [sanitize_for_json(item) for item in obj]
-    elif isinstance(obj, float):
-        if obj == float('inf') or obj == float('-inf') or obj != obj:  # nan check
-            return None
-        return obj
-    return obj
-
-
 class GraphInput(BaseModel):
     nodes: List[Dict[str, Any]]
     links: List[Dict[str, Any]]
     isDirected: bool
 
-class AlgoInput(BaseModel):
+# 'server' renders log text, 'client' returns event codes + labels + templates, 'none' skips logs
+LogMode = Literal['server', 'client', 'none']
+
+class RunOptions(BaseModel):
+    # Give up (504) after this long instead of REQUEST_TIMEOUT_S, which is also the cap
+    timeoutMs: Optional[int] = Field(None, ge=1)
+
+class StepOptions(RunOptions):
+    logs: LogMode = 'server'
+    # 'full': every step (default). 'summary': one step per phase (BFS level,
+    # settled vertex, Bellman-Ford round, ...). 'none': no steps at all, the
+    # algorithm runs without any step bookkeeping and only the result is returned.
+    trace: Literal['none', 'summary', 'full'] = 'full'
+    # 'full': every step is a complete snapshot (default).
+    # 'delta': steps[i] is {"keyframe": true, "state": {...}} every keyframeInterval
+    # steps and otherwise only what changed since steps[i-1]:
+    #   {"unset": [path], "shift": {path: n}, "truncate": {path: n},
+    #    "append": {path: [items]}, "patch": {path: {key: value}}, "set": {path: value}}
+    # applied in that order ("bipartiteSets.setA" style paths address dict members).
+    # The response then also carries traceFormat and keyframeInterval; see
+    # TraceEncoder / decode_trace in graph_logic.py.
+    traceFormat: Literal['full', 'delta'] = 'full'
+    keyframeInterval: int = Field(50, ge=1)
+
+class TraceOptions(StepOptions):
+    # Stream steps as they are produced instead of returning one JSON body
+    stream: Optional[Literal['ndjson', 'sse']] = None
+
+class AlgoInput(TraceOptions):
     graph: GraphInput
     startId: Optional[str] = None
     endId: Optional[str] = None
 
+class GraphAlgoInput(GraphInput, TraceOptions):
+    pass
+
+class FlowInput(AlgoInput):
+    # Shortest augmenting paths (Edmonds-Karp) or level graph + blocking flow (Dinic)
+    mode: Literal['edmondsKarp', 'dinic'] = 'edmondsKarp'
+
+class DijkstraInput(AlgoInput):
+    # 'bidirectional' searches from startId and endId at once and stops where they meet
+    mode: Literal['classic', 'bidirectional'] = 'classic'
+    # Several targets (or 'all') answered from one run; the response adds paths: {id: path}
+    endIds: Optional[Union[List[str], Literal['all']]] = None
+    # Priority queue of the classic mode; 'radix' needs positive integer weights
+    heap: Literal['binary', 'radix'] = 'binary'
+
+class BellmanFordInput(AlgoInput):
+    # 'rounds' relaxes every edge per round (textbook view); 'spfa' only follows changed vertices
+    mode: Literal['rounds', 'spfa'] = 'rounds'
+
+class AllPairsInput(GraphInput, RunOptions):
+    # 'auto' picks Floyd-Warshall for dense graphs and per-source Dijkstra otherwise
+    method: Literal['auto', 'floydWarshall', 'dijkstra', 'johnson'] = 'auto'
+    # As in /toMatrix: 'base64' inlines distances as {dtype, data} (row-major float64,
+    # inf where there is no path); 'binary' answers with pack_matrix bytes
+    encoding: Literal['json', 'base64', 'binary'] = 'json'
+
+class FleuryInput(GraphAlgoInput):
+    # 'classic' follows Fleury's bridge rule; 'fast' finds an Euler path in linear time
+    mode: Literal['classic', 'fast'] = 'classic'
+
+class BipartiteInput(GraphAlgoInput):
+    # 'stream' answers from one union-find pass over the links (adds componentCount
+    # and conflictEdge) instead of a BFS over the adjacency
+    mode: Literal['bfs', 'stream'] = 'bfs'
+
+class BatchJob(StepOptions):
+    algorithm: str  # endpoint name, e.g. 'dijkstra' or 'bellmanFord'
+    startId: Optional[str] = None
+    endId: Optional[str] = None
+    endIds: Optional[Union[List[str], Literal['all']]] = None  # dijkstra only
+    heap: Literal['binary', 'radix'] = 'binary'  # dijkstra only
+    mode: Optional[str] = None
+
+class BatchInput(GraphInput):
+    jobs: List[BatchJob] = Field(..., min_length=1)
+
+def graph_to_dict(graph: GraphData) -> Dict[str, Any]:
+    return {"nodes": graph.nodes, "links": graph.links, "isDirected": graph.isDirected}
+
+class ResultCache:
+    """LRU cache of serialized algorithm responses, bounded by total body size."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            body = self.entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+            }
+
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+result_cache = ResultCache(RESULT_CACHE_MAX_BYTES)
+
+def cache_key(algorithm: str, options: BaseModel) -> str:
+    """Hash of the algorithm name and every request field that shapes the response.
+
+    The graph, startId/endId, trace level and log/trace format options all come
+    from the request model; only the transport options (stream, timeoutMs) are left out.
+    """
+    canonical = json.dumps(
+        {"algorithm": algorithm, "input": options.model_dump(exclude={"stream", "timeoutMs"})},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+# Jobs run through the execution layer: light ones on threads, heavy ones in
+# worker processes. Both lanes are bounded; overflow is answered with a 503.
+WORKER_PROCESSES = int(os.environ.get("WORKER_PROCESSES", min(4, max(0, (os.cpu_count() or 1) - 1))))
+WORKER_THREADS = int(os.environ.get("WORKER_THREADS", 4))
+WORKER_QUEUE_DEPTH = int(os.environ.get("WORKER_QUEUE_DEPTH", 16))
+REQUEST_TIMEOUT_S = float(os.environ.get("REQUEST_TIMEOUT_S", 30))
+execution = ExecutionLayer(WORKER_PROCESSES, WORKER_THREADS, WORKER_QUEUE_DEPTH)
+
+# 'pool' runs algorithms on the execution layer. 'cooperative' advances their step
+# generators (algorithm endpoints, streams, /batch and /allPairs) in SLICE_MS time
+# slices on the event loop itself, for single-core hosts (see render.yaml); a run
+# whose budget (its timeout) is spent answers with a 504, as in the pool, or ends
+# its stream with an error event.
+SCHEDULER = os.environ.get("SCHEDULER", "pool")
+SLICE_MS = float(os.environ.get("SLICE_MS", 5))
+scheduler = SliceScheduler(SLICE_MS / 1000, WORKER_THREADS + WORKER_QUEUE_DEPTH)
+
+def request_timeout(options: RunOptions) -> float:
+    return min(options.timeoutMs / 1000, REQUEST_TIMEOUT_S) if options.timeoutMs else REQUEST_TIMEOUT_S
+
+@contextmanager
+def execution_errors(timeout: float):
+    try:
+        yield
+    except Overloaded:
+        raise HTTPException(status_code=503, detail="Máy chủ đang quá tải, vui lòng thử lại sau", headers={"Retry-After": "1"})
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail=f"Quá thời gian xử lý ({timeout:g}s)")
+    except ClientDisconnected:
+        raise HTTPException(status_code=499, detail="Client closed request")
+
+async def execute(request: Request, options: RunOptions, heavy: bool, fn, *args) -> Any:
+    """fn(*args) on the execution layer, within the request's deadline; the job is
+    cancelled if the client goes away first."""
+    timeout = request_timeout(options)
+    with execution_errors(timeout):
+        return await execution.run(fn, args, heavy=heavy, timeout=timeout, is_disconnected=request.is_disconnected)
+
+async def run_sliced(request: Request, job: BatchJob, steps) -> AlgorithmResult:
+    """Drains steps on the slice scheduler; a 504 once the budget runs out."""
+    budget = request_timeout(job)
+    with execution_errors(budget):
+        finished, result, collected = await scheduler.run(steps, budget, request.is_disconnected, StepTrace())
+        if not finished:
+            raise DeadlineExceeded(budget)
+    result.steps = collected
+    return result
+
+async def cached_response(algorithm: str, options: BaseModel, request: Request, heavy: bool, fn, *args,
+                          media_type: str = "application/json") -> Response:
+    """Response for fn(*args), a job returning the encoded body; served from result_cache when possible."""
+    key = cache_key(algorithm, options)
+    body = result_cache.get(key)
+    if body is None:
+        body = await execute(request, options, heavy, fn, *args)
+        result_cache.put(key, body)
+        status = "MISS"
+    else:
+        status = "HIT"
+    return Response(content=body, media_type=media_type, headers={"X-Cache": status})
+
+# Rough operation counts (n nodes, m links); runs above PROCESS_WORK_THRESHOLD go to worker processes
+WORK_ESTIMATES = {
+    "bellmanFord": lambda n, m, mode: n * m,
+    "fordFulkerson": lambda n, m, mode: n * m,
+    "fleury": lambda n, m, mode: m if mode == 'fast' else m * m,
+    "allPairs": lambda n, m, mode: n * n * n if mode == 'floydWarshall' else n * (n + m),
+}
+PROCESS_WORK_THRESHOLD = 5_000_000
+
+def is_heavy(algorithm: str, graph: GraphInput, mode: Optional[str] = None, trace: str = 'none') -> bool:
+    n, m = len(graph.nodes), len(graph.links)
+    work = WORK_ESTIMATES.get(algorithm, lambda n, m, mode: n + m)(n, m, mode)
+    if trace == 'full':
+        work += n * (n + m)  # one state snapshot per step
+    return work >= PROCESS_WORK_THRESHOLD
+
+JOB_FIELDS = {"startId", "endId", "endIds", "heap", "mode", "trace", "logs", "traceFormat", "keyframeInterval"}
+
+def result_body(result: AlgorithmResult, job: BatchJob) -> Dict[str, Any]:
+    # Views stay in the steps; encode_body resolves each one as it writes it
+    return result_to_dict(result, job.logs, job.traceFormat, job.keyframeInterval, plain=False)
+
+def run_algorithm_job(algorithm: str, graph: Dict[str, Any], job: Dict[str, Any], cancel=None) -> bytes:
+    """Encoded response body of one algorithm run; the job function behind every algorithm endpoint."""
+    graph = GraphData(graph["nodes"], graph["links"], graph["isDirected"])
+    job = BatchJob.model_validate(job)
+    result = collect_steps(cancellable(ALGORITHMS[algorithm][0](graph, job), cancel))
+    return encode_body(result_body(result, job))
+
+async def sliced_response(algorithm: str, graph: GraphInput, job: BatchJob, options: TraceOptions, request: Request) -> Response:
+    """cached_response for SCHEDULER = 'cooperative'."""
+    key = cache_key(algorithm, options)
+    body = result_cache.get(key)
+    if body is not None:
+        return Response(content=body, media_type="application/json", headers={"X-Cache": "HIT"})
+    graph_data = GraphData(graph.nodes, graph.links, graph.isDirected)
+    result = await run_sliced(request, job, ALGORITHMS[algorithm][0](graph_data, job))
+    body = await run_in_threadpool(lambda: encode_body(result_body(result, job)))
+    result_cache.put(key, body)
+    return Response(content=body, media_type="application/json", headers={"X-Cache": "MISS"})
+
+async def algorithm_response(algorithm: str, graph: GraphInput, options: TraceOptions, request: Request) -> Response:
+    job = BatchJob(algorithm=algorithm, **options.model_dump(include=JOB_FIELDS | {"timeoutMs"}))
+    try:
+        if options.stream:
+            graph_data = GraphData(graph.nodes, graph.links, graph.isDirected)
+            return await stream_response(request, graph_data, ALGORITHMS[algorithm][0](graph_data, job), options)
+        if SCHEDULER == 'cooperative':
+            return await sliced_response(algorithm, graph, job, options, request)
+        # On a cache hit the algorithm never runs
+        return await cached_response(algorithm, options, request, is_heavy(algorithm, graph, job.mode, job.trace),
+                                     run_algorithm_job, algorithm, graph_to_dict(graph), job.model_dump())
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+STREAM_CHUNK_BYTES = 64 * 1024
+
+def trace_events(graph: GraphData, steps, options: TraceOptions, stop: Optional[threading.Event] = None, ticks: bool = False):
+    # A generator, so the graph is compiled by the first next() on a worker thread,
+    # or in slices when ticks are passed through for the slice scheduler
+    cg = (yield from iter_compile_graph(graph)) if ticks else compile_graph(graph)
+    yield from iter_trace_events(cancellable(steps, stop), cg.labels, options.logs, options.traceFormat,
+                                 options.keyframeInterval, plain=False, ticks=ticks)
+
+def encode_event(kind: str, data: Any, stream: str) -> bytes:
+    if stream == 'sse':
+        return b"event: " + kind.encode() + b"\ndata: " + encode_body(data) + b"\n\n"
+    return encode_body({"type": kind, "data": data}) + b"\n"
+
+def next_event(events, cancel=None):
+    return next(events)
+
+def next_chunk(events, encode) -> Tuple[bytes, bool]:
+    """Encoded events up to STREAM_CHUNK_BYTES, and whether the stream is over."""
+    buffer = []
+    size = 0
+    for kind, data in events:
+        chunk = encode(kind, data)
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= STREAM_CHUNK_BYTES:
+            return b"".join(buffer), False
+    return b"".join(buffer), True
+
+async def stream_response(request: Request, graph: GraphData, steps, options: TraceOptions) -> StreamingResponse:
+    """Streams steps while the algorithm runs.
+
+    ndjson: one {"type": "step" | "result" | "error", "data": ...} object per line.
+    sse: "event: step|result|error" with the same data as JSON. The whole stream
+    shares the request's deadline; past it the run stops and the stream ends
+    with an error event.
+    """
+    if SCHEDULER == 'cooperative':
+        return await sliced_stream_response(graph, steps, options)
+    timeout = request_timeout(options)
+    deadline = time.monotonic() + timeout
+    stop = threading.Event()
+    events = trace_events(graph, steps, options, stop)
+    # Run up to the first step on the execution layer, within the deadline, so
+    # invalid input still gets a 400 instead of a broken stream. With trace
+    # 'none' that is the whole run.
+    try:
+        first = await execute(request, options, False, next_event, events)
+    except BaseException:
+        stop.set()
+        raise
+
+    def encode(kind, data):
+        return encode_event(kind, data, options.stream)
+
+    async def body():
+        # Each chunk is produced on the threadpool. stop ends the run at its next
+        # step or tick: at the deadline, or when Starlette cancels this body
+        # because the client has gone away
+        timer = asyncio.get_running_loop().call_later(max(0.0, deadline - time.monotonic()), stop.set)
+        try:
+            yield encode(*first)
+            done = False
+            while not done:
+                try:
+                    chunk, done = await run_in_threadpool(next_chunk, events, encode)
+                except JobCancelled:
+                    chunk, done = encode("error", {"detail": f"Quá thời gian xử lý ({timeout:g}s)"}), True
+                except Exception as e:
+                    chunk, done = encode("error", {"detail": str(e)}), True
+                if chunk:
+                    yield chunk
+        finally:
+            timer.cancel()
+            stop.set()
+
+    return streaming(body(), options)
+
+def streaming(body, options: TraceOptions) -> StreamingResponse:
+    media_type = "text/event-stream" if options.stream == 'sse' else "application/x-ndjson"
+    return StreamingResponse(body, media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+class StreamSink:
+    """Collector for SliceScheduler.run that encodes each event as the run produces
+    it and queues the bytes for the response body; None marks the end of the run."""
+
+    def __init__(self, stream: str):
+        self.stream = stream
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+    def append(self, event: Tuple[str, Any]):
+        self.queue.put_nowait(encode_event(*event, self.stream))
+
+    def close(self, _run=None):
+        self.queue.put_nowait(None)
+
+async def sliced_stream_response(graph: GraphData, steps, options: TraceOptions) -> StreamingResponse:
+    """stream_response for SCHEDULER = 'cooperative': the run advances in slices on
+    the loop and its events are sent between slices."""
+    timeout = request_timeout(options)
+    sink = StreamSink(options.stream)
+    run = asyncio.ensure_future(scheduler.run(trace_events(graph, steps, options, ticks=True), timeout, None, sink))
+    run.add_done_callback(sink.close)
+    # Wait for the first event, so invalid input still gets a 400
+    first = await sink.queue.get()
+    if first is None:
+        with execution_errors(timeout):
+            if not run.result()[0]:
+                raise DeadlineExceeded(timeout)
+
+    async def body():
+        try:
+            chunk, ended = first, False
+            while not ended:
+                # Everything queued so far, up to STREAM_CHUNK_BYTES, goes out in one write
+                buffer, size = [chunk], len(chunk)
+                while size < STREAM_CHUNK_BYTES and not sink.queue.empty():
+                    chunk = sink.queue.get_nowait()
+                    if chunk is None:
+                        ended = True
+                        break
+                    buffer.append(chunk)
+                    size += len(chunk)
+                yield b"".join(buffer)
+                if not ended:
+                    chunk = await sink.queue.get()
+                    ended = chunk is None
+            try:
+                finished = run.result()[0]
+            except Exception as e:
+                yield encode_event("error", {"detail": str(e)}, options.stream)
+            else:
+                if not finished:
+                    yield encode_event("error", {"detail": f"Quá thời gian xử lý ({timeout:g}s)"}, options.stream)
+        finally:
+            # A client that went away cancels the body; scheduler.run then drops the run
+            run.cancel()
+
+    return streaming(body(), options)
+
+# Step generators by endpoint name: (factory(graph, job), needs startId, needs endId).
+# job is anything with startId, endId, endIds, mode and trace, such as a BatchJob.
+ALGORITHMS = {
+    "bfs": (lambda g, j: iter_bfs(g, j.startId, trace=j.trace), True, False),
+    "dfs": (lambda g, j: iter_dfs(g, j.startId, trace=j.trace), True, False),
+    "dijkstra": (lambda g, j: iter_dijkstra(g, j.startId, j.endId, j.mode or 'classic', trace=j.trace, end_ids=j.endIds, heap=j.heap), True, True),
+    "astar": (lambda g, j: iter_astar(g, j.startId, j.endId, trace=j.trace), True, True),
+    "bellmanFord": (lambda g, j: iter_bellman_ford(g, j.startId, j.endId, j.mode or 'rounds', trace=j.trace), True, True),
+    "prim": (lambda g, j: iter_prim(g, trace=j.trace), False, False),
+    "kruskal": (lambda g, j: iter_kruskal(g, trace=j.trace), False, False),
+    "boruvka": (lambda g, j: iter_boruvka(g, trace=j.trace), False, False),
+    "fordFulkerson": (lambda g, j: iter_ford_fulkerson(g, j.startId, j.endId, j.mode or 'edmondsKarp', trace=j.trace), True, True),
+    "fleury": (lambda g, j: iter_fleury(g, j.mode or 'classic', trace=j.trace), False, False),
+    "hierholzer": (lambda g, j: iter_hierholzer(g, trace=j.trace), False, False),
+    "bipartite": (lambda g, j: iter_bipartite(g, j.mode or 'bfs', trace=j.trace), False, False),
+}
+
+def batch_steps(graph: GraphData, job: BatchJob):
+    if job.algorithm not in ALGORITHMS:
+        raise ValueError(f"Không hỗ trợ thuật toán {job.algorithm}")
+    factory, needs_start, needs_end = ALGORITHMS[job.algorithm]
+    if needs_start and not job.startId:
+        raise ValueError("Vui lòng chọn đỉnh bắt đầu")
+    if needs_end and not job.endId and not (job.algorithm == "dijkstra" and job.endIds):
+        raise ValueError("Vui lòng chọn đỉnh kết thúc")
+    return factory(graph, job)
+
+def batch_entry(job: BatchJob, started: float, result: Optional[AlgorithmResult] = None, error: Optional[str] = None) -> Dict[str, Any]:
+    entry = {"algorithm": job.algorithm}
+    if result is not None:
+        entry["status"] = "ok"
+        entry["stepCount"] = len(result.steps)
+        entry["result"] = result_body(result, job)
+    else:
+        entry["status"] = "error"
+        entry["detail"] = error
+        entry["stepCount"] = 0
+    entry["wallTimeMs"] = round((time.perf_counter() - started) * 1000, 3)
+    return entry
+
+def run_batch_job(graph: Union[GraphData, Dict[str, Any]], job: Dict[str, Any], cancel=None) -> Dict[str, Any]:
+    started = time.perf_counter()
+    if isinstance(graph, dict):  # sent to a worker process as plain data
+        graph = GraphData(graph["nodes"], graph["links"], graph["isDirected"])
+    job = BatchJob.model_validate(job)
+    try:
+        return batch_entry(job, started, collect_steps(cancellable(batch_steps(graph, job), cancel)))
+    except Exception as e:
+        return batch_entry(job, started, error=str(e))
+
+async def run_batch_job_sliced(request: Request, graph: GraphData, job: BatchJob) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        return batch_entry(job, started, await run_sliced(request, job, batch_steps(graph, job)))
+    except HTTPException as e:
+        return batch_entry(job, started, error=e.detail)
+    except Exception as e:
+        return batch_entry(job, started, error=str(e))
+
+class MatrixInput(GraphInput):
+    # 'dense' is the 0/1 matrix; 'coo' and 'csr' are weighted and built in O(E)
+    format: Literal['dense', 'coo', 'csr'] = 'dense'
+    # 'base64' inlines each array as {dtype, data}; 'binary' answers with pack_matrix bytes
+    encoding: Literal['json', 'base64', 'binary'] = 'json'
+
+def _little_endian(array: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+
+def matrix_payload(matrix: Dict[str, Any], encoding: str) -> Dict[str, Any]:
+    # JSON body for a matrix from to_sparse_matrix: arrays as base64, or left for
+    # encode_body to write as lists straight from their buffers
+    if encoding != 'base64':
+        return matrix
+    payload = {}
+    for key, value in matrix.items():
+        if isinstance(value, np.ndarray):
+            value = _little_endian(value)
+            value = {"dtype": value.dtype.str, "data": base64.b64encode(value.tobytes()).decode('ascii')}
+        payload[key] = value
+    return payload
+
+def pack_matrix(matrix: Dict[str, Any]) -> bytes:
+    """Single-buffer form of a matrix for application/octet-stream responses.
+
+    Layout: a little-endian uint32 header length, a UTF-8 JSON header, then the
+    raw little-endian arrays, each starting at a multiple of 8 bytes. The header
+    holds the non-array fields plus arrays: {name: {dtype, shape, offset}} with
+    offsets counted from the start of the buffer.
+    """
+    fields = {key: value for key, value in matrix.items() if not isinstance(value, np.ndarray)}
+    arrays = {key: _little_endian(value) for key, value in matrix.items() if isinstance(value, np.ndarray)}
+    # Offsets depend on the header length, so lay the arrays out relative to a
+    # header slot and grow the slot until the header fits
+    slot = 256
+    while True:
+        offset, layout = slot, {}
+        for key, array in arrays.items():
+            layout[key] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset += -(-array.nbytes // 8) * 8
+        header = json.dumps({**fields, "arrays": layout}, ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+        if 4 + len(header) <= slot:
+            break
+        slot = -(-(4 + len(header)) // 8) * 8
+    buffer = bytearray(offset)
+    buffer[:4] = struct.pack('<I', len(header))
+    buffer[4:4 + len(header)] = header
+    buffer[4 + len(header):slot] = b' ' * (slot - 4 - len(header))
+    for key, array in arrays.items():
+        start = layout[key]["offset"]
+        buffer[start:start + array.nbytes] = array.tobytes()
+    return bytes(buffer)
+
 class ConvertInput(BaseModel):
     data: Any
     isDirected: bool
     typeFrom: str  # 'matrix', 'adjList', 'edgeList'
     labels: Optional[List[str]] = None
 
-@app.post("/save")
-async def save_graph(input: GraphInput):
+GRAPH_STORE_PATH = os.environ.get("GRAPH_STORE_PATH", "graphs.db")
+# graph.json from before the store existed becomes version 1 of the default graph
+graph_store = GraphStore(GRAPH_STORE_PATH, legacy_path='graph.json')
+
+class GraphDelta(BaseModel):
+    addNodes: List[Dict[str, Any]] = []
+    updateNodes: List[Dict[str, Any]] = []
+    removeNodes: List[str] = []
+    addLinks: List[Dict[str, Any]] = []
+    updateLinks: List[Dict[str, Any]] = []
+    removeLinks: List[Dict[str, Any]] = []
+    isDirected: Optional[bool] = None
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if header is None:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+async def store_write(write, *args) -> Response:
     try:
-        with open('graph.json', 'w') as f:
-            json.dump(input.dict(), f, indent=4)
-        return {"status": "Graph saved successfully"}
-    except Exception as e:
+        version, etag = await run_in_threadpool(write, *args)
+    except GraphNotFound as e:
+        raise HTTPException(status_code=404, detail=f"Không tìm thấy đồ thị {e.args[0]}")
+    except VersionConflict as e:
+        raise HTTPException(status_code=412, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except sqlite3.Error as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return FastJSONResponse({"status": "Graph saved successfully", "name": args[0], "version": version},
+                            headers={"ETag": etag})
 
-@app.get("/load")
-async def load_graph():
+async def store_read(name: str, if_none_match: Optional[str], missing_ok: bool) -> Response:
     try:
-        with open('graph.json', 'r') as f:
-            data = json.load(f)
-        return data
-    except FileNotFoundError:
-        return {"nodes": [], "links": [], "isDirected": False}
-    except Exception as e:
+        etag = await run_in_threadpool(graph_store.current_etag, name)
+        if etag is not None and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        etag, body = await run_in_threadpool(graph_store.load, name)
+    except GraphNotFound:
+        if missing_ok:
+            return FastJSONResponse(EMPTY_GRAPH)
+        raise HTTPException(status_code=404, detail=f"Không tìm thấy đồ thị {name}")
+    except sqlite3.Error as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+@app.post("/save")
+async def save_graph(input: GraphInput, name: str = DEFAULT_GRAPH, if_match: Optional[str] = Header(None)):
+    return await store_write(graph_store.save, name, input.model_dump(), if_match)
+
+@app.get("/load")
+async def load_graph(name: str = DEFAULT_GRAPH, if_none_match: Optional[str] = Header(None)):
+    # A graph that was never saved loads as an empty one, as graph.json did
+    return await store_read(name, if_none_match, missing_ok=True)
+
+@app.get("/graphs")
+async def list_graphs():
+    return FastJSONResponse(await run_in_threadpool(graph_store.list))
+
+@app.get("/graphs/{name}")
+async def get_graph(name: str, if_none_match: Optional[str] = Header(None)):
+    return await store_read(name, if_none_match, missing_ok=False)
+
+@app.put("/graphs/{name}")
+async def put_graph(name: str, input: GraphInput, if_match: Optional[str] = Header(None)):
+    return await store_write(graph_store.save, name, input.model_dump(), if_match)
+
+@app.patch("/graphs/{name}")
+async def patch_graph(name: str, delta: GraphDelta, if_match: Optional[str] = Header(None)):
+    return await store_write(graph_store.patch, name, delta.model_dump(), if_match)
 
 @app.post("/bfs")
-async def api_bfs(input: AlgoInput):
-    graph = GraphData(input.graph.nodes, input.graph.links, input.graph.isDirected)
+async def api_bfs(input: AlgoInput, request: Request):
     if not input.startId:
         raise HTTPException(status_code=400, detail="Vui lòng chọn đỉnh bắt đầu")
-    try:
-        return run_bfs(graph, input.startId).__dict__
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    return await algorithm_response("bfs", input.graph, input, request)
 
 @app.post("/dfs")
-async def api_dfs(input: AlgoInput):
-    graph = GraphData(input.graph.nodes, input.graph.links, input.graph.isDirected)
+async def api_dfs(input: AlgoInput, request: Request):
     if not input.startId:
         raise HTTPException(status_code=400, detail="Vui lòng chọn đỉnh bắt đầu")
-    try:
-        return run_dfs(graph, input.startId).__dict__
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    return await algorithm_response("dfs", input.graph, input, request)
 
 @app.post("/dijkstra")
-async def api_dijkstra(input: AlgoInput):
+async def api_dijkstra(input: DijkstraInput, request: Request):
+    if not input.startId:
+        raise HTTPException(status_code=400, detail="Vui lòng chọn đỉnh bắt đầu")
+    if not input.endId and not input.endIds:
+        raise HTTPException(status_code=400, detail="Vui lòng chọn đỉnh kết thúc")
+    return await algorithm_response("dijkstra", input.graph, input, request)
+
+@app.post("/astar")
+async def api_astar(input: AlgoInput, request: Request):
     if not input.startId:
         raise HTTPException(status_code=400, detail="Vui lòng chọn đỉnh bắt đầu")
     if not input.endId:
         raise HTTPException(status_code=400, detail="Vui lòng chọn đỉnh kết thúc")
-    graph = GraphData(input.graph.nodes, input.graph.links, input.graph.isDirected)
-    try:
-        result = run_dijkstra(graph, input.startId, input.endId)
-        return sanitize_for_json(result)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    return await algorithm_response("astar", input.graph, input, request)
 
 @app.post("/bellmanFord")
-async def api_bellman_ford(input: AlgoInput):
+async def api_bellman_ford(input: BellmanFordInput, request: Request):
     if not input.startId:
         raise HTTPException(status_code=400, detail="Vui lòng chọn đỉnh bắt đầu")
     if not input.endId:
         raise HTTPException(status_code=400, detail="Vui lòng chọn đỉnh kết thúc")
-    graph = GraphData(input.graph.nodes, input.graph.links, input.graph.isDirected)
-    try:
-        result = run_bellman_ford(graph, input.startId, input.endId)
-        return sanitize_for_json(result)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    return await algorithm_response("bellmanFord", input.graph, input, request)
 
 @app.post("/prim")
-async def api_prim(input: GraphInput):
-    graph = GraphData(input.nodes, input.links, input.isDirected)
-    try:
-        return run_prim(graph).__dict__
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+async def api_prim(input: GraphAlgoInput, request: Request):
+    return await algorithm_response("prim", input, input, request)
 
 @app.post("/kruskal")
-async def api_kruskal(input: GraphInput):
-    graph = GraphData(input.nodes, input.links, input.isDirected)
-    try:
-        return run_kruskal(graph).__dict__
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+async def api_kruskal(input: GraphAlgoInput, request: Request):
+    return await algorithm_response("kruskal", input, input, request)
+
+@app.post("/boruvka")
+async def api_boruvka(input: GraphAlgoInput, request: Request):
+    return await algorithm_response("boruvka", input, input, request)
 
 @app.post("/fordFulkerson")
-async def api_ford_fulkerson(input: AlgoInput):
-    graph = GraphData(input.graph.nodes, input.graph.links, input.graph.isDirected)
+async def api_ford_fulkerson(input: FlowInput, request: Request):
     if not input.startId or not input.endId:
         raise HTTPException(status_code=400, detail="startId and endId required")
-    try:
-        return run_ford_fulkerson(graph, input.startId, input.endId).__dict__
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    return await algorithm_response("fordFulkerson", input.graph, input, request)
 
 @app.post("/fleury")
-async def api_fleury(input: GraphInput):
-    graph = GraphData(input.nodes, input.links, input.isDirected)
-    try:
-        return run_fleury(graph).__dict__
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+async def api_fleury(input: FleuryInput, request: Request):
+    return await algorithm_response("fleury", input, input, request)
 
 @app.post("/hierholzer")
-async def api_hierholzer(input: GraphInput):
+async def api_hierholzer(input: GraphAlgoInput, request: Request):
+    return await algorithm_response("hierholzer", input, input, request)
+
+@app.post("/bipartite")
+async def api_bipartite(input: BipartiteInput, request: Request):
+    return await algorithm_response("bipartite", input, input, request)
+
+@app.post("/batch")
+async def api_batch(input: BatchInput, request: Request):
+    """Runs several algorithms on one graph; the graph is validated and compiled once."""
+    started = time.perf_counter()
     graph = GraphData(input.nodes, input.links, input.isDirected)
     try:
-        return run_hierholzer(graph).__dict__
+        compile_graph(graph).rank  # build the shared index before the jobs fan out
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.post("/bipartite")
-async def api_bipartite(input: GraphInput):
+    async def run(job: BatchJob) -> Dict[str, Any]:
+        if SCHEDULER == 'cooperative':
+            return await run_batch_job_sliced(request, graph, job)
+        # Light jobs share the compiled graph; heavy ones go to a worker process as plain data
+        heavy = is_heavy(job.algorithm, input, job.mode, job.trace)
+        started = time.perf_counter()
+        try:
+            return await execute(request, job, heavy, run_batch_job, graph_to_dict(graph) if heavy else graph, job.model_dump())
+        except HTTPException as e:
+            return batch_entry(job, started, error=e.detail)
+
+    results = await asyncio.gather(*(run(job) for job in input.jobs))
+    return FastJSONResponse({"results": results, "wallTimeMs": round((time.perf_counter() - started) * 1000, 3)})
+
+def all_pairs_body(result: Dict[str, Any], encoding: str) -> bytes:
+    if encoding == 'binary':
+        return pack_matrix(result)
+    return encode_body(matrix_payload(result, encoding))
+
+def all_pairs_media_type(encoding: str) -> str:
+    return "application/octet-stream" if encoding == 'binary' else "application/json"
+
+def run_all_pairs_job(graph: Dict[str, Any], method: str, encoding: str = 'json', cancel=None) -> bytes:
+    graph = GraphData(graph["nodes"], graph["links"], graph["isDirected"])
+    steps = iter_all_pairs_shortest_paths(graph, method, flat=encoding == 'json')
+    return all_pairs_body(drain(cancellable(steps, cancel)), encoding)
+
+async def sliced_all_pairs(input: AllPairsInput, request: Request) -> Response:
+    # cached_response for SCHEDULER = 'cooperative'
+    key = cache_key("allPairs", input)
+    media_type = all_pairs_media_type(input.encoding)
+    body = result_cache.get(key)
+    if body is not None:
+        return Response(content=body, media_type=media_type, headers={"X-Cache": "HIT"})
     graph = GraphData(input.nodes, input.links, input.isDirected)
+    budget = request_timeout(input)
+    steps = iter_all_pairs_shortest_paths(graph, input.method, flat=input.encoding == 'json')
+    with execution_errors(budget):
+        finished, result, _ = await scheduler.run(steps, budget, request.is_disconnected)
+        if not finished:
+            raise DeadlineExceeded(budget)
+    body = await run_in_threadpool(all_pairs_body, result, input.encoding)
+    result_cache.put(key, body)
+    return Response(content=body, media_type=media_type, headers={"X-Cache": "MISS"})
+
+@app.post("/allPairs")
+async def api_all_pairs(input: AllPairsInput, request: Request):
     try:
-        return check_bipartite(graph).__dict__
+        if SCHEDULER == 'cooperative':
+            return await sliced_all_pairs(input, request)
+        return await cached_response("allPairs", input, request, is_heavy("allPairs", input, input.method),
+                                     run_all_pairs_job, graph_to_dict(input), input.method, input.encoding,
+                                     media_type=all_pairs_media_type(input.encoding))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.get("/workers/stats")
+async def api_worker_stats():
+    return FastJSONResponse({"scheduler": SCHEDULER, **execution.stats(), "cooperative": scheduler.stats()})
+
+@app.get("/cache/stats")
+async def api_cache_stats():
+    return FastJSONResponse(result_cache.stats())
+
 # Conversion endpoints
-@app.post("/toMatrix")
-async def api_to_matrix(input: GraphInput):
+def matrix_response(input: MatrixInput) -> Response:
+    # Builds and encodes the matrix; O(V^2) for 'dense', so it runs off the event loop
     graph = GraphData(input.nodes, input.links, input.isDirected)
-    return {"matrix": to_adjacency_matrix(graph)}
+    if input.format == 'dense':
+        if input.encoding == 'json':
+            return FastJSONResponse({"matrix": to_adjacency_matrix(graph)})
+        nodes, dense = to_dense_matrix(graph)
+        matrix = {"format": "dense", "nodes": nodes, "shape": list(dense.shape), "matrix": dense}
+    else:
+        matrix = to_sparse_matrix(graph, input.format)
+    if input.encoding == 'binary':
+        return Response(pack_matrix(matrix), media_type="application/octet-stream")
+    return FastJSONResponse(matrix_payload(matrix, input.encoding))
+
+@app.post("/toMatrix")
+async def api_to_matrix(input: MatrixInput):
+    try:
+        return await run_in_threadpool(matrix_response, input)
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def read_matrix_upload(request: Request) -> GraphData:
+    """Graph from a multipart /fromMatrix upload.
+
+    Fields: file; encoding 'npy', 'raw' or 'bits' (default from the file name:
+    .npy, otherwise raw); dtype for raw (default <f8); n, needed for bits;
+    isDirected; labels as a JSON list.
+    """
+    form = await request.form()
+    upload = form.get("file")
+    if upload is None or isinstance(upload, str):
+        raise HTTPException(status_code=400, detail="Thiếu tệp ma trận")
+    data = await upload.read()
+    encoding = form.get("encoding") or ('npy' if (upload.filename or '').endswith('.npy') else 'raw')
+    try:
+        n = int(form["n"]) if form.get("n") else None
+        labels = json.loads(form["labels"]) if form.get("labels") else None
+        is_directed = str(form.get("isDirected", "false")).lower() in ("true", "1")
+        matrix = decode_matrix_buffer(data, encoding, form.get("dtype") or '<f8', n)
+        return await run_in_threadpool(from_matrix_array, matrix, is_directed, labels)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/fromMatrix")
-async def api_from_matrix(input: ConvertInput):
+async def api_from_matrix(request: Request):
+    # JSON ConvertInput as before, or a multipart upload of a binary matrix
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        return FastJSONResponse(graph_to_dict(await read_matrix_upload(request)))
+    try:
+        body = await request.body()
+        # Validating the nested lists is O(V^2) as well
+        input = await run_in_threadpool(lambda: ConvertInput.model_validate(json.loads(body)))
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
     if input.typeFrom != 'matrix':
         raise HTTPException(400, "Invalid typeFrom")
-    return from_adjacency_matrix(input.data, input.isDirected, input.labels).__dict__
+    try:
+        graph = await run_in_threadpool(from_adjacency_matrix, input.data, input.isDirected, input.labels)
+        return FastJSONResponse(graph_to_dict(graph))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+GraphFormat = Literal['csv', 'ndjson', 'dimacs', 'graphml']
+EXPORT_MEDIA_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson', 'dimacs': 'text/plain', 'graphml': 'application/xml'}
+EXPORT_EXTENSIONS = {'csv': 'csv', 'ndjson': 'ndjson', 'dimacs': 'gr', 'graphml': 'graphml'}
+
+IMPORT_MAX_BYTES = int(os.environ.get("IMPORT_MAX_BYTES", 64 * 1024 * 1024))
+IMPORT_FEED_BYTES = 256 * 1024
+
+@app.post("/import/{fmt}")
+async def api_import(fmt: GraphFormat, request: Request, isDirected: Optional[bool] = None):
+    # The raw request body is the file; it is parsed a batch of chunks at a time as
+    # it arrives, on the threadpool so a large upload does not hold up the loop
+    reader = graph_reader(fmt, isDirected)
+    received = 0
+    pending, pending_bytes = [], 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > IMPORT_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Tệp lớn hơn {IMPORT_MAX_BYTES} byte")
+            pending.append(chunk)
+            pending_bytes += len(chunk)
+            if pending_bytes >= IMPORT_FEED_BYTES:
+                await run_in_threadpool(reader.feed, b"".join(pending))
+                pending, pending_bytes = [], 0
+        if pending:
+            await run_in_threadpool(reader.feed, b"".join(pending))
+        graph = await run_in_threadpool(reader.close)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(graph_to_dict(graph))
+
+@app.post("/export/{fmt}")
+async def api_export(fmt: GraphFormat, input: GraphInput):
+    graph = GraphData(input.nodes, input.links, input.isDirected)
+    headers = {"Content-Disposition": f'attachment; filename="graph.{EXPORT_EXTENSIONS[fmt]}"'}
+    return StreamingResponse(iter_graph_export(graph, fmt), media_type=EXPORT_MEDIA_TYPES[fmt], headers=headers)
 
 @app.post("/toEdgeList")
 async def api_to_edge_list(input: GraphInput):
     graph = GraphData(input.nodes, input.links, input.isDirected)
-    return {"edgeList": to_edge_list(graph)}
+    return FastJSONResponse({"edgeList": to_edge_list(graph)})
 
 @app.post("/fromEdgeList")
 async def api_from_edge_list(input: ConvertInput):
     if input.typeFrom != 'edgeList':
         raise HTTPException(400, "Invalid typeFrom")
-    return from_edge_list(input.data, input.isDirected).__dict__
+    return FastJSONResponse(graph_to_dict(from_edge_list(input.data, input.isDirected)))
 
 @app.post("/toAdjList")
 async def api_to_adj_list(input: GraphInput):
     graph = GraphData(input.nodes, input.links, input.isDirected)
-    return {"adjList": to_adjacency_list(graph)}
+    return FastJSONResponse({"adjList": to_adjacency_list(graph)})
 
 @app.post("/fromAdjList")
 async def api_from_adj_list(input: ConvertInput):
     if input.typeFrom != 'adjList':
         raise HTTPException(400, "Invalid typeFrom")
-    return from_adjacency_list(input.data, input.isDirected).__dict__
\ No newline at end of file
+    return FastJSONResponse(graph_to_dict(from_adjacency_list(input.data, input.isDirected)))
\ No newline at end of file
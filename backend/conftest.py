@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Importing app opens the graph store; keep it out of the working tree
+os.environ.setdefault("GRAPH_STORE_PATH", os.path.join(tempfile.mkdtemp(), "graphs.db"))
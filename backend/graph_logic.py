@@ -1,43 +1,915 @@
 # Corrected File: graph_logic.py (Completed truncated parts, implemented all algorithms with steps for visualization)
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Iterator
+from array import array
 from collections import defaultdict, deque
 import networkx as nx
 from networkx.exception import NetworkXNoPath, NetworkXUnbounded
+import abc
 import heapq
+import io
+import codecs
 import copy
+import csv
+import json
+import math
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape as xml_escape, quoteattr as xml_quoteattr
+import numpy as np
+
+INF = float('inf')
 
 class GraphData:
     def __init__(self, nodes: List[Dict], links: List[Dict], isDirected: bool):
         self.nodes = nodes
         self.links = links
         self.isDirected = isDirected
+        self._compiled = None
+        self._labels = None
+
+# Log messages by event code. Each argument kind is 'n' for a node index (shown
+# by label), 'p' for a path of node indices, 's' for a set of node indices, 'i'
+# for a number shown as int and 'v' for a value shown as is. Text is only
+# rendered when a caller asks for it.
+LOG_TEMPLATES = {
+    'visit': ("Thăm {0}", 'n'),
+    'bfs.start': ("Bắt đầu BFS từ {0}", 'n'),
+    'bfs.enqueue': ("Thêm {0} vào hàng đợi", 'n'),
+    'dfs.start': ("Bắt đầu DFS từ {0}", 'n'),
+    'dfs.push': ("Thêm {0} vào stack", 'n'),
+    'bfs.level': ("Mức {0}: {1}", 'vs'),
+    'dijkstra.start': ("Bắt đầu Dijkstra từ {0}", 'n'),
+    'dijkstra.visit': ("Thăm {0} với khoảng cách {1}", 'nv'),
+    'dijkstra.settled': ("Thăm {0}: {1}", 'nv'),
+    'dijkstra.relax': ("Cập nhật khoảng cách đến {0}: {1}", 'nv'),
+    'astar.start': ("Bắt đầu A* từ {0} đến {1}", 'nn'),
+    'astar.visit': ("Thăm {0}: g = {1}, f = {2}", 'nvv'),
+    'bidi.start': ("Bắt đầu Dijkstra hai chiều từ {0} và {1}", 'nn'),
+    'bidi.visit': ("Thăm {0} từ phía {1} với khoảng cách {2}", 'nvv'),
+    'bidi.relax': ("Cập nhật khoảng cách ({1}) của {0}: {2}", 'nvv'),
+    'bidi.meet': ("Hai phía gặp nhau tại {0}, độ dài đường đi = {1}", 'nv'),
+    'bf.start': ("Bắt đầu Bellman-Ford từ {0}", 'n'),
+    'bf.init': ("Khởi tạo: d[{0}] = 0, các đỉnh khác = ∞", 'n'),
+    'bf.round': ("--- Vòng lặp {0} ---", 'v'),
+    'bf.relax': ("Relax {0} → {1}: {2}", 'nni'),
+    'bf.round.done': ("Vòng lặp {0}: cập nhật {1} đỉnh", 'vv'),
+    'bf.converged': ("Không có cập nhật, thuật toán hội tụ", ''),
+    'bf.done': ("Hoàn thành Bellman-Ford", ''),
+    'bf.negative': ("Đồ thị có chu trình âm: {0}", 'p'),
+    'prim.start': ("Bắt đầu Prim từ {0}", 'n'),
+    'kruskal.start': ("Bắt đầu Kruskal", ''),
+    'boruvka.start': ("Bắt đầu Borůvka", ''),
+    'boruvka.round': ("Vòng {0}: thêm {1} cạnh, còn {2} thành phần", 'vvv'),
+    'mst.add': ("Thêm cạnh {0} - {1} ({2})", 'nnv'),
+    'mst.added': ("Thêm {0} - {1} ({2})", 'nnv'),
+    'ff.start': ("Bắt đầu Ford-Fulkerson từ {0} đến {1}", 'nn'),
+    'ff.augment': ("Lần {0}: {1}, luồng tăng = {2}, tổng = {3}", 'vpii'),
+    'dinic.phase': ("Pha {0}: đồ thị mức, khoảng cách tới đích = {1}", 'vv'),
+    'ff.cut': ("Lát cắt hẹp nhất: {0} đỉnh phía nguồn, {1} cạnh cắt, dung lượng = {2}", 'vvi'),
+    'fleury.start': ("Bắt đầu Fleury từ {0}", 'n'),
+    'fleury.move': ("Di chuyển từ {0} đến {1}", 'nn'),
+    'fleury.path': ("Đường Euler: {0}", 'p'),
+    'hierholzer.walk': ("{0}: Đi từ {1} → {2}", 'vnn'),
+    'hierholzer.b1': ("B1: Xác định chu trình ban đầu R₁ từ đỉnh {0}", 'n'),
+    'hierholzer.b1.start': ("B1: Bắt đầu tạo R₁ từ {0}", 'n'),
+    'hierholzer.b1.done': ("B1: Hoàn thành R₁ = {0}", 'p'),
+    'hierholzer.b1.circuit': ("B1: R₁ = {0}", 'p'),
+    'hierholzer.b2': ("B2: Kiểm tra - R{0} chưa chứa toàn bộ đồ thị", 'v'),
+    'hierholzer.b3': ("B3: Chọn v{0} = {1} trong R{0} (còn cạnh chưa dùng)", 'vn'),
+    'hierholzer.b3.pick': ("B3: Chọn v{0} = {1} (còn {2} cạnh chưa dùng)", 'vnv'),
+    'hierholzer.b4': ("B4: Xác định chu trình Q{0} từ v{0}", 'v'),
+    'hierholzer.b4.start': ("B4: Bắt đầu tạo Q{0} từ {1}", 'vn'),
+    'hierholzer.b4.done': ("B4: Hoàn thành Q{0} = {1}", 'vp'),
+    'hierholzer.b4.circuit': ("B4: Q{0} = {1}", 'vp'),
+    'hierholzer.b5': ("B5: Gộp Q vào R → R{0} = {1}", 'vp'),
+    'hierholzer.b5.merge': ("B5: Gộp Q{0} vào R{0} → R{1}", 'vv'),
+    'hierholzer.b6': ("B6: Tăng i = {0}, quay lại B2", 'v'),
+    'hierholzer.done': ("B2: Hoàn thành - Chu trình Euler: {0}", 'p'),
+    'hierholzer.end': ("KẾT THÚC: Chu trình Euler = {0}", 'p'),
+    'bipartite.visit': ("Thăm {0} với màu {1}", 'nv'),
+    'bipartite.component': ("Tô màu thành phần chứa {0}", 'n'),
+    'bipartite.no': ("Không phải đồ thị hai phía", ''),
+    'bipartite.yes': ("Là đồ thị hai phía", ''),
+    'bipartite.conflict': ("Cạnh {0} - {1} nối hai đỉnh cùng màu", 'nn'),
+    'bipartite.stream': ("Duyệt {0} cạnh: {1} thành phần liên thông", 'vv'),
+}
+
+def render_log(event: str, args: tuple, labels: List[str]) -> str:
+    template, kinds = LOG_TEMPLATES[event]
+    values = []
+    for kind, arg in zip(kinds, args):
+        if kind == 'n':
+            values.append(labels[arg])
+        elif kind == 'p':
+            values.append(" → ".join(labels[v] for v in arg))
+        elif kind == 's':
+            values.append(", ".join(labels[v] for v in arg))
+        elif kind == 'i':
+            values.append(int(arg))
+        else:
+            values.append(arg)
+    return template.format(*values)
 
 class AlgorithmStep:
-    def __init__(self, log: str, **kwargs):
-        self.log = log
-        self.__dict__.update(kwargs)
+    """One visualization step: an event code with its arguments plus state fields."""
+    __slots__ = ('event', 'args', 'fields')
+
+    def __init__(self, event: str, *args, **fields):
+        self.event = event
+        self.args = args
+        self.fields = fields
+
+    def state(self) -> Dict[str, Any]:
+        return dict(self.fields)
 
 class AlgorithmResult:
-    def __init__(self, logs: List[str] = None, steps: List[AlgorithmStep] = None, **kwargs):
+    def __init__(self, logs: List[tuple] = None, steps: List[AlgorithmStep] = None, labels: List[str] = None, **kwargs):
         self.logs = logs or []
         self.steps = steps or []
+        self.labels = labels or []
         self.__dict__.update(kwargs)
 
+    def fields(self) -> Dict[str, Any]:
+        return {k: v for k, v in self.__dict__.items() if k not in ('logs', 'steps', 'labels')}
+
+    def render_logs(self) -> List[str]:
+        return [render_log(entry[0], entry[1:], self.labels) for entry in self.logs]
+
+class ListView:
+    """Step value showing items[start:stop] of a list that is only appended to.
+
+    Steps hold views instead of copies, so a trace costs O(steps + changes) memory.
+    """
+    __slots__ = ('items', 'start', 'stop')
+
+    def __init__(self, items: List[Any], start: int = 0, stop: Optional[int] = None):
+        self.items = items
+        self.start = start
+        self.stop = len(items) if stop is None else stop
+
+    def value(self) -> List[Any]:
+        return self.items[self.start:self.stop]
+
+class Journal:
+    """Dict whose updates are appended to a change log; view() pins the current version."""
+
+    def __init__(self, base: Dict[str, Any]):
+        self.base = base
+        self.changes = []
+        self._cache = (0, base)
+
+    def set(self, key: str, value: Any):
+        self.changes.append((key, value))
+
+    def view(self) -> 'JournalView':
+        return JournalView(self, len(self.changes))
+
+    def materialize(self, count: int) -> Dict[str, Any]:
+        # Steps are usually read in order, so replay from the last materialized version
+        done, data = self._cache
+        if count < done:
+            done, data = 0, self.base
+        data = dict(data)
+        for key, value in self.changes[done:count]:
+            data[key] = value
+        self._cache = (count, data)
+        return data
+
+class JournalView:
+    __slots__ = ('journal', 'count')
+
+    def __init__(self, journal: Journal, count: int):
+        self.journal = journal
+        self.count = count
+
+    def value(self) -> Dict[str, Any]:
+        return self.journal.materialize(self.count)
+
+class Circuit:
+    """Closed walk kept as a linked list of slots; splicing a sub-walk in is O(1) plus its length.
+
+    Slots are never removed, so the circuit as it stood after merge k is the slots
+    created at or before merge k, in list order. view() pins the current merge.
+    """
+
+    def __init__(self, vertices: List[int]):
+        self.vertex = list(vertices)
+        self.next = list(range(1, len(vertices))) + [-1]
+        self.created = [0] * len(vertices)
+        self.merges = 0
+
+    def splice(self, slot: int, vertices: List[int]):
+        """Inserts vertices right after slot (a sub-circuit through slot's vertex, minus its first vertex)."""
+        self.merges += 1
+        first = len(self.vertex)
+        self.vertex.extend(vertices)
+        self.created.extend([self.merges] * len(vertices))
+        self.next.extend(range(first + 1, first + len(vertices)))
+        self.next.append(self.next[slot])
+        self.next[slot] = first
+
+    def vertices(self, merges: int) -> List[int]:
+        vertex, created, nxt = self.vertex, self.created, self.next
+        out = []
+        slot = 0
+        while slot != -1:
+            if created[slot] <= merges:
+                out.append(vertex[slot])
+            slot = nxt[slot]
+        return out
+
+    def view(self, names: Optional[List[Any]] = None) -> 'CircuitView':
+        return CircuitView(self, self.merges, names)
+
+class CircuitView:
+    """Step or log value showing a Circuit at one merge, as vertex indices or mapped through names."""
+    __slots__ = ('circuit', 'merges', 'names')
+
+    def __init__(self, circuit: Circuit, merges: int, names: Optional[List[Any]] = None):
+        self.circuit = circuit
+        self.merges = merges
+        self.names = names
+
+    def value(self) -> List[Any]:
+        vertices = self.circuit.vertices(self.merges)
+        return [self.names[v] for v in vertices] if self.names is not None else vertices
+
+    def __iter__(self):
+        return iter(self.value())
+
+# Ints outside int32 go with the floats while a double holds them exactly, else as objects
+_INT32 = 2 ** 31
+_EXACT_INT = 2 ** 53
+# Dicts up to this size (currentLinkId, bipartiteSets) are stored by their values
+STEP_DICT_KEYS = 8
+
+class StepTrace:
+    """The steps of a run stored column-wise; collect_steps fills one.
+
+    A step is a layout code (its event plus the names and kinds of its values,
+    kept once in layouts) and a run of numbers in the int32 ints column, plus
+    any floats in the floats column. Strings such as node ids are indexes into
+    a string table shared by every step, views are the list, log or circuit
+    they show (kept once) plus their bounds, and small dicts are stored as
+    their values. Only other values (lists, tuples, ...) are kept as objects.
+    Iterating decodes AlgorithmSteps equal to the ones appended, views
+    included, so a step costs a few dozen bytes instead of the hundreds an
+    AlgorithmStep with its dicts and views takes.
+    """
+
+    def __init__(self, steps: Iterable[AlgorithmStep] = ()):
+        self.strings: List[str] = []
+        self.objects: List[Any] = []
+        self.layouts: List[Tuple] = []
+        self.layout = array('i')
+        self.ints = array('i')
+        self.floats = array('d')
+        self._string_codes: Dict[str, int] = {}
+        self._object_codes: Dict[int, int] = {}
+        self._layout_codes: Dict[Tuple, int] = {}
+        for step in steps:
+            self.append(step)
+
+    def __len__(self) -> int:
+        return len(self.layout)
+
+    def _string(self, value: str) -> int:
+        code = self._string_codes.get(value)
+        if code is None:
+            code = self._string_codes[value] = len(self.strings)
+            self.strings.append(value)
+        return code
+
+    def _shared(self, value: Any) -> int:
+        # objects keeps the value alive, so its id cannot be reused
+        code = self._object_codes.get(id(value))
+        if code is None:
+            code = self._object_codes[id(value)] = len(self.objects)
+            self.objects.append(value)
+        return code
+
+    def _encode(self, value: Any, ints: List[int], floats: List[float]) -> Any:
+        # Appends value's numbers to ints and floats and returns its kind
+        kind = type(value)
+        if kind is str:
+            ints.append(self._string(value))
+            return 's'
+        if kind is int:
+            if -_INT32 <= value < _INT32:
+                ints.append(value)
+                return 'i'
+            if -_EXACT_INT <= value <= _EXACT_INT:
+                floats.append(value)
+                return 'I'
+        elif kind is float:
+            floats.append(value)
+            return 'f'
+        elif value is None:
+            return 'z'
+        elif kind is ListView:
+            ints += (self._shared(value.items), value.start, value.stop)
+            return 'L'
+        elif kind is JournalView:
+            ints += (self._shared(value.journal), value.count)
+            return 'J'
+        elif kind is CircuitView:
+            ints += (self._shared(value.circuit), value.merges, -1 if value.names is None else self._shared(value.names))
+            return 'C'
+        elif kind is dict and len(value) <= STEP_DICT_KEYS:
+            return ('d',) + tuple((key, self._encode(item, ints, floats)) for key, item in value.items())
+        ints.append(len(self.objects))
+        self.objects.append(value)
+        return 'o'
+
+    def append(self, step: AlgorithmStep):
+        ints, floats = [], []
+        args = tuple(self._encode(arg, ints, floats) for arg in step.args)
+        fields = tuple((name, self._encode(value, ints, floats)) for name, value in step.fields.items())
+        layout = (step.event, args, fields)
+        code = self._layout_codes.get(layout)
+        if code is None:
+            code = self._layout_codes[layout] = len(self.layouts)
+            self.layouts.append(layout)
+        self.layout.append(code)
+        self.ints.extend(ints)
+        if floats:
+            self.floats.extend(floats)
+
+    def __iter__(self) -> Iterator[AlgorithmStep]:
+        ints, floats, strings, objects = self.ints, self.floats, self.strings, self.objects
+        # Read positions in ints and floats
+        i = f = 0
+
+        def decode(kind):
+            nonlocal i, f
+            if kind == 's':
+                i += 1
+                return strings[ints[i - 1]]
+            if kind == 'i':
+                i += 1
+                return ints[i - 1]
+            if kind == 'L':
+                i += 3
+                return ListView(objects[ints[i - 3]], ints[i - 2], ints[i - 1])
+            if kind == 'J':
+                i += 2
+                return JournalView(objects[ints[i - 2]], ints[i - 1])
+            if kind == 'f':
+                f += 1
+                return floats[f - 1]
+            if kind == 'z':
+                return None
+            if kind == 'o':
+                i += 1
+                return objects[ints[i - 1]]
+            if kind == 'I':
+                f += 1
+                return int(floats[f - 1])
+            if kind == 'C':
+                i += 3
+                names = ints[i - 1]
+                return CircuitView(objects[ints[i - 3]], ints[i - 2], objects[names] if names >= 0 else None)
+            return {key: decode(item) for key, item in kind[1:]}
+
+        layouts = self.layouts
+        for code in self.layout:
+            event, arg_kinds, field_kinds = layouts[code]
+            yield AlgorithmStep(event, *[decode(kind) for kind in arg_kinds],
+                                **{name: decode(kind) for name, kind in field_kinds})
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, (ListView, JournalView, CircuitView)):
+        return value.value()
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    return value
+
+def step_to_dict(step: AlgorithmStep, labels: List[str], logs: str = 'server', plain: bool = True) -> Dict[str, Any]:
+    data = step.state()
+    if plain:
+        data = {k: _plain(v) for k, v in data.items()}
+    if logs == 'server':
+        data['log'] = render_log(step.event, step.args, labels)
+    elif logs == 'client':
+        data['event'] = step.event
+        # Always plain: TraceEncoder compares args by value
+        data['args'] = [_plain(arg) for arg in step.args]
+    return data
+
+class TraceEncoder:
+    """Encodes step states as deltas against the previous step, with a keyframe
+    (the full state) every keyframe_interval steps.
+
+    Records are {"keyframe": true, "state": {...}} or a delta with any of
+    "unset": [path], "shift": {path: n}, "truncate": {path: n},
+    "append": {path: [items]}, "patch": {path: {key: value}}, "set": {path: value},
+    applied in that order. A path is a field name, or "field.key" for a dict
+    field whose members are views (bipartiteSets). decode_trace() inverts it.
+    """
+
+    def __init__(self, keyframe_interval: int = 50):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.count = 0
+        self.prev = {}
+
+    @staticmethod
+    def _flatten(state: Dict[str, Any]) -> Dict[str, Any]:
+        flat = {}
+        for key, value in state.items():
+            if isinstance(value, dict) and any(isinstance(v, (ListView, JournalView)) for v in value.values()):
+                for sub, v in value.items():
+                    flat[f"{key}.{sub}"] = v
+            else:
+                flat[key] = value
+        return flat
+
+    def encode(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        flat = self._flatten(state)
+        keyframe = self.count % self.keyframe_interval == 0
+        self.count += 1
+        prev, self.prev = self.prev, flat
+        if keyframe:
+            return {'keyframe': True, 'state': {k: _plain(v) for k, v in state.items()}}
+
+        record = {}
+        unset = [path for path in prev if path not in flat]
+        if unset:
+            record['unset'] = unset
+        for path, value in flat.items():
+            if path not in prev:
+                record.setdefault('set', {})[path] = _plain(value)
+                continue
+            old = prev[path]
+            if isinstance(value, ListView) and isinstance(old, ListView) and value.items is old.items \
+                    and value.start >= old.start and value.stop >= old.stop:
+                if value.start == old.start and value.stop == old.stop:
+                    continue
+                if value.start >= old.stop:
+                    # Nothing of the old view is left, and shift applies before append
+                    record.setdefault('set', {})[path] = _plain(value)
+                    continue
+                if value.start > old.start:
+                    record.setdefault('shift', {})[path] = value.start - old.start
+                if value.stop > old.stop:
+                    record.setdefault('append', {})[path] = value.items[old.stop:value.stop]
+                continue
+            if isinstance(value, JournalView) and isinstance(old, JournalView) and value.journal is old.journal \
+                    and value.count >= old.count:
+                if value.count > old.count:
+                    record.setdefault('patch', {})[path] = dict(value.journal.changes[old.count:value.count])
+                continue
+            new_plain, old_plain = _plain(value), _plain(old)
+            if new_plain == old_plain:
+                continue
+            if isinstance(new_plain, list) and isinstance(old_plain, list):
+                common = 0
+                limit = min(len(new_plain), len(old_plain))
+                while common < limit and new_plain[common] == old_plain[common]:
+                    common += 1
+                if common:
+                    if common < len(old_plain):
+                        record.setdefault('truncate', {})[path] = common
+                    record.setdefault('append', {})[path] = new_plain[common:]
+                    continue
+            elif isinstance(new_plain, dict) and isinstance(old_plain, dict) and old_plain.keys() <= new_plain.keys():
+                record.setdefault('patch', {})[path] = {k: v for k, v in new_plain.items() if k not in old_plain or old_plain[k] != v}
+                continue
+            record.setdefault('set', {})[path] = new_plain
+        return record
+
+def _get_path(state: Dict[str, Any], path: str) -> Any:
+    key, _, sub = path.partition('.')
+    return state[key][sub] if sub else state[key]
+
+def _set_path(state: Dict[str, Any], path: str, value: Any):
+    key, _, sub = path.partition('.')
+    if sub:
+        state[key] = dict(state.get(key) or {})
+        state[key][sub] = value
+    else:
+        state[key] = value
+
+def apply_trace_delta(state: Dict[str, Any], record: Dict[str, Any]) -> Dict[str, Any]:
+    if record.get('keyframe'):
+        return record['state']
+    state = dict(state)
+    for path in record.get('unset', []):
+        key, _, sub = path.partition('.')
+        if sub:
+            state[key] = {k: v for k, v in state[key].items() if k != sub}
+        else:
+            state.pop(key, None)
+    for path, n in record.get('shift', {}).items():
+        _set_path(state, path, _get_path(state, path)[n:])
+    for path, n in record.get('truncate', {}).items():
+        _set_path(state, path, _get_path(state, path)[:n])
+    for path, items in record.get('append', {}).items():
+        _set_path(state, path, _get_path(state, path) + items)
+    for path, changes in record.get('patch', {}).items():
+        merged = dict(_get_path(state, path))
+        merged.update(changes)
+        _set_path(state, path, merged)
+    for path, value in record.get('set', {}).items():
+        _set_path(state, path, value)
+    return state
+
+def decode_trace(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    states = []
+    state = {}
+    for record in records:
+        state = apply_trace_delta(state, record)
+        states.append(state)
+    return states
+
+# Besides steps, every iter_* generator yields None after each TICK_INTERVAL
+# visits or relaxations (or each unit of coarser work, like an augmenting path),
+# whatever the trace level, so a scheduler can pause it between slices of work.
+# The consumers below skip these ticks.
+TICK_INTERVAL = 1024
+
+def drain(steps: Iterator) -> Any:
+    """Runs a generator that only yields ticks to the end and returns its return value."""
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+def collect_steps(steps: Iterator[AlgorithmStep]) -> AlgorithmResult:
+    """Drains an iter_* generator into an AlgorithmResult holding all of its steps, as a StepTrace."""
+    collected = StepTrace()
+    while True:
+        try:
+            step = next(steps)
+        except StopIteration as stop:
+            result = stop.value
+            result.steps = collected
+            return result
+        if step is not None:
+            collected.append(step)
+
+def _log_fields(result: AlgorithmResult, logs: str, plain: bool = True) -> Dict[str, Any]:
+    if logs == 'server':
+        return {'logs': result.render_logs()}
+    if logs == 'client':
+        return {'logs': [[entry[0], [_plain(arg) for arg in entry[1:]] if plain else entry[1:]] for entry in result.logs],
+                'labels': result.labels, 'logTemplates': LOG_TEMPLATES}
+    return {'logs': []}
+
+def iter_trace_events(steps: Iterator[AlgorithmStep], labels: List[str], logs: str = 'server',
+                      trace_format: str = 'full', keyframe_interval: int = 50,
+                      plain: bool = True, ticks: bool = False) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Serializes an iter_* generator as it runs: yields ('step', dict) for every step,
+    then ('result', dict) with the result fields and logs. Nothing is retained between
+    steps, so memory does not grow with the length of the trace. plain=False leaves
+    views (ListView, ...) in place for an encoder that resolves them itself.
+    ticks=True passes the generator's None ticks through, for a scheduler."""
+    encoder = TraceEncoder(keyframe_interval) if trace_format == 'delta' else None
+    count = 0
+    while True:
+        try:
+            step = next(steps)
+        except StopIteration as stop:
+            result = stop.value
+            break
+        if step is None:
+            if ticks:
+                yield None
+            continue
+        if encoder:
+            yield 'step', encoder.encode(step_to_dict(step, labels, logs, plain=False))
+        else:
+            yield 'step', step_to_dict(step, labels, logs, plain)
+        count += 1
+    data = result.fields()
+    data.update(_log_fields(result, logs, plain))
+    data['stepCount'] = count
+    if encoder:
+        data['traceFormat'] = 'delta'
+        data['keyframeInterval'] = encoder.keyframe_interval
+    yield 'result', data
+
+def result_to_dict(result: AlgorithmResult, logs: str = 'server', trace_format: str = 'full', keyframe_interval: int = 50,
+                   plain: bool = True) -> Dict[str, Any]:
+    """Plain-dict form of a result. logs='server' renders log text, 'client' sends
+    event codes plus the label table and templates, 'none' drops logs entirely.
+    trace_format='delta' encodes steps with TraceEncoder. With plain=False the
+    steps keep their views instead of copies of the lists they show."""
+    data = result.fields()
+    labels = result.labels
+    if trace_format == 'delta':
+        encoder = TraceEncoder(keyframe_interval)
+        data['steps'] = [encoder.encode(step_to_dict(step, labels, logs, plain=False)) for step in result.steps]
+        data['traceFormat'] = 'delta'
+        data['keyframeInterval'] = encoder.keyframe_interval
+    else:
+        data['steps'] = [step_to_dict(step, labels, logs, plain) for step in result.steps]
+    data.update(_log_fields(result, logs, plain))
+    return data
+
+class CompiledGraph:
+    """Integer-indexed view of a GraphData, built once and shared by the run_* algorithms.
+
+    Node ids are interned to dense ints; edge e is graph.links[e]. The arcs of u are
+    out_*[out_offsets[u]:out_offsets[u + 1]] in link order, and in_* is the reverse
+    index (the same arrays for undirected graphs).
+    """
+
+    def __init__(self, graph: GraphData):
+        drain(self._build(graph))
+
+    def _build(self, graph: GraphData) -> Iterator[None]:
+        # The constructor's work, with a tick every TICK_INTERVAL nodes, links or arcs
+        index = {}
+        ids = []
+        labels = []
+        for i, node in enumerate(graph.nodes, 1):
+            if not i % TICK_INTERVAL:
+                yield None
+            node_id = node['id']
+            if node_id not in index:
+                index[node_id] = len(ids)
+                ids.append(node_id)
+                labels.append(node.get('label', node_id))
+
+        edge_source, edge_target, edge_weight, edge_capacity = [], [], [], []
+        for i, link in enumerate(graph.links, 1):
+            if not i % TICK_INTERVAL:
+                yield None
+            for end in (link['source'], link['target']):
+                if end not in index:
+                    index[end] = len(ids)
+                    ids.append(end)
+                    labels.append(end)
+            edge_source.append(index[link['source']])
+            edge_target.append(index[link['target']])
+            edge_weight.append(link['weight'])
+            edge_capacity.append(link.get('capacity', link['weight']))
+
+        self.graph = graph
+        self.isDirected = graph.isDirected
+        self.index = index
+        self.ids = ids
+        self.labels = labels
+        self.n = len(ids)
+        self.m = len(edge_source)
+        self.edge_source = edge_source
+        self.edge_target = edge_target
+        self.edge_weight = edge_weight
+        self.edge_capacity = edge_capacity
+
+        if graph.isDirected:
+            (self.out_offsets, self.out_targets, self.out_edges) = yield from self._build_csr(edge_source, edge_target, False)
+            (self.in_offsets, self.in_sources, self.in_edges) = yield from self._build_csr(edge_target, edge_source, False)
+        else:
+            (self.out_offsets, self.out_targets, self.out_edges) = yield from self._build_csr(edge_source, edge_target, True)
+            self.in_offsets, self.in_sources, self.in_edges = self.out_offsets, self.out_targets, self.out_edges
+        self.out_weights = [edge_weight[e] for e in self.out_edges]
+        self.out_capacities = [edge_capacity[e] for e in self.out_edges]
+        self.in_weights = self.out_weights if not graph.isDirected else [edge_weight[e] for e in self.in_edges]
+        self._rank = None
+        self._ranked = None
+
+    def _build_csr(self, tails: List[int], heads: List[int], both_ways: bool) -> Iterator[None]:
+        # Counting sort of arcs by tail vertex; stable, so each vertex keeps link order
+        n = self.n
+        counts = [0] * (n + 1)
+        for u in tails:
+            counts[u + 1] += 1
+        if both_ways:
+            for v in heads:
+                counts[v + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+        offsets = counts[:]
+        pos = counts[:-1]
+        arcs = offsets[n]
+        targets = [0] * arcs
+        edges = [0] * arcs
+        for e in range(len(tails)):
+            if not (e + 1) % TICK_INTERVAL:
+                yield None
+            u, v = tails[e], heads[e]
+            targets[pos[u]] = v
+            edges[pos[u]] = e
+            pos[u] += 1
+            if both_ways:
+                targets[pos[v]] = u
+                edges[pos[v]] = e
+                pos[v] += 1
+        return offsets, targets, edges
+
+    def node_index(self, node_id: str) -> int:
+        try:
+            return self.index[node_id]
+        except KeyError:
+            raise ValueError(f"Không tìm thấy đỉnh {node_id}")
+
+    def degree(self, u: int) -> int:
+        return self.out_offsets[u + 1] - self.out_offsets[u]
+
+    def neighbors(self, u: int) -> List[int]:
+        return self.out_targets[self.out_offsets[u]:self.out_offsets[u + 1]]
+
+    @property
+    def rank(self) -> List[int]:
+        # Position of each node in string order of its id; heaps keyed on the rank
+        # break ties exactly like the old heaps keyed on the id itself
+        if self._rank is None:
+            ranked = sorted(range(self.n), key=self.ids.__getitem__)
+            rank = [0] * self.n
+            for r, v in enumerate(ranked):
+                rank[v] = r
+            self._rank, self._ranked = rank, ranked
+        return self._rank
+
+    @property
+    def ranked(self) -> List[int]:
+        if self._ranked is None:
+            self.rank
+        return self._ranked
+
+def compile_graph(graph: GraphData) -> CompiledGraph:
+    if getattr(graph, '_compiled', None) is None:
+        graph._compiled = CompiledGraph(graph)
+    return graph._compiled
+
+def iter_compile_graph(graph: GraphData) -> Iterator[None]:
+    """compile_graph for the iter_* generators: ticks while it builds, returns the CompiledGraph."""
+    if getattr(graph, '_compiled', None) is None:
+        cg = CompiledGraph.__new__(CompiledGraph)
+        yield from cg._build(graph)
+        graph._compiled = cg
+    return graph._compiled
+
+class IndexedHeap:
+    """Binary min-heap over vertex ids 0..n-1 with decrease-key.
+
+    pos[v] is the slot of v in the heap array (-1 when absent), so every vertex is
+    stored at most once and the heap never grows past n entries. Keys can be any
+    comparable values; pushes sift exactly like heapq.heappush.
+    """
+    __slots__ = ('heap', 'keys', 'pos')
+
+    def __init__(self, n: int):
+        self.heap = []
+        self.keys = [None] * n
+        self.pos = [-1] * n
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def __contains__(self, v: int) -> bool:
+        return self.pos[v] >= 0
+
+    def push(self, v: int, key: Any) -> bool:
+        """Insert v, or lower its key if it is queued; False if key is not an improvement."""
+        i = self.pos[v]
+        if i < 0:
+            i = len(self.heap)
+            self.heap.append(v)
+        elif not key < self.keys[v]:
+            return False
+        self.keys[v] = key
+        self._sift_up(i)
+        return True
+
+    def pop(self) -> Tuple[int, Any]:
+        heap, pos = self.heap, self.pos
+        top = heap[0]
+        last = heap.pop()
+        pos[top] = -1
+        if heap:
+            heap[0] = last
+            pos[last] = 0
+            self._sift_down(0)
+        return top, self.keys[top]
+
+    def items(self) -> List[Tuple[int, Any]]:
+        # (vertex, key) pairs in heap array order
+        return [(v, self.keys[v]) for v in self.heap]
+
+    def _sift_up(self, i: int):
+        heap, keys, pos = self.heap, self.keys, self.pos
+        v = heap[i]
+        key = keys[v]
+        while i > 0:
+            parent = (i - 1) >> 1
+            p = heap[parent]
+            if not key < keys[p]:
+                break
+            heap[i] = p
+            pos[p] = i
+            i = parent
+        heap[i] = v
+        pos[v] = i
+
+    def _sift_down(self, i: int):
+        heap, keys, pos = self.heap, self.keys, self.pos
+        size = len(heap)
+        v = heap[i]
+        key = keys[v]
+        while True:
+            child = 2 * i + 1
+            if child >= size:
+                break
+            if child + 1 < size and keys[heap[child + 1]] < keys[heap[child]]:
+                child += 1
+            c = heap[child]
+            if not keys[c] < key:
+                break
+            heap[i] = c
+            pos[c] = i
+            i = child
+        heap[i] = v
+        pos[v] = i
+
+class RadixHeap:
+    """Monotone min-queue over vertex ids with non-negative int keys and decrease-key.
+
+    Bucket b holds the vertices whose key first differs from the last popped key at
+    bit b - 1 (bucket 0: equal to it). A pop refills bucket 0 from the lowest
+    non-empty bucket, so each key moves at most key.bit_length() times. Keys must
+    never drop below the last popped key, which holds for Dijkstra on positive
+    integer weights.
+    """
+    __slots__ = ('buckets', 'keys', 'where', 'slot', 'last', 'size')
+
+    def __init__(self, n: int):
+        self.buckets = [[]]
+        self.keys = [0] * n
+        self.where = [-1] * n
+        self.slot = [0] * n
+        self.last = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, v: int) -> bool:
+        return self.where[v] >= 0
+
+    def push(self, v: int, key: int) -> bool:
+        """Insert v, or lower its key if it is queued; False if key is not an improvement."""
+        if key < self.last:
+            raise ValueError("RadixHeap chỉ nhận khóa không nhỏ hơn khóa vừa lấy ra")
+        if self.where[v] >= 0:
+            if key >= self.keys[v]:
+                return False
+            self._remove(v)
+        else:
+            self.size += 1
+        self.keys[v] = key
+        self._insert(v)
+        return True
+
+    def pop(self) -> Tuple[int, int]:
+        buckets, keys = self.buckets, self.keys
+        if not buckets[0]:
+            b = 1
+            while not buckets[b]:
+                b += 1
+            moved = buckets[b]
+            buckets[b] = []
+            self.last = min(keys[v] for v in moved)
+            for v in moved:
+                self._insert(v)
+        v = buckets[0].pop()
+        self.where[v] = -1
+        self.size -= 1
+        return v, keys[v]
+
+    def _insert(self, v: int):
+        b = (self.keys[v] ^ self.last).bit_length()
+        buckets = self.buckets
+        while b >= len(buckets):
+            buckets.append([])
+        self.where[v] = b
+        self.slot[v] = len(buckets[b])
+        buckets[b].append(v)
+
+    def _remove(self, v: int):
+        bucket = self.buckets[self.where[v]]
+        last = bucket.pop()
+        if last != v:
+            i = self.slot[v]
+            bucket[i] = last
+            self.slot[last] = i
+
 def get_adjacency_list(graph: GraphData) -> Dict[str, List[Dict[str, Any]]]:
-    adj = defaultdict(list)
-    for node in graph.nodes:
-        adj[node['id']] = []
-    for link in graph.links:
-        adj[link['source']].append({'node': link['target'], 'weight': link['weight'], 'capacity': link.get('capacity', link['weight'])})
-        if not graph.isDirected:
-            adj[link['target']].append({'node': link['source'], 'weight': link['weight'], 'capacity': link.get('capacity', link['weight'])})
-    return dict(adj)
+    cg = compile_graph(graph)
+    adj = {}
+    for u in range(cg.n):
+        adj[cg.ids[u]] = [{'node': cg.ids[cg.out_targets[a]], 'weight': cg.out_weights[a], 'capacity': cg.out_capacities[a]}
+                          for a in range(cg.out_offsets[u], cg.out_offsets[u + 1])]
+    return adj
+
+def label_index(graph: GraphData) -> Dict[str, str]:
+    if getattr(graph, '_labels', None) is None:
+        graph._labels = {node['id']: node.get('label', node['id']) for node in reversed(graph.nodes)}
+    return graph._labels
 
 def get_label(graph: GraphData, node_id: str) -> str:
-    for node in graph.nodes:
-        if node['id'] == node_id:
-            return node.get('label', node_id)
-    return node_id
+    return label_index(graph).get(node_id, node_id)
 
 def reconstruct_path(previous: Dict[str, Optional[str]], end_id: str) -> List[str]:
     path = []
@@ -47,8 +919,9 @@ def reconstruct_path(previous: Dict[str, Optional[str]], end_id: str) -> List[st
         if current in visited:
             break
         visited.add(current)
-        path.insert(0, current)
+        path.append(current)
         current = previous.get(current)
+    path.reverse()
     return path
 
 def get_edges_from_previous(graph: GraphData, previous: Dict[str, Optional[str]]) -> List[Dict[str, Any]]:
@@ -56,240 +929,690 @@ def get_edges_from_previous(graph: GraphData, previous: Dict[str, Optional[str]]
     for node in [n['id'] for n in graph.nodes]:
         p = previous.get(node)
         if p:
-            link = next((l for l in graph.links if 
-                         (l['source'] == p and l['target'] == node) or 
+            link = next((l for l in graph.links if
+                         (l['source'] == p and l['target'] == node) or
                          (not graph.isDirected and l['source'] == node and l['target'] == p)), None)
             weight = link['weight'] if link else 0
             edges.append({'source': p, 'target': node, 'weight': weight})
     return edges
 
-def run_bfs(graph: GraphData, start_id: str) -> AlgorithmResult:
-    adj = get_adjacency_list(graph)
-    visited = set()
-    queue = deque([start_id])
-    steps = []
+def _id_map(cg: CompiledGraph, values: List[Any]) -> Dict[str, Any]:
+    return dict(zip(cg.ids, values))
+
+def iter_bfs(graph: GraphData, start_id: str, trace: str = 'full') -> Iterator[AlgorithmStep]:
+    cg = yield from iter_compile_graph(graph)
+    ids, labels = cg.ids, cg.labels
+    offsets, targets = cg.out_offsets, cg.out_targets
+    start = cg.node_index(start_id)
+    full, summary = trace == 'full', trace == 'summary'
+    visited = [False] * cg.n
+    # Everything ever enqueued; the live queue is queue[head:], so steps can share it
+    queue = [start]
+    queue_ids = [ids[start]]
+    head = 0
     logs = []
     order = []
-
-    steps.append(AlgorithmStep(log=f"Bắt đầu BFS từ {get_label(graph, start_id)}", queue=list(queue)))
-
-    while queue:
-        current = queue.popleft()
-        if current in visited:
+    # Summary traces emit one step per BFS level
+    level = [-1] * cg.n if summary else None
+    current_level = 0
+    level_nodes = []
+
+    if full or summary:
+        if summary:
+            level[start] = 0
+        yield AlgorithmStep('bfs.start', start, queue=ListView(queue_ids))
+
+    while head < len(queue):
+        current = queue[head]
+        head += 1
+        if visited[current]:
             continue
-        visited.add(current)
-        order.append(current)
-        steps.append(AlgorithmStep(log=f"Thăm {get_label(graph, current)}", currentNodeId=current, visited=list(visited), queue=list(queue)))
-        logs.append(f"Thăm {get_label(graph, current)}")
-
-        for neigh in adj[current]:
-            if neigh['node'] not in visited:
-                queue.append(neigh['node'])
-                steps.append(AlgorithmStep(log=f"Thêm {get_label(graph, neigh['node'])} vào hàng đợi", queue=list(queue)))
-
-    return AlgorithmResult(visited=order, steps=steps, logs=logs)
-
-def run_dfs(graph: GraphData, start_id: str) -> AlgorithmResult:
-    adj = get_adjacency_list(graph)
-    visited = set()
-    stack = [start_id]
-    steps = []
+        if summary and level[current] != current_level:
+            yield AlgorithmStep('bfs.level', current_level, level_nodes, visited=ListView(order), queue=ListView(queue_ids, head - 1))
+            current_level, level_nodes = level[current], []
+        visited[current] = True
+        order.append(ids[current])
+        if not len(order) % TICK_INTERVAL:
+            yield None
+        if full:
+            yield AlgorithmStep('visit', current, currentNodeId=ids[current], visited=ListView(order), queue=ListView(queue_ids, head))
+        elif summary:
+            level_nodes.append(current)
+        logs.append(('visit', current))
+
+        for a in range(offsets[current], offsets[current + 1]):
+            v = targets[a]
+            if not visited[v]:
+                queue.append(v)
+                if full:
+                    queue_ids.append(ids[v])
+                    yield AlgorithmStep('bfs.enqueue', v, queue=ListView(queue_ids, head))
+                elif summary:
+                    queue_ids.append(ids[v])
+                    if level[v] < 0:
+                        level[v] = current_level + 1
+
+    if summary and level_nodes:
+        yield AlgorithmStep('bfs.level', current_level, level_nodes, visited=ListView(order), queue=ListView(queue_ids, head))
+
+    return AlgorithmResult(visited=order, logs=logs, labels=labels)
+
+def run_bfs(graph: GraphData, start_id: str, trace: str = 'full') -> AlgorithmResult:
+    return collect_steps(iter_bfs(graph, start_id, trace))
+
+def iter_dfs(graph: GraphData, start_id: str, trace: str = 'full') -> Iterator[AlgorithmStep]:
+    cg = yield from iter_compile_graph(graph)
+    ids, labels = cg.ids, cg.labels
+    offsets, targets = cg.out_offsets, cg.out_targets
+    start = cg.node_index(start_id)
+    full, summary = trace == 'full', trace == 'summary'
+    tracing = full or summary
+    visited = [False] * cg.n
+    stack = [start]
+    stack_ids = [ids[start]]
     logs = []
     order = []
 
-    steps.append(AlgorithmStep(log=f"Bắt đầu DFS từ {get_label(graph, start_id)}", stack=list(stack)))
+    if tracing:
+        yield AlgorithmStep('dfs.start', start, stack=stack_ids[:])
 
     while stack:
         current = stack.pop()
-        if current in visited:
+        if tracing:
+            stack_ids.pop()
+        if visited[current]:
             continue
-        visited.add(current)
-        order.append(current)
-        steps.append(AlgorithmStep(log=f"Thăm {get_label(graph, current)}", currentNodeId=current, visited=list(visited), stack=list(stack)))
-        logs.append(f"Thăm {get_label(graph, current)}")
+        visited[current] = True
+        order.append(ids[current])
+        if not len(order) % TICK_INTERVAL:
+            yield None
+        # Summary traces keep the visits and skip the individual pushes
+        if tracing:
+            yield AlgorithmStep('visit', current, currentNodeId=ids[current], visited=ListView(order), stack=stack_ids[:])
+        logs.append(('visit', current))
+
+        for a in range(offsets[current + 1] - 1, offsets[current] - 1, -1):  # Reversed for standard DFS order
+            v = targets[a]
+            if not visited[v]:
+                stack.append(v)
+                if tracing:
+                    stack_ids.append(ids[v])
+                    if full:
+                        yield AlgorithmStep('dfs.push', v, stack=stack_ids[:])
+
+    return AlgorithmResult(visited=order, logs=logs, labels=labels)
+
+def run_dfs(graph: GraphData, start_id: str, trace: str = 'full') -> AlgorithmResult:
+    return collect_steps(iter_dfs(graph, start_id, trace))
+
+def iter_dijkstra(graph: GraphData, start_id: str, end_id: Optional[str] = None, mode: str = 'classic', trace: str = 'full',
+                  end_ids: Optional[Any] = None, heap: str = 'binary') -> Iterator[AlgorithmStep]:
+    """Dijkstra from start_id, stopping once end_id (and every id in end_ids) is settled.
+
+    end_ids is a list of targets or 'all'; the result then also maps each of them
+    to its path in paths (None when unreachable), all from one run. heap picks the
+    queue of the classic mode: 'binary' (IndexedHeap) or 'radix' (RadixHeap, for
+    positive integer weights).
+    """
+    if mode not in ('classic', 'bidirectional'):
+        raise ValueError(f"Không hỗ trợ chế độ {mode}")
+    if heap not in ('binary', 'radix'):
+        raise ValueError(f"Không hỗ trợ hàng đợi {heap}")
+    cg = yield from iter_compile_graph(graph)
+    if any(w < 0 for w in cg.edge_weight):
+        raise ValueError("Dijkstra không hỗ trợ trọng số âm")
+    if heap == 'radix' and not all(type(w) is int and w > 0 for w in cg.edge_weight):
+        raise ValueError("Radix heap chỉ hỗ trợ trọng số nguyên dương")
+    if mode == 'bidirectional':
+        if not end_id:
+            raise ValueError("Dijkstra hai chiều cần đỉnh kết thúc")
+        if end_ids is not None:
+            raise ValueError("Dijkstra hai chiều chỉ hỗ trợ một đỉnh kết thúc")
+        return (yield from _iter_bidirectional_dijkstra(cg, start_id, end_id, trace))
+
+    ids, labels = cg.ids, cg.labels
+    offsets, targets, weights = cg.out_offsets, cg.out_targets, cg.out_weights
+    rank = cg.rank
+    start = cg.node_index(start_id)
+    if end_ids == 'all':
+        wanted = list(range(cg.n))
+    else:
+        wanted = [cg.node_index(t) for t in (end_ids or [])]
+    # Stop once every requested target is settled; 'all' never stops early
+    pending = set(wanted)
+    if end_id:
+        pending.add(cg.node_index(end_id))
+    stop_early = end_ids != 'all' and bool(pending)
+    distances = [INF] * cg.n
+    distances[start] = 0
+    previous = [None] * cg.n
+    # Keys order by (distance, id) like the old lazy heap; the radix heap packs the
+    # rank into the low digits, which stays monotone because weights are >= 1
+    n = cg.n
+    if heap == 'radix':
+        queue, key = RadixHeap(n), (lambda d, v: d * n + rank[v])
+    else:
+        queue, key = IndexedHeap(n), (lambda d, v: (d, rank[v]))
+    queue.push(start, key(0, start))
+    logs = []
+    order = []
+    full, tracing = trace == 'full', trace != 'none'
+    distance_log = Journal(_id_map(cg, distances)) if tracing else None
 
-        for neigh in reversed(adj[current]):  # Reversed for standard DFS order
-            if neigh['node'] not in visited:
-                stack.append(neigh['node'])
-                steps.append(AlgorithmStep(log=f"Thêm {get_label(graph, neigh['node'])} vào stack", stack=list(stack)))
+    if tracing:
+        yield AlgorithmStep('dijkstra.start', start, distances=distance_log.view(), pq=[(0, start_id)])
 
-    return AlgorithmResult(visited=order, steps=steps, logs=logs)
+    # Each vertex is queued at most once and popped with its final distance
+    while queue:
+        current_node, _ = queue.pop()
+        current_distance = distances[current_node]
+        order.append(ids[current_node])
+        if not len(order) % TICK_INTERVAL:
+            yield None
+        if tracing:
+            yield AlgorithmStep('dijkstra.visit', current_node, current_distance, currentNodeId=ids[current_node], visited=ListView(order), distances=distance_log.view())
+        logs.append(('dijkstra.settled', current_node, current_distance))
+
+        if stop_early:
+            pending.discard(current_node)
+            if not pending:
+                break
 
-def run_dijkstra(graph: GraphData, start_id: str, end_id: Optional[str] = None) -> AlgorithmResult:
-    if any(l['weight'] < 0 for l in graph.links):
-        raise ValueError("Dijkstra không hỗ trợ trọng số âm")
+        for a in range(offsets[current_node], offsets[current_node + 1]):
+            v = targets[a]
+            alt = current_distance + weights[a]
+            if alt < distances[v]:
+                distances[v] = alt
+                previous[v] = current_node
+                queue.push(v, key(alt, v))
+                if tracing:
+                    distance_log.set(ids[v], alt)
+                    # Summary traces only show the settled vertices
+                    if full:
+                        yield AlgorithmStep('dijkstra.relax', v, alt, distances=distance_log.view(), currentLinkId={'source': ids[current_node], 'target': ids[v]})
+
+    previous_ids = _id_map(cg, [ids[p] if p is not None else None for p in previous])
+    path = reconstruct_path(previous_ids, end_id) if end_id else None
+    result = AlgorithmResult(path=path, distances=_id_map(cg, distances), previous=previous_ids, settledCount=len(order), logs=logs, labels=labels)
+    if end_ids is not None:
+        result.paths = {ids[t]: reconstruct_path(previous_ids, ids[t]) if distances[t] != INF else None for t in wanted}
+    return result
+
+def run_dijkstra(graph: GraphData, start_id: str, end_id: Optional[str] = None, mode: str = 'classic', trace: str = 'full',
+                 end_ids: Optional[Any] = None, heap: str = 'binary') -> AlgorithmResult:
+    return collect_steps(iter_dijkstra(graph, start_id, end_id, mode, trace, end_ids, heap))
+
+def _iter_bidirectional_dijkstra(cg: CompiledGraph, start_id: str, end_id: str, trace: str) -> Iterator[AlgorithmStep]:
+    """Dijkstra from both ends at once: forward over out-arcs from the start, backward
+    over in-arcs from the end, always expanding the side with the smaller queue key.
+    Stops once the two keys add up to at least the best meeting distance found."""
+    ids, labels = cg.ids, cg.labels
+    rank, ranked = cg.rank, cg.ranked
+    start, end = cg.node_index(start_id), cg.node_index(end_id)
+    # side 0 searches forward from start, side 1 backward from end
+    arcs = ((cg.out_offsets, cg.out_targets, cg.out_weights), (cg.in_offsets, cg.in_sources, cg.in_weights))
+    dist = ([INF] * cg.n, [INF] * cg.n)
+    prev = ([None] * cg.n, [None] * cg.n)
+    settled = ([False] * cg.n, [False] * cg.n)
+    dist[0][start] = 0
+    dist[1][end] = 0
+    queues = ([(0, rank[start])], [(0, rank[end])])
+    side_names = ('nguồn', 'đích')
+    best, meet = (0, start) if start == end else (INF, None)
+    logs = []
+    order = []
+    full, tracing = trace == 'full', trace != 'none'
+    distance_log = Journal(_id_map(cg, dist[0])) if tracing else None
 
-    adj = get_adjacency_list(graph)
-    distances = {n['id']: float('inf') for n in graph.nodes}
-    distances[start_id] = 0
-    previous = {n['id']: None for n in graph.nodes}
-    pq = [(0, start_id)]
-    steps = []
+    if tracing:
+        yield AlgorithmStep('bidi.start', start, end, distances=distance_log.view())
+
+    while queues[0] and queues[1] and queues[0][0][0] + queues[1][0][0] < best:
+        side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+        d, r = heapq.heappop(queues[side])
+        u = ranked[r]
+        if settled[side][u]:
+            continue
+        settled[side][u] = True
+        order.append(ids[u])
+        if not len(order) % TICK_INTERVAL:
+            yield None
+        if tracing:
+            yield AlgorithmStep('bidi.visit', u, side_names[side], d, currentNodeId=ids[u], visited=ListView(order), distances=distance_log.view())
+        logs.append(('bidi.visit', u, side_names[side], d))
+
+        offsets, targets, weights = arcs[side]
+        mine, other = dist[side], dist[1 - side]
+        for a in range(offsets[u], offsets[u + 1]):
+            v = targets[a]
+            alt = d + weights[a]
+            if alt + other[v] < best:
+                best, meet = alt + other[v], v
+            if alt < mine[v]:
+                mine[v] = alt
+                prev[side][v] = u
+                heapq.heappush(queues[side], (alt, rank[v]))
+                if tracing:
+                    if side == 0:
+                        distance_log.set(ids[v], alt)
+                    if full:
+                        link = {'source': ids[u], 'target': ids[v]} if side == 0 else {'source': ids[v], 'target': ids[u]}
+                        yield AlgorithmStep('bidi.relax', v, side_names[side], alt, distances=distance_log.view(), currentLinkId=link)
+
+    # Report forward distances, completed along the backward half of the path so
+    # previous leads from end back to start like in one-sided Dijkstra
+    distances, previous = dist[0], prev[0]
+    if meet is not None:
+        logs.append(('bidi.meet', meet, best))
+        v = meet
+        while v != end:
+            w = prev[1][v]
+            previous[w] = v
+            distances[w] = best - dist[1][w]
+            if tracing:
+                distance_log.set(ids[w], distances[w])
+            v = w
+        if tracing:
+            yield AlgorithmStep('bidi.meet', meet, best, currentNodeId=ids[meet], visited=ListView(order), distances=distance_log.view())
+
+    previous = _id_map(cg, [ids[p] if p is not None else None for p in previous])
+    path = reconstruct_path(previous, end_id)
+    return AlgorithmResult(path=path, distances=_id_map(cg, distances), previous=previous, settledCount=len(order), logs=logs, labels=labels)
+
+def _euclidean_heuristic(cg: CompiledGraph, target: int) -> Optional[List[float]]:
+    """Straight-line distance to target scaled to weight units, or None when that is not a lower bound.
+
+    Scaling by the smallest weight/length ratio over all edges keeps the heuristic
+    consistent (h(u) <= w(u, v) + h(v)), so A* never has to reopen a vertex. Any
+    node without x/y coordinates, or a zero ratio, falls back to plain Dijkstra.
+    """
+    coords = [None] * cg.n
+    for node in cg.graph.nodes:
+        x, y = node.get('x'), node.get('y')
+        if isinstance(x, (int, float)) and isinstance(y, (int, float)):
+            coords[cg.index[node['id']]] = (x, y)
+    if any(c is None for c in coords):
+        return None
+
+    scale = INF
+    for e in range(cg.m):
+        (x1, y1), (x2, y2) = coords[cg.edge_source[e]], coords[cg.edge_target[e]]
+        length = math.hypot(x1 - x2, y1 - y2)
+        if length > 0:
+            scale = min(scale, cg.edge_weight[e] / length)
+    if scale == INF or scale <= 0:
+        return None
+    # Shave off float rounding so the bound stays strictly admissible
+    scale *= 1 - 1e-9
+    tx, ty = coords[target]
+    return [scale * math.hypot(x - tx, y - ty) for x, y in coords]
+
+def iter_astar(graph: GraphData, start_id: str, end_id: str, trace: str = 'full') -> Iterator[AlgorithmStep]:
+    cg = yield from iter_compile_graph(graph)
+    if any(w < 0 for w in cg.edge_weight):
+        raise ValueError("A* không hỗ trợ trọng số âm")
+
+    ids, labels = cg.ids, cg.labels
+    offsets, targets, weights = cg.out_offsets, cg.out_targets, cg.out_weights
+    rank, ranked = cg.rank, cg.ranked
+    start, end = cg.node_index(start_id), cg.node_index(end_id)
+    heuristic = _euclidean_heuristic(cg, end) or [0] * cg.n
+    distances = [INF] * cg.n
+    distances[start] = 0
+    previous = [None] * cg.n
+    # Entries are (g + h, rank, g); an entry whose g is above the current distance is stale
+    pq = [(heuristic[start], rank[start], 0)]
     logs = []
-    visited = set()
+    visited = [False] * cg.n
+    order = []
+    full, tracing = trace == 'full', trace != 'none'
+    distance_log = Journal(_id_map(cg, distances)) if tracing else None
 
-    steps.append(AlgorithmStep(log=f"Bắt đầu Dijkstra từ {get_label(graph, start_id)}", distances=distances.copy(), pq=pq.copy()))
+    if full:
+        yield AlgorithmStep('astar.start', start, end, distances=distance_log.view(), heuristic=_id_map(cg, [round(h, 2) for h in heuristic]))
+    elif tracing:
+        yield AlgorithmStep('astar.start', start, end, distances=distance_log.view())
 
     while pq:
-        current_distance, current_node = heapq.heappop(pq)
-        if current_node in visited:
+        f, r, g = heapq.heappop(pq)
+        u = ranked[r]
+        if visited[u] or g > distances[u]:
             continue
-        visited.add(current_node)
-        steps.append(AlgorithmStep(log=f"Thăm {get_label(graph, current_node)} với khoảng cách {current_distance}", currentNodeId=current_node, visited=list(visited), distances=distances.copy()))
-        logs.append(f"Thăm {get_label(graph, current_node)}: {current_distance}")
-
-        if end_id and current_node == end_id:
+        visited[u] = True
+        order.append(ids[u])
+        if not len(order) % TICK_INTERVAL:
+            yield None
+        if tracing:
+            yield AlgorithmStep('astar.visit', u, g, round(f, 2), currentNodeId=ids[u], visited=ListView(order), distances=distance_log.view())
+        logs.append(('dijkstra.settled', u, g))
+
+        if u == end:
             break
 
-        for neigh in adj[current_node]:
-            alt = current_distance + neigh['weight']
-            if alt < distances[neigh['node']]:
-                distances[neigh['node']] = alt
-                previous[neigh['node']] = current_node
-                heapq.heappush(pq, (alt, neigh['node']))
-                steps.append(AlgorithmStep(log=f"Cập nhật khoảng cách đến {get_label(graph, neigh['node'])}: {alt}", distances=distances.copy(), currentLinkId={'source': current_node, 'target': neigh['node']}))
-
-    path = reconstruct_path(previous, end_id) if end_id else None
-    return AlgorithmResult(path=path, distances=distances, previous=previous, steps=steps, logs=logs)
-
-def run_bellman_ford(graph: GraphData, start_id: str, end_id: Optional[str] = None) -> AlgorithmResult:
-    adj = get_adjacency_list(graph)
-    distances = {n['id']: float('inf') for n in graph.nodes}
-    distances[start_id] = 0
-    previous = {n['id']: None for n in graph.nodes}
-    steps = []
+        for a in range(offsets[u], offsets[u + 1]):
+            v = targets[a]
+            alt = g + weights[a]
+            if alt < distances[v]:
+                distances[v] = alt
+                previous[v] = u
+                heapq.heappush(pq, (alt + heuristic[v], rank[v], alt))
+                if tracing:
+                    distance_log.set(ids[v], alt)
+                    if full:
+                        yield AlgorithmStep('dijkstra.relax', v, alt, distances=distance_log.view(), currentLinkId={'source': ids[u], 'target': ids[v]})
+
+    previous = _id_map(cg, [ids[p] if p is not None else None for p in previous])
+    path = reconstruct_path(previous, end_id)
+    return AlgorithmResult(path=path, distances=_id_map(cg, distances), previous=previous, settledCount=len(order), logs=logs, labels=labels)
+
+def run_astar(graph: GraphData, start_id: str, end_id: str, trace: str = 'full') -> AlgorithmResult:
+    return collect_steps(iter_astar(graph, start_id, end_id, trace))
+
+def _predecessor_cycle(previous: List[Optional[int]], v: int) -> Optional[List[int]]:
+    """The cycle reached by following previous links from v, in edge order and closed, or None."""
+    seen = {}
+    chain = []
+    while v is not None and v not in seen:
+        seen[v] = len(chain)
+        chain.append(v)
+        v = previous[v]
+    if v is None:
+        return None
+    cycle = chain[seen[v]:]
+    cycle.reverse()
+    return cycle + [cycle[0]]
+
+def _negative_cycle(n: int, edges: List[Tuple[int, int, Any]], distances: List[Any], previous: List[Optional[int]]) -> Iterator[None]:
+    """Witness for a negative cycle once Bellman-Ford still relaxes after n - 1 rounds.
+
+    Every cycle formed by predecessor links is negative, so keep relaxing (with
+    immediate updates) until one appears; n more passes are always enough. Ticks
+    every TICK_INTERVAL edges and returns the cycle, or None.
+    """
+    distances, previous = distances[:], previous[:]
+    for _ in range(n + 1):
+        last = None
+        for chunk in range(0, len(edges), TICK_INTERVAL):
+            for u, v, w in edges[chunk:chunk + TICK_INTERVAL]:
+                if distances[u] != INF and distances[u] + w < distances[v]:
+                    distances[v] = distances[u] + w
+                    previous[v] = u
+                    last = v
+            yield None
+        if last is None:
+            return None
+        cycle = _predecessor_cycle(previous, last)
+        if cycle:
+            return cycle
+    return None
+
+def iter_bellman_ford(graph: GraphData, start_id: str, end_id: Optional[str] = None, mode: str = 'rounds', trace: str = 'full') -> Iterator[AlgorithmStep]:
+    """Bellman-Ford in synchronous rounds (the textbook presentation) or as SPFA.
+
+    A reachable negative cycle does not raise: the result carries it as
+    negativeCycle (node ids, first == last) and path is None.
+    """
+    if mode not in ('rounds', 'spfa'):
+        raise ValueError(f"Không hỗ trợ chế độ {mode}")
+    cg = yield from iter_compile_graph(graph)
+    ids, labels = cg.ids, cg.labels
+    start = cg.node_index(start_id)
+    distances = [INF] * cg.n
+    distances[start] = 0
+    previous = [None] * cg.n
     logs = []
 
-    nodes = [n['id'] for n in graph.nodes]
-    edges = [(l['source'], l['target'], l['weight']) for l in graph.links]
+    edges = list(zip(cg.edge_source, cg.edge_target, cg.edge_weight))
     if not graph.isDirected:
-        edges += [(l['target'], l['source'], l['weight']) for l in graph.links]
-
-    logs.append(f"Bắt đầu Bellman-Ford từ {get_label(graph, start_id)}")
-    logs.append(f"Khởi tạo: d[{get_label(graph, start_id)}] = 0, các đỉnh khác = ∞")
-    steps.append(AlgorithmStep(
-        log=f"Bắt đầu Bellman-Ford từ {get_label(graph, start_id)}",
-        distances=distances.copy()
-    ))
-
-    for i in range(len(nodes) - 1):
-        updated = False
-        iteration_updates = []
-        
-        logs.append(f"--- Vòng lặp {i+1} ---")
-        
-        # CRITICAL: Use snapshot of distances at START of iteration
-        distances_snapshot = distances.copy()
-        
-        for u, v, w in edges:
-            # Use snapshot distances for calculation
-            if distances_snapshot[u] != float('inf') and distances_snapshot[u] + w < distances_snapshot[v]:
-                new_dist = distances_snapshot[u] + w
-                
-                # Only record if this is actually an improvement over current distance
-                if new_dist < distances[v]:
-                    updated = True
-                    
-                    # Record this update (but don't apply yet within loop)
-                    iteration_updates.append({
-                        'u': u,
-                        'v': v,
-                        'new_dist': new_dist
-                    })
-        
-        # Apply all updates AFTER checking all edges
-        for update in iteration_updates:
-            v = update['v']
-            new_dist = update['new_dist']
-            distances[v] = new_dist
-            
-            # Find which edge gave this distance
-            for u, target, w in edges:
-                if target == v and distances_snapshot[u] + w == new_dist:
+        edges += list(zip(cg.edge_target, cg.edge_source, cg.edge_weight))
+
+    full, tracing = trace == 'full', trace != 'none'
+    distance_log = Journal(_id_map(cg, distances)) if tracing else None
+
+    logs.append(('bf.start', start))
+    logs.append(('bf.init', start))
+    if tracing:
+        yield AlgorithmStep(
+            'bf.start', start,
+            distances=distance_log.view()
+        )
+
+    negative = None
+    if mode == 'spfa':
+        # Queue of vertices whose distance dropped. length[v] counts the edges on
+        # the current path to v; a path of n edges repeats a vertex, and since it
+        # only ever got shorter, the repeated part is a negative cycle
+        offsets, targets, weights = cg.out_offsets, cg.out_targets, cg.out_weights
+        queue = deque([start])
+        in_queue = [False] * cg.n
+        in_queue[start] = True
+        length = [0] * cg.n
+        # Vertices queued during one generation form the next one, like a round
+        generation, generation_left, generation_updates = 0, 1, 0
+        pops = 0
+        while queue and negative is None:
+            u = queue.popleft()
+            in_queue[u] = False
+            pops += 1
+            if not pops % TICK_INTERVAL:
+                yield None
+            for a in range(offsets[u], offsets[u + 1]):
+                v = targets[a]
+                alt = distances[u] + weights[a]
+                if alt < distances[v]:
+                    distances[v] = alt
                     previous[v] = u
-                    break
-        
-        # Log all updates for this iteration
-        if iteration_updates:
-            for update in iteration_updates:
-                u, v, new_dist = update['u'], update['v'], update['new_dist']
-                log_msg = f"Relax {get_label(graph, u)} → {get_label(graph, v)}: {int(new_dist)}"
-                logs.append(log_msg)
-                
-                steps.append(AlgorithmStep(
-                    log=log_msg,
-                    currentLinkId={'source': u, 'target': v},
-                    distances=distances.copy()
-                ))
-        
-        if not updated:
-            logs.append("Không có cập nhật, thuật toán hội tụ")
-            steps.append(AlgorithmStep(
-                log="Không có cập nhật, thuật toán hội tụ",
-                distances=distances.copy()
-            ))
-            break
-
-    # Check negative cycle
-    for u, v, w in edges:
-        if distances[u] != float('inf') and distances[u] + w < distances[v]:
-            raise ValueError("Đồ thị có chu trình âm")
+                    generation_updates += 1
+                    logs.append(('bf.relax', u, v, alt))
+                    if tracing:
+                        distance_log.set(ids[v], alt)
+                        if full:
+                            yield AlgorithmStep(
+                                'bf.relax', u, v, alt,
+                                currentLinkId={'source': ids[u], 'target': ids[v]},
+                                distances=distance_log.view()
+                            )
+                    length[v] = length[u] + 1
+                    if length[v] >= cg.n:
+                        negative = yield from _negative_cycle(cg.n, edges, distances, previous)
+                        if negative is not None:
+                            break
+                    if not in_queue[v]:
+                        in_queue[v] = True
+                        queue.append(v)
+            generation_left -= 1
+            if not generation_left:
+                generation += 1
+                if tracing and not full and generation_updates:
+                    yield AlgorithmStep(
+                        'bf.round.done', generation, generation_updates,
+                        distances=distance_log.view()
+                    )
+                generation_left, generation_updates = len(queue), 0
+    else:
+        converged = False
+        for i in range(cg.n - 1):
+            updated = False
+            iteration_updates = []
+            # First edge giving each (vertex, distance), recorded while relaxing
+            sources = {}
+
+            logs.append(('bf.round', i + 1))
+
+            # CRITICAL: Use snapshot of distances at START of iteration
+            distances_snapshot = distances[:]
+
+            # Edges in chunks of TICK_INTERVAL, with a tick after each
+            for chunk in range(0, len(edges), TICK_INTERVAL):
+                for u, v, w in edges[chunk:chunk + TICK_INTERVAL]:
+                    # Use snapshot distances for calculation
+                    if distances_snapshot[u] != INF and distances_snapshot[u] + w < distances_snapshot[v]:
+                        new_dist = distances_snapshot[u] + w
+
+                        # Only record if this is actually an improvement over current distance
+                        if new_dist < distances[v]:
+                            updated = True
+
+                            # Record this update (but don't apply yet within loop)
+                            iteration_updates.append((u, v, new_dist))
+                            sources.setdefault((v, new_dist), u)
+                yield None
+
+            # Apply all updates AFTER checking all edges, keeping the best one per vertex
+            for _, v, new_dist in iteration_updates:
+                if new_dist < distances[v]:
+                    distances[v] = new_dist
+                    previous[v] = sources[(v, new_dist)]
+                    if tracing:
+                        distance_log.set(ids[v], new_dist)
+
+            # Log all updates for this iteration
+            for u, v, new_dist in iteration_updates:
+                logs.append(('bf.relax', u, v, new_dist))
+
+                if full:
+                    yield AlgorithmStep(
+                        'bf.relax', u, v, new_dist,
+                        currentLinkId={'source': ids[u], 'target': ids[v]},
+                        distances=distance_log.view()
+                    )
+
+            # Summary traces show one step per round instead of every relaxation
+            if updated and tracing and not full:
+                yield AlgorithmStep(
+                    'bf.round.done', i + 1, len(iteration_updates),
+                    distances=distance_log.view()
+                )
+
+            if not updated:
+                converged = True
+                logs.append(('bf.converged',))
+                if tracing:
+                    yield AlgorithmStep(
+                        'bf.converged',
+                        distances=distance_log.view()
+                    )
+                break
 
-    logs.append("Hoàn thành Bellman-Ford")
+        # Check negative cycle
+        if not converged and any(distances[u] != INF and distances[u] + w < distances[v] for u, v, w in edges):
+            negative = yield from _negative_cycle(cg.n, edges, distances, previous)
+            if negative is None:
+                raise ValueError("Đồ thị có chu trình âm")
+
+    if negative:
+        logs.append(('bf.negative', negative))
+        if tracing:
+            cycle_links = [{'source': ids[u], 'target': ids[v]} for u, v in zip(negative, negative[1:])]
+            yield AlgorithmStep(
+                'bf.negative', negative,
+                visitedLinks=cycle_links,
+                path=[labels[v] for v in negative],
+                distances=distance_log.view()
+            )
+        return AlgorithmResult(path=None, distances=_id_map(cg, distances), previous=_id_map(cg, [ids[p] if p is not None else None for p in previous]),
+                               negativeCycle=[ids[v] for v in negative], logs=logs, labels=labels)
+
+    logs.append(('bf.done',))
+    previous = _id_map(cg, [ids[p] if p is not None else None for p in previous])
     path = reconstruct_path(previous, end_id) if end_id else None
-    return AlgorithmResult(path=path, distances=distances, previous=previous, steps=steps, logs=logs)
+    return AlgorithmResult(path=path, distances=_id_map(cg, distances), previous=previous, negativeCycle=None, logs=logs, labels=labels)
+
+def run_bellman_ford(graph: GraphData, start_id: str, end_id: Optional[str] = None, mode: str = 'rounds', trace: str = 'full') -> AlgorithmResult:
+    return collect_steps(iter_bellman_ford(graph, start_id, end_id, mode, trace))
 
-def run_prim(graph: GraphData) -> AlgorithmResult:
+def iter_prim(graph: GraphData, trace: str = 'full') -> Iterator[AlgorithmStep]:
     if graph.isDirected:
         raise ValueError("Prim chỉ hỗ trợ đồ thị vô hướng")
 
-    adj = get_adjacency_list(graph)
-    nodes = [n['id'] for n in graph.nodes]
-    if not nodes:
+    cg = yield from iter_compile_graph(graph)
+    if not cg.n:
         return AlgorithmResult(mstLinks=[])
 
-    start = nodes[0]
-    in_mst = set([start])
+    ids, labels = cg.ids, cg.labels
+    offsets, targets, weights = cg.out_offsets, cg.out_targets, cg.out_weights
+    rank, ranked = cg.rank, cg.ranked
+    start = 0
+
+    if trace == 'none':
+        tree = _boruvka_tree(cg, distinct=True)
+        if tree is not None:
+            # With distinct weights the lightest link leaving the tree is always a
+            # forest link, so Prim over the forest alone adds the same links in the
+            # same order
+            offsets, targets, weights = tree
+    mst_order = [ids[start]]
     mst_links = []
-    steps = []
     logs = []
-    pq = []
-
-    for neigh in adj[start]:
-        heapq.heappush(pq, (neigh['weight'], start, neigh['node']))
-
-    steps.append(AlgorithmStep(log=f"Bắt đầu Prim từ {get_label(graph, start)}", in_mst=list(in_mst), pq=pq.copy()))
-
-    while pq and len(in_mst) < len(nodes):
-        w, u, v = heapq.heappop(pq)
-        if v in in_mst:
-            continue
-        in_mst.add(v)
-        mst_links.append({'source': u, 'target': v, 'weight': w})
-        steps.append(AlgorithmStep(log=f"Thêm cạnh {get_label(graph, u)} - {get_label(graph, v)} ({w})", currentLinkId={'source': u, 'target': v}, mstLinks=mst_links.copy(), in_mst=list(in_mst)))
-        logs.append(f"Thêm {get_label(graph, u)} - {get_label(graph, v)} ({w})")
-
-        for neigh in adj[v]:
-            if neigh['node'] not in in_mst:
-                heapq.heappush(pq, (neigh['weight'], v, neigh['node']))
-
-    return AlgorithmResult(mstLinks=mst_links, steps=steps, logs=logs)
-
-def run_kruskal(graph: GraphData) -> AlgorithmResult:
+    queue = IndexedHeap(cg.n)
+    # Weight of each vertex's queued link; -INF once it is in the tree, so one
+    # comparison skips both tree vertices and links that cannot improve the key
+    best_weight = [INF] * cg.n
+    best_weight[start] = -INF
+
+    # Each outside vertex keeps only its best link into the tree, keyed
+    # (weight, rank[u], rank[v]) so ties resolve by id as before
+    for a in range(offsets[start], offsets[start + 1]):
+        x = targets[a]
+        if weights[a] <= best_weight[x]:
+            best_weight[x] = weights[a]
+            queue.push(x, (weights[a], rank[start], rank[x]))
+
+    tracing = trace != 'none'
+    if trace == 'full':
+        yield AlgorithmStep('prim.start', start, in_mst=ListView(mst_order), pq=[(w, ids[ranked[ru]], ids[ranked[rv]]) for _, (w, ru, rv) in queue.items()])
+    elif tracing:
+        yield AlgorithmStep('prim.start', start, in_mst=ListView(mst_order))
+
+    while queue and len(mst_order) < cg.n:
+        v, (w, ru, _) = queue.pop()
+        u = ranked[ru]
+        best_weight[v] = -INF
+        mst_order.append(ids[v])
+        if not len(mst_order) % TICK_INTERVAL:
+            yield None
+        mst_links.append({'source': ids[u], 'target': ids[v], 'weight': w})
+        if tracing:
+            yield AlgorithmStep('mst.add', u, v, w, currentLinkId={'source': ids[u], 'target': ids[v]}, mstLinks=ListView(mst_links), in_mst=ListView(mst_order))
+        logs.append(('mst.added', u, v, w))
+
+        for a in range(offsets[v], offsets[v + 1]):
+            x = targets[a]
+            if weights[a] <= best_weight[x]:
+                if queue.push(x, (weights[a], rank[v], rank[x])):
+                    best_weight[x] = weights[a]
+
+    return AlgorithmResult(mstLinks=mst_links, logs=logs, labels=labels)
+
+def run_prim(graph: GraphData, trace: str = 'full') -> AlgorithmResult:
+    return collect_steps(iter_prim(graph, trace))
+
+def iter_kruskal(graph: GraphData, trace: str = 'full') -> Iterator[AlgorithmStep]:
     if graph.isDirected:
         raise ValueError("Kruskal chỉ hỗ trợ đồ thị vô hướng")
 
-    edges = sorted(graph.links, key=lambda l: l['weight'])
-    parent = {n['id']: n['id'] for n in graph.nodes}
-    rank = {n['id']: 0 for n in graph.nodes}
+    cg = yield from iter_compile_graph(graph)
+    labels = cg.labels
+    if trace == 'none':
+        chosen = _boruvka_edges(cg)
+        if chosen is not None:
+            # Borůvka with ties broken by link index picks exactly the links Kruskal
+            # would, and they come back in Kruskal order
+            mst_links = [graph.links[e] for e in chosen]
+            logs = [('mst.added', cg.edge_source[e], cg.edge_target[e], graph.links[e]['weight']) for e in chosen]
+            return AlgorithmResult(mstLinks=mst_links, logs=logs, labels=labels)
+
+    order = sorted(range(cg.m), key=cg.edge_weight.__getitem__)
+    parent = list(range(cg.n))
+    rank = [0] * cg.n
     mst_links = []
-    steps = []
     logs = []
 
     def find(x):
-        if parent[x] != x:
-            parent[x] = find(parent[x])
-        return parent[x]
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
 
     def union(x, y):
         px, py = find(x), find(y)
@@ -304,409 +1627,1097 @@ def run_kruskal(graph: GraphData) -> AlgorithmResult:
             rank[px] += 1
         return True
 
-    steps.append(AlgorithmStep(log="Bắt đầu Kruskal", edges=edges.copy()))
-
-    for edge in edges:
-        if union(edge['source'], edge['target']):
+    # The sorted edge list is only part of full traces
+    tracing = trace != 'none'
+    if trace == 'full':
+        yield AlgorithmStep('kruskal.start', edges=[graph.links[e] for e in order])
+    elif tracing:
+        yield AlgorithmStep('kruskal.start')
+
+    for i, e in enumerate(order, 1):
+        if not i % TICK_INTERVAL:
+            yield None
+        u, v = cg.edge_source[e], cg.edge_target[e]
+        if union(u, v):
+            edge = graph.links[e]
             mst_links.append(edge)
-            steps.append(AlgorithmStep(log=f"Thêm cạnh {get_label(graph, edge['source'])} - {get_label(graph, edge['target'])} ({edge['weight']})", currentLinkId={'source': edge['source'], 'target': edge['target']}, mstLinks=mst_links.copy()))
-            logs.append(f"Thêm {get_label(graph, edge['source'])} - {get_label(graph, edge['target'])} ({edge['weight']})")
-        if len(mst_links) == len(graph.nodes) - 1:
+            if tracing:
+                yield AlgorithmStep('mst.add', u, v, edge['weight'], currentLinkId={'source': edge['source'], 'target': edge['target']}, mstLinks=ListView(mst_links))
+            logs.append(('mst.added', u, v, edge['weight']))
+        if len(mst_links) == cg.n - 1:
+            break
+
+    return AlgorithmResult(mstLinks=mst_links, logs=logs, labels=labels)
+
+def run_kruskal(graph: GraphData, trace: str = 'full') -> AlgorithmResult:
+    return collect_steps(iter_kruskal(graph, trace))
+
+def _numeric_weights(cg: CompiledGraph) -> Optional[np.ndarray]:
+    # Link weights as a NumPy array, or None when NumPy cannot order them like Python does
+    weight = np.asarray(cg.edge_weight) if cg.m else np.zeros(0, dtype=np.int64)
+    if weight.ndim != 1 or weight.dtype.kind not in 'iuf' or (weight.dtype.kind == 'f' and np.isnan(weight).any()):
+        return None
+    return weight
+
+def _boruvka_rounds(cg: CompiledGraph, weight: np.ndarray) -> Iterator[Tuple[np.ndarray, int]]:
+    """Run Borůvka on the undirected graph, yielding (links, components) per round.
+
+    Links are ranked once by (weight, link index), so every component has a unique
+    lightest outgoing link and the forest is the one Kruskal builds. Each round picks
+    those links for all components at once, hooks the components along them and
+    contracts; links are yielded in rank order.
+    """
+    order = np.argsort(weight, kind='stable')
+    src = np.asarray(cg.edge_source, dtype=np.int64)[order]
+    dst = np.asarray(cg.edge_target, dtype=np.int64)[order]
+    comp = np.arange(cg.n, dtype=np.int64)
+    live = np.flatnonzero(src != dst)
+    components = cg.n
+    while live.size:
+        cu, cv = comp[src[live]], comp[dst[live]]
+        crossing = cu != cv
+        live, cu, cv = live[crossing], cu[crossing], cv[crossing]
+        if not live.size:
             break
+        # Lightest link leaving each component, by rank
+        best = np.full(cg.n, cg.m, dtype=np.int64)
+        np.minimum.at(best, cu, live)
+        np.minimum.at(best, cv, live)
+        heads = np.flatnonzero(best < cg.m)
+        picked = best[heads]
+        a, b = comp[src[picked]], comp[dst[picked]]
+        parent = np.arange(cg.n, dtype=np.int64)
+        parent[heads] = np.where(a == heads, b, a)
+        # Two components picking the same link point at each other; the smaller one
+        # becomes the root, then pointer jumping flattens the hooks
+        mutual = (parent[parent] == np.arange(cg.n)) & (parent < np.arange(cg.n))
+        parent[parent[mutual]] = parent[mutual]
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+        comp = parent[comp]
+        added = np.sort(picked)
+        added = added[np.concatenate(([True], added[1:] != added[:-1]))]
+        components -= len(added)
+        yield order[added], components
+
+def _boruvka_edges(cg: CompiledGraph) -> Optional[List[int]]:
+    # Minimum spanning forest links in Kruskal order, or None for non-numeric weights
+    weight = _numeric_weights(cg)
+    if weight is None:
+        return None
+    chosen = [added for added, _ in _boruvka_rounds(cg, weight)]
+    if not chosen:
+        return []
+    chosen = np.concatenate(chosen)
+    return chosen[np.lexsort((chosen, weight[chosen]))].tolist()
+
+def _boruvka_tree(cg: CompiledGraph, distinct: bool = False) -> Optional[Tuple[List[int], List[int], List[Any]]]:
+    """Adjacency (offsets, targets, weights) of the minimum spanning forest.
+
+    Arcs keep the out_* order of the full graph. Returns None when the weights are
+    not numeric or, with distinct=True, when two non-loop links share a weight.
+    """
+    weight = _numeric_weights(cg)
+    if weight is None:
+        return None
+    if distinct:
+        loops = np.asarray(cg.edge_source) == np.asarray(cg.edge_target)
+        ordered = np.sort(weight[~loops])
+        if (ordered[1:] == ordered[:-1]).any():
+            return None
+    in_tree = np.zeros(cg.m, dtype=bool)
+    for added, _ in _boruvka_rounds(cg, weight):
+        in_tree[added] = True
+    keep = in_tree[np.asarray(cg.out_edges, dtype=np.int64)]
+    owner = np.repeat(np.arange(cg.n), np.diff(np.asarray(cg.out_offsets)))
+    offsets = [0] + np.cumsum(np.bincount(owner[keep], minlength=cg.n)).tolist()
+    arcs = np.flatnonzero(keep).tolist()
+    return offsets, [cg.out_targets[a] for a in arcs], [cg.out_weights[a] for a in arcs]
+
+def iter_boruvka(graph: GraphData, trace: str = 'full') -> Iterator[AlgorithmStep]:
+    if graph.isDirected:
+        raise ValueError("Borůvka chỉ hỗ trợ đồ thị vô hướng")
+
+    cg = yield from iter_compile_graph(graph)
+    weight = _numeric_weights(cg)
+    if weight is None:
+        raise ValueError("Borůvka chỉ hỗ trợ trọng số là số")
+    labels = cg.labels
+    added_links = []
+    chosen = []
+    logs = []
+    rounds = 0
+    full, tracing = trace == 'full', trace != 'none'
+    if tracing:
+        yield AlgorithmStep('boruvka.start')
+
+    for added, components in _boruvka_rounds(cg, weight):
+        rounds += 1
+        added = added.tolist()
+        chosen.extend(added)
+        for e in added:
+            u, v = cg.edge_source[e], cg.edge_target[e]
+            edge = graph.links[e]
+            added_links.append(edge)
+            if full:
+                yield AlgorithmStep('mst.add', u, v, edge['weight'], currentLinkId={'source': edge['source'], 'target': edge['target']}, mstLinks=ListView(added_links))
+            logs.append(('mst.added', u, v, edge['weight']))
+        if tracing:
+            yield AlgorithmStep('boruvka.round', rounds, len(added), components, mstLinks=ListView(added_links))
+        else:
+            yield None
+        logs.append(('boruvka.round', rounds, len(added), components))
+
+    # Report the forest in Kruskal order so both engines return the same mstLinks
+    chosen.sort(key=lambda e: (cg.edge_weight[e], e))
+    return AlgorithmResult(mstLinks=[graph.links[e] for e in chosen], rounds=rounds, logs=logs, labels=labels)
+
+def run_boruvka(graph: GraphData, trace: str = 'full') -> AlgorithmResult:
+    return collect_steps(iter_boruvka(graph, trace))
+
+class FlowNetwork:
+    """Residual network over a CompiledGraph with paired arcs.
+
+    Arc 2e is link e and arc 2e + 1 its reverse, so a ^ 1 is always the partner
+    arc. residual[a] is the capacity left on arc a; pushing f units along a is
+    residual[a] -= f, residual[a ^ 1] += f. The arcs leaving u are
+    arcs[offsets[u]:offsets[u + 1]]: outgoing links in link order, then the
+    reverse arcs of incoming links.
+    """
+
+    def __init__(self, cg: CompiledGraph):
+        self.cg = cg
+        self.n = cg.n
+        head = [0] * (2 * cg.m)
+        residual = [0] * (2 * cg.m)
+        for e in range(cg.m):
+            head[2 * e] = cg.edge_target[e]
+            head[2 * e + 1] = cg.edge_source[e]
+            residual[2 * e] = cg.edge_capacity[e]
+        offsets = [0]
+        arcs = []
+        for u in range(cg.n):
+            arcs.extend(2 * e for e in cg.out_edges[cg.out_offsets[u]:cg.out_offsets[u + 1]])
+            arcs.extend(2 * e + 1 for e in cg.in_edges[cg.in_offsets[u]:cg.in_offsets[u + 1]])
+            offsets.append(len(arcs))
+        self.head = head
+        self.residual = residual
+        self.offsets = offsets
+        self.arcs = arcs
+
+    def push(self, path: List[int], amount: Any):
+        residual = self.residual
+        for a in path:
+            residual[a] -= amount
+            residual[a ^ 1] += amount
+
+    def bottleneck(self, path: List[int]) -> Any:
+        return min(self.residual[a] for a in path)
+
+    def levels(self, s: int) -> List[int]:
+        """BFS distance from s over arcs with residual capacity (-1 if unreachable)."""
+        head, residual, offsets, arcs = self.head, self.residual, self.offsets, self.arcs
+        level = [-1] * self.n
+        level[s] = 0
+        queue = deque([s])
+        while queue:
+            u = queue.popleft()
+            for i in range(offsets[u], offsets[u + 1]):
+                a = arcs[i]
+                v = head[a]
+                if level[v] < 0 and residual[a] > 0:
+                    level[v] = level[u] + 1
+                    queue.append(v)
+        return level
+
+    def shortest_path(self, s: int, t: int) -> Optional[List[int]]:
+        """Arcs of a shortest augmenting s-t path (Edmonds-Karp), or None."""
+        head, residual, offsets, arcs = self.head, self.residual, self.offsets, self.arcs
+        parent_arc = [-1] * self.n
+        seen = [False] * self.n
+        seen[s] = True
+        queue = deque([s])
+        while queue:
+            u = queue.popleft()
+            for i in range(offsets[u], offsets[u + 1]):
+                a = arcs[i]
+                v = head[a]
+                if not seen[v] and residual[a] > 0:
+                    seen[v] = True
+                    parent_arc[v] = a
+                    if v == t:
+                        path = []
+                        while v != s:
+                            a = parent_arc[v]
+                            path.append(a)
+                            v = head[a ^ 1]
+                        path.reverse()
+                        return path
+                    queue.append(v)
+        return None
 
-    return AlgorithmResult(mstLinks=mst_links, steps=steps, logs=logs)
+    def blocking_path(self, s: int, t: int, level: List[int], it: List[int]) -> Optional[List[int]]:
+        """Next s-t path in the level graph for Dinic's blocking flow, or None.
 
-def run_ford_fulkerson(graph: GraphData, source: str, sink: str) -> AlgorithmResult:
+        it[u] is u's position in arcs and only moves forward within a phase, so
+        all paths of one phase together scan each arc once.
+        """
+        head, residual, offsets, arcs = self.head, self.residual, self.offsets, self.arcs
+        path = []
+        u = s
+        while u != t:
+            end = offsets[u + 1]
+            while it[u] < end:
+                a = arcs[it[u]]
+                v = head[a]
+                if residual[a] > 0 and level[v] == level[u] + 1:
+                    break
+                it[u] += 1
+            if it[u] < end:
+                path.append(a)
+                u = v
+                continue
+            # Dead end: drop u from the level graph and retreat
+            if u == s:
+                return None
+            level[u] = -1
+            u = head[path.pop() ^ 1]
+            it[u] += 1
+        return path
+
+    def flow_details(self) -> Dict[str, Any]:
+        """Net flow per ordered node pair, keyed "source-target" like the old output."""
+        cg = self.cg
+        ids = cg.ids
+        net = {}
+        for e in range(cg.m):
+            f = cg.edge_capacity[e] - self.residual[2 * e]
+            if f:
+                u, v = cg.edge_source[e], cg.edge_target[e]
+                net[(u, v)] = net.get((u, v), 0) + f
+                net[(v, u)] = net.get((v, u), 0) - f
+        return {f"{ids[u]}-{ids[v]}": f for (u, v), f in net.items() if f > 0}
+
+    def min_cut(self, s: int) -> Dict[str, Any]:
+        """Source side of a minimum cut: everything still reachable from s."""
+        cg = self.cg
+        reachable = [d >= 0 for d in self.levels(s)]
+        cut_links = [e for e in range(cg.m) if reachable[cg.edge_source[e]] and not reachable[cg.edge_target[e]]]
+        return {
+            'sourceSide': [cg.ids[u] for u in range(cg.n) if reachable[u]],
+            'sinkSide': [cg.ids[u] for u in range(cg.n) if not reachable[u]],
+            'links': [cg.graph.links[e] for e in cut_links],
+            'capacity': sum(cg.edge_capacity[e] for e in cut_links),
+        }
+
+def iter_ford_fulkerson(graph: GraphData, source: str, sink: str, mode: str = 'edmondsKarp', trace: str = 'full') -> Iterator[AlgorithmStep]:
     if not graph.isDirected:
         raise ValueError("Ford-Fulkerson yêu cầu đồ thị có hướng")
+    if mode not in ('edmondsKarp', 'dinic'):
+        raise ValueError(f"Không hỗ trợ thuật toán luồng {mode}")
 
-    residual = copy.deepcopy(graph.links)
-    for link in residual:
-        link['flow'] = 0
+    cg = yield from iter_compile_graph(graph)
+    ids, labels = cg.ids, cg.labels
+    s_idx, t_idx = cg.node_index(source), cg.node_index(sink)
+    if s_idx == t_idx:
+        raise ValueError("Đỉnh nguồn và đỉnh đích phải khác nhau")
 
-    parent = {}
+    net = FlowNetwork(cg)
+    head = net.head
     max_flow = 0
-    steps = []
     logs = []
+    iteration = 0
 
-    def bfs():
-        visited = set()
-        queue = deque([source])
-        parent[source] = None
-        visited.add(source)
-
-        while queue:
-            u = queue.popleft()
-            for link in [l for l in residual if l['source'] == u and l['capacity'] - l['flow'] > 0]:
-                v = link['target']
-                if v not in visited:
-                    queue.append(v)
-                    visited.add(v)
-                    parent[v] = u
-                    if v == sink:
-                        return True
-        return False
-
-    steps.append(AlgorithmStep(log=f"Bắt đầu Ford-Fulkerson từ {get_label(graph, source)} đến {get_label(graph, sink)}"))
+    # Augmenting paths are already coarse, so summary traces match full ones
+    tracing = trace != 'none'
+    if tracing:
+        yield AlgorithmStep('ff.start', s_idx, t_idx)
 
-    iteration = 0
-    while bfs():
+    def augment(path_arcs):
+        nonlocal max_flow, iteration
         iteration += 1
-        path_flow = float('inf')
-        s = sink
-        path = []
-        path_nodes = []
-        
-        # Build path from sink to source
-        while s != source:
-            p = parent[s]
-            link = next(l for l in residual if l['source'] == p and l['target'] == s)
-            path_flow = min(path_flow, link['capacity'] - link['flow'])
-            path.insert(0, {'source': p, 'target': s})
-            path_nodes.insert(0, p)
-            s = p
-        path_nodes.append(sink)
-
-        # Update flows along the path
+        path_flow = net.bottleneck(path_arcs)
+        net.push(path_arcs, path_flow)
         max_flow += path_flow
-        v = sink
-        while v != source:
-            u = parent[v]
-            forward = next(l for l in residual if l['source'] == u and l['target'] == v)
-            forward['flow'] += path_flow
-
-            # Add reverse edge if not exist
-            reverse_exists = any(l['source'] == v and l['target'] == u for l in residual)
-            if not reverse_exists:
-                residual.append({'source': v, 'target': u, 'capacity': 0, 'weight': forward['weight'], 'flow': 0})
-            reverse = next(l for l in residual if l['source'] == v and l['target'] == u)
-            reverse['flow'] -= path_flow
-            v = u
+        path_nodes = [s_idx] + [head[a] for a in path_arcs]
 
         # Log once per augmenting path with formatted output
-        path_str = " → ".join([get_label(graph, node) for node in path_nodes])
-        log_msg = f"Lần {iteration}: {path_str}, luồng tăng = {int(path_flow)}, tổng = {int(max_flow)}"
-        logs.append(log_msg)
-        
-        steps.append(AlgorithmStep(
-            log=log_msg,
-            path=path.copy(),
-            flowDetails={f"{e['source']}-{e['target']}": path_flow for e in path}
-        ))
-
-    flow_details = {f"{l['source']}-{l['target']}": l['flow'] for l in residual if l['flow'] > 0}
-    return AlgorithmResult(maxFlow=max_flow, flowDetails=flow_details, steps=steps, logs=logs)
-
-def run_fleury(graph: GraphData) -> AlgorithmResult:
+        logs.append(('ff.augment', iteration, path_nodes, path_flow, max_flow))
+        if tracing:
+            path = [{'source': ids[u], 'target': ids[v]} for u, v in zip(path_nodes, path_nodes[1:])]
+            return AlgorithmStep(
+                'ff.augment', iteration, path_nodes, path_flow, max_flow,
+                path=path,
+                flowDetails={f"{e['source']}-{e['target']}": path_flow for e in path}
+            )
+
+    if mode == 'dinic':
+        phase = 0
+        while True:
+            level = net.levels(s_idx)
+            if level[t_idx] < 0:
+                break
+            phase += 1
+            logs.append(('dinic.phase', phase, level[t_idx]))
+            if tracing:
+                yield AlgorithmStep('dinic.phase', phase, level[t_idx], levels={ids[u]: d for u, d in enumerate(level) if d >= 0})
+            it = net.offsets[:-1]
+            while True:
+                path_arcs = net.blocking_path(s_idx, t_idx, level, it)
+                if path_arcs is None:
+                    break
+                # Without tracing step is None, a tick per augmenting path
+                yield augment(path_arcs)
+    else:
+        while True:
+            path_arcs = net.shortest_path(s_idx, t_idx)
+            if path_arcs is None:
+                break
+            yield augment(path_arcs)
+
+    min_cut = net.min_cut(s_idx)
+    logs.append(('ff.cut', len(min_cut['sourceSide']), len(min_cut['links']), min_cut['capacity']))
+    return AlgorithmResult(maxFlow=max_flow, flowDetails=net.flow_details(), minCut=min_cut, logs=logs, labels=labels)
+
+def run_ford_fulkerson(graph: GraphData, source: str, sink: str, mode: str = 'edmondsKarp', trace: str = 'full') -> AlgorithmResult:
+    return collect_steps(iter_ford_fulkerson(graph, source, sink, mode, trace))
+
+def _is_bridge(cg: CompiledGraph, e: int, u: int, v: int, used: List[bool]) -> bool:
+    """Whether unused edge e = u-v disconnects u from v among the unused edges.
+
+    Searches from u and from v at the same time without crossing e, one vertex
+    per side in turn. The sides meeting means e is on a cycle; either side running
+    out first means e is a bridge, and by then only the smaller side was explored.
+    """
+    if u == v:
+        return False
+    offsets, targets, edges = cg.out_offsets, cg.out_targets, cg.out_edges
+    side = {u: 0, v: 1}
+    queues = (deque([u]), deque([v]))
+    turn = 0
+    while True:
+        queue = queues[turn]
+        if not queue:
+            return True
+        x = queue.popleft()
+        for i in range(offsets[x], offsets[x + 1]):
+            f = edges[i]
+            if used[f] or f == e:
+                continue
+            y = targets[i]
+            seen = side.get(y)
+            if seen is None:
+                side[y] = turn
+                queue.append(y)
+            elif seen != turn:
+                return False
+        turn ^= 1
+
+def _fleury_moves(cg: CompiledGraph, start: int, used: List[bool]) -> Iterator[Tuple[int, int]]:
+    """Fleury's walk: at each vertex take the first unused edge that is not a bridge.
+
+    Edges are removed by id and each candidate is tested with _is_bridge instead
+    of copying the adjacency and running a full BFS.
+    """
+    offsets, targets, edges = cg.out_offsets, cg.out_targets, cg.out_edges
+    # First possibly unused arc of each vertex; arcs before it are all used
+    cursor = offsets[:-1]
+    current = start
+    while True:
+        i = cursor[current]
+        end = offsets[current + 1]
+        while i < end and used[edges[i]]:
+            i += 1
+        cursor[current] = i
+        if i == end:
+            return
+
+        choice = i
+        # With a single edge left there is nothing to choose
+        if any(not used[edges[k]] and edges[k] != edges[i] for k in range(i + 1, end)):
+            for k in range(i, end):
+                if not used[edges[k]] and not _is_bridge(cg, edges[k], current, targets[k], used):
+                    choice = k
+                    break
+
+        used[edges[choice]] = True
+        yield current, targets[choice]
+        current = targets[choice]
+
+def _euler_moves(cg: CompiledGraph, start: int, used: List[bool]) -> List[Tuple[int, int]]:
+    """Euler path from start in O(V + E): Hierholzer with per-vertex arc cursors."""
+    offsets, targets, edges = cg.out_offsets, cg.out_targets, cg.out_edges
+    cursor = offsets[:-1]
+    stack = [start]
+    path = []
+    while stack:
+        u = stack[-1]
+        i = cursor[u]
+        end = offsets[u + 1]
+        while i < end and used[edges[i]]:
+            i += 1
+        if i == end:
+            cursor[u] = i
+            path.append(stack.pop())
+        else:
+            cursor[u] = i + 1
+            used[edges[i]] = True
+            stack.append(targets[i])
+    path.reverse()
+    return list(zip(path, path[1:]))
+
+def iter_fleury(graph: GraphData, mode: str = 'classic', trace: str = 'full') -> Iterator[AlgorithmStep]:
+    """Euler path with Fleury's rule ('classic') or in linear time via Hierholzer ('fast').
+
+    Both modes emit the same fleury.* steps; 'fast' may pick a different, equally
+    valid path.
+    """
     if graph.isDirected:
         raise ValueError("Fleury cho đồ thị vô hướng")
+    if mode not in ('classic', 'fast'):
+        raise ValueError(f"Không hỗ trợ chế độ {mode}")
+
+    cg = yield from iter_compile_graph(graph)
+    ids, labels = cg.ids, cg.labels
 
-    # Build adjacency list with edge tracking
-    adj = defaultdict(list)
-    for link in graph.links:
-        adj[link['source']].append(link['target'])
-        adj[link['target']].append(link['source'])
-    
     # Check Euler conditions
-    degrees = {n['id']: len(adj[n['id']]) for n in graph.nodes}
-    odd_count = sum(1 for d in degrees.values() if d % 2 == 1)
+    odd_count = sum(1 for u in range(cg.n) if cg.degree(u) % 2 == 1)
     if odd_count not in (0, 2):
         raise ValueError("Đồ thị không Euler (số đỉnh bậc lẻ không là 0 hoặc 2)")
 
-    # Helper function to check if edge is a bridge
-    def is_bridge(u, v, adj_copy):
-        # Remove edge u-v temporarily
-        adj_copy[u].remove(v)
-        adj_copy[v].remove(u)
-        
-        # BFS to check if v is still reachable from u
-        if not adj_copy[u]:  # If u has no more edges, not a bridge
-            adj_copy[u].append(v)
-            adj_copy[v].append(u)
-            return False
-            
-        visited = set()
-        queue = deque([u])
-        visited.add(u)
-        
-        while queue:
-            node = queue.popleft()
-            for neighbor in adj_copy[node]:
-                if neighbor not in visited:
-                    visited.add(neighbor)
-                    queue.append(neighbor)
-        
-        # Restore edge
-        adj_copy[u].append(v)
-        adj_copy[v].append(u)
-        
-        return v not in visited
-
-    start = next((k for k, v in degrees.items() if v % 2 == 1), graph.nodes[0]['id'])
-    current = start
-    path = [current]
+    start = next((u for u in range(cg.n) if cg.degree(u) % 2 == 1), cg.node_index(graph.nodes[0]['id']))
+    used = [False] * cg.m
+    moves = _euler_moves(cg, start, used) if mode == 'fast' else _fleury_moves(cg, start, used)
+
+    path = [start]
+    path_labels = [labels[start]]
     visited_links = []
-    steps = []
     logs = []
 
-    steps.append(AlgorithmStep(log=f"Bắt đầu Fleury từ {get_label(graph, start)}", visitedLinks=[]))
+    full, tracing = trace == 'full', trace != 'none'
+    if tracing:
+        yield AlgorithmStep('fleury.start', start, visitedLinks=[])
 
-    # Traverse edges
-    while any(adj.values()):  # While there are still edges
-        neighbors = list(adj[current])
-        
-        if not neighbors:
-            break
-            
-        # Choose next edge: prefer non-bridge
-        next_vertex = None
-        for neighbor in neighbors:
-            adj_copy = {k: v[:] for k, v in adj.items()}
-            if not is_bridge(current, neighbor, adj_copy):
-                next_vertex = neighbor
-                break
-        
-        # If all edges are bridges, take any edge
-        if next_vertex is None:
-            next_vertex = neighbors[0]
-        
-        # Remove the edge
-        adj[current].remove(next_vertex)
-        adj[next_vertex].remove(current)
-        
+    for current, next_vertex in moves:
         # Record move
-        visited_links.append({'source': current, 'target': next_vertex})
+        visited_links.append({'source': ids[current], 'target': ids[next_vertex]})
         path.append(next_vertex)
-        
-        steps.append(AlgorithmStep(
-            log=f"Di chuyển từ {get_label(graph, current)} đến {get_label(graph, next_vertex)}", 
-            currentLinkId={'source': current, 'target': next_vertex}, 
-            visitedLinks=[e.copy() for e in visited_links],
-            path=[get_label(graph, p) for p in path]
-        ))
-        
-        current = next_vertex
-
-    logs.append("Đường Euler: " + " → ".join(get_label(graph, p) for p in path))
-    return AlgorithmResult(eulerPath=path, steps=steps, logs=logs)
-
-def run_hierholzer(graph: GraphData) -> AlgorithmResult:
-    if graph.isDirected:
-        raise ValueError("Hierholzer cho đồ thị vô hướng")
+        path_labels.append(labels[next_vertex])
+
+        if full:
+            yield AlgorithmStep(
+                'fleury.move', current, next_vertex,
+                currentLinkId={'source': ids[current], 'target': ids[next_vertex]},
+                visitedLinks=ListView(visited_links),
+                path=ListView(path_labels)
+            )
+        elif mode == 'classic':
+            # A classic move may test bridges across the whole graph
+            yield None
+
+    logs.append(('fleury.path', path))
+    # Summary traces replace the moves with the finished path
+    if tracing and not full:
+        yield AlgorithmStep('fleury.path', path, visitedLinks=ListView(visited_links), path=ListView(path_labels))
+    return AlgorithmResult(eulerPath=[ids[p] for p in path], logs=logs, labels=labels)
+
+def run_fleury(graph: GraphData, mode: str = 'classic', trace: str = 'full') -> AlgorithmResult:
+    return collect_steps(iter_fleury(graph, mode, trace))
+
+def iter_hierholzer(graph: GraphData, trace: str = 'full') -> Iterator[AlgorithmStep]:
+    cg = yield from iter_compile_graph(graph)
+    ids, labels = cg.ids, cg.labels
+    rank = cg.rank
+    directed = graph.isDirected
 
-    # Build adjacency list
-    adj = defaultdict(list)
-    for link in graph.links:
-        adj[link['source']].append(link['target'])
-        adj[link['target']].append(link['source'])
-    
-    # Sort adjacency lists for deterministic edge selection
-    for k in adj:
-        adj[k].sort()
-    
     # Check Euler conditions
-    degrees = {n['id']: len(adj[n['id']]) for n in graph.nodes}
-    if any(d % 2 == 1 for d in degrees.values()):
+    if directed:
+        if any(cg.out_offsets[u + 1] - cg.out_offsets[u] != cg.in_offsets[u + 1] - cg.in_offsets[u] for u in range(cg.n)):
+            raise ValueError("Đồ thị không Euler (có đỉnh bán bậc vào khác bán bậc ra)")
+    elif any(cg.degree(u) % 2 == 1 for u in range(cg.n)):
         raise ValueError("Đồ thị không Euler (có đỉnh bậc lẻ)")
 
+    # Arcs of each vertex sorted by neighbor id for deterministic edge selection.
+    # cursor[u] only moves forward past used edges, so taking the next edge is O(1)
+    # amortized and an edge is removed from both ends by flagging its id.
+    adj_targets, adj_edges = [], []
+    for u in range(cg.n):
+        arcs = sorted(range(cg.out_offsets[u], cg.out_offsets[u + 1]), key=lambda a: rank[cg.out_targets[a]])
+        adj_targets.append([cg.out_targets[a] for a in arcs])
+        adj_edges.append([cg.out_edges[a] for a in arcs])
+    cursor = [0] * cg.n
+    used = [False] * cg.m
+    unused_degree = [cg.degree(u) for u in range(cg.n)]
+    remaining = cg.m
+
+    full, tracing = trace == 'full', trace != 'none'
+
     # Helper to build a circuit from a starting vertex with step-by-step visualization
-    def build_circuit_with_steps(start, adj_copy, circuit_name, steps, all_visited):
+    def build_circuit_with_steps(start, circuit_name, all_visited):
+        nonlocal remaining
         circuit = [start]
+        circuit_labels = [labels[start]]
         current = start
-        edges_used = []
-        
+
         while True:
-            if not adj_copy[current]:
+            targets, edges = adj_targets[current], adj_edges[current]
+            i = cursor[current]
+            while i < len(edges) and used[edges[i]]:
+                i += 1
+            cursor[current] = i
+            if i == len(edges):
                 break
-            next_v = adj_copy[current].pop(0)  # Take first edge for smaller circuits
-            adj_copy[next_v].remove(current)
-            
-            edge = {'source': current, 'target': next_v}
-            edges_used.append(edge)
+            next_v = targets[i]  # Take first edge for smaller circuits
+            used[edges[i]] = True
+            remaining -= 1
+            unused_degree[current] -= 1
+            if not directed:
+                unused_degree[next_v] -= 1
+
+            edge = {'source': ids[current], 'target': ids[next_v]}
             all_visited.append(edge)
             circuit.append(next_v)
-            
+            circuit_labels.append(labels[next_v])
+
             # Add step for each edge traversal
-            steps.append(AlgorithmStep(
-                log=f"{circuit_name}: Đi từ {get_label(graph, current)} → {get_label(graph, next_v)}",
-                currentLinkId=edge,
-                visitedLinks=[e.copy() for e in all_visited],
-                path=[get_label(graph, v) for v in circuit]
-            ))
-            
+            if full:
+                yield AlgorithmStep(
+                    'hierholzer.walk', circuit_name, current, next_v,
+                    currentLinkId=edge,
+                    visitedLinks=ListView(all_visited),
+                    path=ListView(circuit_labels)
+                )
+            elif not remaining % TICK_INTERVAL:
+                yield None
+
             current = next_v
             if current == start:
                 break
-        
-        return circuit, edges_used
 
-    start = graph.nodes[0]['id']
-    adj_work = {k: v[:] for k, v in adj.items()}
-    
-    steps = []
+        return circuit
+
+    start = cg.node_index(graph.nodes[0]['id'])
+
     logs = []
     all_visited_links = []
-    
+
     # B1: Build initial circuit R
-    logs.append(f"B1: Xác định chu trình ban đầu R₁ từ đỉnh {get_label(graph, start)}")
-    steps.append(AlgorithmStep(
-        log=f"B1: Bắt đầu tạo R₁ từ {get_label(graph, start)}",
-        currentNodeId=start,
-        visitedLinks=[]
-    ))
-    
-    R, edges_R = build_circuit_with_steps(start, adj_work, "R₁", steps, all_visited_links)
-    
-    R_label = " → ".join(get_label(graph, v) for v in R)
-    logs.append(f"B1: Hoàn thành R₁ = {R_label}")
-    
-    steps.append(AlgorithmStep(
-        log=f"B1: R₁ = {R_label}",
-        visitedLinks=[e.copy() for e in all_visited_links],
-        path=[get_label(graph, v) for v in R]
-    ))
-    
+    logs.append(('hierholzer.b1', start))
+    if tracing:
+        yield AlgorithmStep(
+            'hierholzer.b1.start', start,
+            currentNodeId=ids[start],
+            visitedLinks=[]
+        )
+
+    R = Circuit((yield from build_circuit_with_steps(start, "R₁", all_visited_links)))
+
+    # Snapshots of R are views, so logging R after every merge costs O(1)
+    logs.append(('hierholzer.b1.done', R.view()))
+
+    if tracing:
+        yield AlgorithmStep(
+            'hierholzer.b1.circuit', R.view(),
+            visitedLinks=ListView(all_visited_links),
+            path=R.view(labels)
+        )
+
     iteration = 1
-    
+    # Vertices of R before scan have no unused edges left, and merging only uses
+    # up more edges, so B3 resumes from where it last stopped
+    scan = 0
+
     # B2-B6: Merge sub-circuits until all edges are covered
-    while any(adj_work.values()):
+    while remaining:
         # B2: Check if done
-        logs.append(f"B2: Kiểm tra - R{iteration} chưa chứa toàn bộ đồ thị")
-        
+        logs.append(('hierholzer.b2', iteration))
+
         # B3: Find vertex v in R that still has unused edges
-        insert_vertex = None
-        insert_index = None
-        
-        for i, v in enumerate(R):
-            if adj_work[v]:
-                insert_vertex = v
-                insert_index = i
-                break
-        
-        if insert_vertex is None:
+        while scan != -1 and not unused_degree[R.vertex[scan]]:
+            scan = R.next[scan]
+
+        if scan == -1:
             break
-        
-        logs.append(f"B3: Chọn v{iteration} = {get_label(graph, insert_vertex)} trong R{iteration} (còn cạnh chưa dùng)")
-        steps.append(AlgorithmStep(
-            log=f"B3: Chọn v{iteration} = {get_label(graph, insert_vertex)} (còn {len(adj_work[insert_vertex])} cạnh chưa dùng)",
-            currentNodeId=insert_vertex,
-            visitedLinks=[e.copy() for e in all_visited_links],
-            path=[get_label(graph, v) for v in R]
-        ))
-        
+        insert_vertex = R.vertex[scan]
+
+        logs.append(('hierholzer.b3', iteration, insert_vertex))
+        if tracing:
+            yield AlgorithmStep(
+                'hierholzer.b3.pick', iteration, insert_vertex, unused_degree[insert_vertex],
+                currentNodeId=ids[insert_vertex],
+                visitedLinks=ListView(all_visited_links),
+                path=R.view(labels)
+            )
+
         # B4: Build sub-circuit Q from insert_vertex
-        logs.append(f"B4: Xác định chu trình Q{iteration} từ v{iteration}")
-        steps.append(AlgorithmStep(
-            log=f"B4: Bắt đầu tạo Q{iteration} từ {get_label(graph, insert_vertex)}",
-            currentNodeId=insert_vertex,
-            visitedLinks=[e.copy() for e in all_visited_links]
-        ))
-        
-        Q, edges_Q = build_circuit_with_steps(insert_vertex, adj_work, f"Q{iteration}", steps, all_visited_links)
-        
-        Q_label = " → ".join(get_label(graph, v) for v in Q)
-        logs.append(f"B4: Hoàn thành Q{iteration} = {Q_label}")
-        
-        steps.append(AlgorithmStep(
-            log=f"B4: Q{iteration} = {Q_label}",
-            visitedLinks=[e.copy() for e in all_visited_links],
-            path=[get_label(graph, v) for v in Q]
-        ))
-        
-        # B5: Merge Q into R at insert_index
-        new_R = R[:insert_index] + Q + R[insert_index+1:]
-        R = new_R
-        
+        logs.append(('hierholzer.b4', iteration))
+        if tracing:
+            yield AlgorithmStep(
+                'hierholzer.b4.start', iteration, insert_vertex,
+                currentNodeId=ids[insert_vertex],
+                visitedLinks=ListView(all_visited_links)
+            )
+
+        Q = yield from build_circuit_with_steps(insert_vertex, f"Q{iteration}", all_visited_links)
+
+        logs.append(('hierholzer.b4.done', iteration, Q))
+
+        if tracing:
+            yield AlgorithmStep(
+                'hierholzer.b4.circuit', iteration, Q,
+                visitedLinks=ListView(all_visited_links),
+                path=[labels[v] for v in Q]
+            )
+
+        # B5: Merge Q into R at insert_vertex
+        R.splice(scan, Q[1:])
+
         iteration += 1
-        R_label = " → ".join(get_label(graph, v) for v in R)
-        logs.append(f"B5: Gộp Q vào R → R{iteration} = {R_label}")
-        
-        steps.append(AlgorithmStep(
-            log=f"B5: Gộp Q{iteration-1} vào R{iteration-1} → R{iteration}",
-            visitedLinks=[e.copy() for e in all_visited_links],
-            path=[get_label(graph, v) for v in R]
-        ))
-        
+        logs.append(('hierholzer.b5', iteration, R.view()))
+
+        if tracing:
+            yield AlgorithmStep(
+                'hierholzer.b5.merge', iteration - 1, iteration,
+                visitedLinks=ListView(all_visited_links),
+                path=R.view(labels)
+            )
+
         # B6: Increment i
-        logs.append(f"B6: Tăng i = {iteration}, quay lại B2")
-    
-    final_label = " → ".join(get_label(graph, v) for v in R)
-    logs.append(f"B2: Hoàn thành - Chu trình Euler: {final_label}")
-    
-    steps.append(AlgorithmStep(
-        log=f"KẾT THÚC: Chu trình Euler = {final_label}",
-        visitedLinks=[e.copy() for e in all_visited_links],
-        path=[get_label(graph, v) for v in R]
-    ))
-    
-    return AlgorithmResult(eulerPath=R, steps=steps, logs=logs)
-
-def check_bipartite(graph: GraphData) -> AlgorithmResult:
-    adj = get_adjacency_list(graph)
-    color = {n['id']: -1 for n in graph.nodes}  # -1: uncolored, 0/1: colors
+        logs.append(('hierholzer.b6', iteration))
+
+    logs.append(('hierholzer.done', R.view()))
+
+    if tracing:
+        yield AlgorithmStep(
+            'hierholzer.end', R.view(),
+            visitedLinks=ListView(all_visited_links),
+            path=R.view(labels)
+        )
+
+    return AlgorithmResult(eulerPath=[ids[v] for v in R.vertices(R.merges)], logs=logs, labels=labels)
+
+def run_hierholzer(graph: GraphData, trace: str = 'full') -> AlgorithmResult:
+    return collect_steps(iter_hierholzer(graph, trace))
+
+def iter_bipartite(graph: GraphData, mode: str = 'bfs', trace: str = 'full') -> Iterator[AlgorithmStep]:
+    """Two-color the graph. mode 'bfs' colors component by component over the
+    adjacency; 'stream' makes one pass over graph.links with a parity union-find."""
+    if mode not in ('bfs', 'stream'):
+        raise ValueError(f"Không hỗ trợ chế độ {mode}")
+    if mode == 'stream':
+        return (yield from _iter_bipartite_stream(graph, trace))
+    cg = yield from iter_compile_graph(graph)
+    ids, labels = cg.ids, cg.labels
+    offsets, targets = cg.out_offsets, cg.out_targets
+    color = [-1] * cg.n  # -1: uncolored, 0/1: colors
     setA, setB = [], []
-    steps = []
     logs = []
+    full, tracing = trace == 'full', trace != 'none'
 
     def bfs(start):
         queue = deque([start])
         color[start] = 0
-        setA.append(start)
+        setA.append(ids[start])
+        visits = 0
         while queue:
             u = queue.popleft()
-            steps.append(AlgorithmStep(log=f"Thăm {get_label(graph, u)} với màu {color[u]}", currentNodeId=u, bipartiteSets={'setA': setA.copy(), 'setB': setB.copy()}))
-            for neigh in adj[u]:
-                v = neigh['node']
+            visits += 1
+            if full:
+                yield AlgorithmStep('bipartite.visit', u, color[u], currentNodeId=ids[u], bipartiteSets={'setA': ListView(setA), 'setB': ListView(setB)})
+            elif not visits % TICK_INTERVAL:
+                yield None
+            for a in range(offsets[u], offsets[u + 1]):
+                v = targets[a]
                 if color[v] == -1:
                     color[v] = 1 - color[u]
                     if color[v] == 0:
-                        setA.append(v)
+                        setA.append(ids[v])
                     else:
-                        setB.append(v)
+                        setB.append(ids[v])
                     queue.append(v)
                 elif color[v] == color[u]:
                     return False
         return True
 
     is_bipartite = True
-    for node in [n['id'] for n in graph.nodes]:
+    for node in range(cg.n):
         if color[node] == -1:
-            if not bfs(node):
+            ok = yield from bfs(node)
+            # Summary traces show one step per colored component
+            if tracing and not full:
+                yield AlgorithmStep('bipartite.component', node, currentNodeId=ids[node], bipartiteSets={'setA': ListView(setA), 'setB': ListView(setB)})
+            if not ok:
                 is_bipartite = False
-                logs.append("Không phải đồ thị hai phía")
+                logs.append(('bipartite.no',))
                 break
     if is_bipartite:
-        logs.append("Là đồ thị hai phía")
+        logs.append(('bipartite.yes',))
 
-    return AlgorithmResult(isBipartite=is_bipartite, bipartiteSets={'setA': setA, 'setB': setB}, steps=steps, logs=logs)
+    return AlgorithmResult(isBipartite=is_bipartite, bipartiteSets={'setA': setA, 'setB': setB}, logs=logs, labels=labels)
 
-def to_adjacency_matrix(graph: GraphData) -> List[List[int]]:
+def check_bipartite(graph: GraphData, trace: str = 'full', mode: str = 'bfs') -> AlgorithmResult:
+    return collect_steps(iter_bipartite(graph, mode, trace))
+
+def _iter_bipartite_stream(graph: GraphData, trace: str) -> Iterator[AlgorithmStep]:
+    """Bipartiteness and connected components in one pass over graph.links.
+
+    A union-find where parity[x] is x's color relative to parent[x]: a link joining
+    two trees hooks them so its ends get different colors, and a link inside one
+    tree whose ends have the same color is an odd cycle. Needs O(V) memory and no
+    adjacency. Links count as undirected; each component's first node gets color 0,
+    as in the BFS mode, so the sets match it on bipartite graphs.
+    """
+    index = {}
+    ids, labels = [], []
+
+    def intern(node_id, label):
+        if node_id not in index:
+            index[node_id] = len(ids)
+            ids.append(node_id)
+            labels.append(label)
+        return index[node_id]
+
+    for node in graph.nodes:
+        intern(node['id'], node.get('label', node['id']))
+    parent = list(range(len(ids)))
+    parity = [0] * len(ids)
+    size = [1] * len(ids)
+
+    def find(x):
+        # Root of x with path compression; parity[x] becomes x's color relative to it
+        path = []
+        while parent[x] != x:
+            path.append(x)
+            x = parent[x]
+        color = 0
+        for y in reversed(path):
+            color ^= parity[y]
+            parity[y] = color
+            parent[y] = x
+        return x
+
+    components = len(ids)
+    conflict = None
+    lookup = index.get
+    links = graph.links
+    # Links in chunks of TICK_INTERVAL, with a tick after each
+    for chunk in range(0, len(links), TICK_INTERVAL):
+        for link in links[chunk:chunk + TICK_INTERVAL]:
+            u, v = lookup(link['source']), lookup(link['target'])
+            if u is None or v is None:
+                u, v = intern(link['source'], link['source']), intern(link['target'], link['target'])
+                while len(parent) < len(ids):
+                    parent.append(len(parent))
+                    parity.append(0)
+                    size.append(1)
+                    components += 1
+            # Roots and their direct children need no find() call
+            ru = parent[u]
+            if ru == u:
+                pu = 0
+            else:
+                if parent[ru] != ru:
+                    ru = find(u)
+                pu = parity[u]
+            rv = parent[v]
+            if rv == v:
+                pv = 0
+            else:
+                if parent[rv] != rv:
+                    rv = find(v)
+                pv = parity[v]
+            if ru != rv:
+                if size[ru] < size[rv]:
+                    ru, rv = rv, ru
+                parent[rv] = ru
+                parity[rv] = pu ^ pv ^ 1
+                size[ru] += size[rv]
+                components -= 1
+            elif pu == pv and conflict is None:
+                conflict = (u, v)
+        yield None
+
+    logs = [('bipartite.stream', len(graph.links), components)]
+    tracing = trace != 'none'
+    setA, setB = [], []
+    if conflict is None:
+        base = {}
+        for x in range(len(ids)):
+            root = find(x)
+            color = parity[x] if x != root else 0
+            # The first node of each component keeps color 0
+            color ^= base.setdefault(root, color)
+            (setB if color else setA).append(ids[x])
+        logs.append(('bipartite.yes',))
+    else:
+        u, v = conflict
+        if tracing:
+            yield AlgorithmStep('bipartite.conflict', u, v, currentLinkId={'source': ids[u], 'target': ids[v]})
+        logs.append(('bipartite.conflict', u, v))
+        logs.append(('bipartite.no',))
+    if tracing:
+        yield AlgorithmStep('bipartite.stream', len(graph.links), components, bipartiteSets={'setA': ListView(setA), 'setB': ListView(setB)})
+
+    conflict_edge = {'source': ids[conflict[0]], 'target': ids[conflict[1]]} if conflict else None
+    return AlgorithmResult(isBipartite=conflict is None, bipartiteSets={'setA': setA, 'setB': setB}, componentCount=components,
+                           conflictEdge=conflict_edge, logs=logs, labels=labels)
+
+# Relative cost of one vectorized Floyd-Warshall cell update and one heap
+# operation in the Python Dijkstra loop, measured on CPython + NumPy
+FLOYD_CELL_COST = 1
+DIJKSTRA_ARC_COST = 10
+
+def _floyd_warshall(cg: CompiledGraph) -> Iterator[None]:
+    dist = np.full((cg.n, cg.n), INF)
+    src = np.array(cg.edge_source, dtype=np.intp)
+    dst = np.array(cg.edge_target, dtype=np.intp)
+    w = np.array(cg.edge_weight, dtype=np.float64)
+    np.minimum.at(dist, (src, dst), w)
+    if not cg.isDirected:
+        np.minimum.at(dist, (dst, src), w)
+    np.fill_diagonal(dist, np.minimum(dist.diagonal(), 0))
+    for k in range(cg.n):
+        # Row k and column k do not change while relaxing through k, so in-place is safe
+        np.minimum(dist, dist[:, k, None] + dist[None, k, :], out=dist)
+        yield None
+    if (dist.diagonal() < 0).any():
+        raise ValueError("Đồ thị có chu trình âm")
+    return dist
+
+def _johnson_potentials(cg: CompiledGraph) -> Iterator[None]:
+    """Johnson's vertex potentials: Bellman-Ford distances from a virtual source with
+    0-weight arcs to every vertex. w + h[u] - h[v] is then non-negative on every arc.
+
+    Runs SPFA on the compiled arrays: after the virtual source's own arcs every
+    vertex is at distance 0 with a path of one edge, so it starts from there.
+    A path of n + 1 edges (one more than the real vertices) means a negative cycle.
+    """
+    offsets, targets, weights = cg.out_offsets, cg.out_targets, cg.out_weights
+    n = cg.n
+    potentials = [0] * n
+    length = [1] * n
+    queue = deque(range(n))
+    in_queue = [True] * n
+    pops = 0
+    while queue:
+        u = queue.popleft()
+        in_queue[u] = False
+        pops += 1
+        if not pops % TICK_INTERVAL:
+            yield None
+        for a in range(offsets[u], offsets[u + 1]):
+            v = targets[a]
+            alt = potentials[u] + weights[a]
+            if alt < potentials[v]:
+                potentials[v] = alt
+                length[v] = length[u] + 1
+                if length[v] > n:
+                    raise ValueError("Đồ thị có chu trình âm")
+                if not in_queue[v]:
+                    in_queue[v] = True
+                    queue.append(v)
+    return potentials
+
+def _repeated_dijkstra(cg: CompiledGraph, potentials: Optional[List[Any]] = None) -> Iterator[None]:
+    offsets, targets = cg.out_offsets, cg.out_targets
+    weights = cg.out_weights
+    if potentials is not None:
+        sources = [u for u in range(cg.n) for _ in range(offsets[u], offsets[u + 1])]
+        weights = [w + potentials[u] - potentials[v] for u, v, w in zip(sources, targets, weights)]
+    dist = np.full((cg.n, cg.n), INF)
+    for s in range(cg.n):
+        row = [INF] * cg.n
+        row[s] = 0
+        done = [False] * cg.n
+        pq = [(0, s)]
+        while pq:
+            d, u = heapq.heappop(pq)
+            if done[u]:
+                continue
+            done[u] = True
+            for a in range(offsets[u], offsets[u + 1]):
+                v = targets[a]
+                alt = d + weights[a]
+                if alt < row[v]:
+                    row[v] = alt
+                    heapq.heappush(pq, (alt, v))
+        dist[s] = row
+        yield None
+    if potentials is not None:
+        h = np.array(potentials, dtype=np.float64)
+        dist += h[None, :] - h[:, None]
+    return dist
+
+def all_pairs_shortest_paths(graph: GraphData, method: str = 'auto') -> Dict[str, Any]:
+    return drain(iter_all_pairs_shortest_paths(graph, method))
+
+def iter_all_pairs_shortest_paths(graph: GraphData, method: str = 'auto', flat: bool = True) -> Iterator[None]:
+    """Distance matrix for every ordered pair, rows and columns in matrix_node_order.
+
+    'floydWarshall' is NumPy-vectorized O(V^3); 'dijkstra' runs a heap Dijkstra per
+    source and switches to 'johnson' (Bellman-Ford potentials, then Dijkstra) when
+    weights are negative. 'auto' takes Floyd-Warshall on dense graphs. distances is
+    row-major, n * n long, None where there is no path; with flat=False it is the
+    n x n float64 array instead, inf where there is no path. Yields a tick after
+    each Floyd-Warshall pivot and each Dijkstra source, and returns the result.
+    """
+    if method not in ('auto', 'floydWarshall', 'dijkstra', 'johnson'):
+        raise ValueError(f"Không hỗ trợ phương pháp {method}")
+    cg = yield from iter_compile_graph(graph)
+    n = cg.n
+    negative = any(w < 0 for w in cg.edge_weight)
+    if method == 'auto':
+        arcs = len(cg.out_targets)
+        dense = n ** 3 * FLOYD_CELL_COST <= n * (n + arcs) * max(1, math.log2(n or 1)) * DIJKSTRA_ARC_COST
+        method = 'floydWarshall' if dense else 'dijkstra'
+    if method == 'dijkstra' and negative:
+        method = 'johnson'
+
+    if method == 'floydWarshall':
+        dist = yield from _floyd_warshall(cg)
+    else:
+        potentials = (yield from _johnson_potentials(cg)) if method == 'johnson' else None
+        dist = yield from _repeated_dijkstra(cg, potentials)
+
+    order = matrix_node_order(graph)
+    perm = np.array([cg.node_index(node_id) for node_id in order], dtype=np.intp)
+    dist = dist[np.ix_(perm, perm)]
+    if not flat:
+        return {'nodes': order, 'n': len(order), 'distances': dist, 'method': method}
+    integral = all(isinstance(w, int) for w in cg.edge_weight)
+    flat = dist.ravel().tolist()
+    if integral:
+        flat = [int(round(d)) if d != INF else None for d in flat]
+    else:
+        flat = [d if d != INF else None for d in flat]
+    return {'nodes': order, 'n': len(order), 'distances': flat, 'method': method}
+
+def matrix_node_order(graph: GraphData) -> List[str]:
     # Sort nodes by numeric value if possible, otherwise by string
-    nodes = sorted([n['id'] for n in graph.nodes], key=lambda x: (int(x) if x.isdigit() else float('inf'), x))
+    return sorted([n['id'] for n in graph.nodes], key=lambda x: (int(x) if x.isdigit() else float('inf'), x))
+
+def _matrix_entries(graph: GraphData) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """Row, column and weight of every adjacency matrix entry, in row-major order.
+
+    Rows and columns follow matrix_node_order. An undirected link gives both (i, j)
+    and (j, i) (a loop only once); parallel links stay separate entries.
+    """
+    nodes = matrix_node_order(graph)
     node_index = {node: i for i, node in enumerate(nodes)}
-    matrix = [[0] * len(nodes) for _ in nodes]
-    for link in graph.links:
-        i = node_index[link['source']]
-        j = node_index[link['target']]
-        matrix[i][j] = 1  # Use 1 for presence of edge, not weight
-        if not graph.isDirected:
-            matrix[j][i] = 1
+    m = len(graph.links)
+    row = np.fromiter((node_index[link['source']] for link in graph.links), dtype=np.int64, count=m)
+    col = np.fromiter((node_index[link['target']] for link in graph.links), dtype=np.int64, count=m)
+    weight = np.asarray([link['weight'] for link in graph.links]) if m else np.zeros(0, dtype=np.int64)
+    if weight.dtype.kind not in 'iuf':
+        raise ValueError("Trọng số phải là số")
+    if not graph.isDirected:
+        back = row != col
+        row, col, weight = np.concatenate((row, col[back])), np.concatenate((col, row[back])), np.concatenate((weight, weight[back]))
+    order = np.lexsort((col, row))
+    return nodes, row[order], col[order], weight[order]
+
+def to_dense_matrix(graph: GraphData) -> Tuple[List[str], np.ndarray]:
+    # 0/1 adjacency as a uint8 array, one byte per cell
+    nodes, row, col, _ = _matrix_entries(graph)
+    matrix = np.zeros((len(nodes), len(nodes)), dtype=np.uint8)
+    matrix[row, col] = 1
+    return nodes, matrix
+
+def to_sparse_matrix(graph: GraphData, fmt: str = 'csr') -> Dict[str, Any]:
+    """Weighted adjacency matrix built from the links in O(E).
+
+    'coo' gives row/col/data triples, 'csr' gives indptr/indices/data; arrays are
+    NumPy arrays and entries are in row-major order.
+    """
+    if fmt not in ('coo', 'csr'):
+        raise ValueError(f"Không hỗ trợ định dạng {fmt}")
+    nodes, row, col, weight = _matrix_entries(graph)
+    matrix = {'format': fmt, 'nodes': nodes, 'shape': [len(nodes), len(nodes)]}
+    if fmt == 'coo':
+        matrix.update(row=row, col=col, data=weight)
+    else:
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row, minlength=len(nodes)), out=indptr[1:])
+        matrix.update(indptr=indptr, indices=col, data=weight)
     return matrix
 
+def to_adjacency_matrix(graph: GraphData) -> List[List[int]]:
+    # Use 1 for presence of edge, not weight
+    return to_dense_matrix(graph)[1].tolist()
+
 def from_adjacency_matrix(matrix: List[List[int]], is_directed: bool, labels: Optional[List[str]] = None) -> GraphData:
-    n = len(matrix)
+    try:
+        array = np.asarray(matrix) if len(matrix) else np.zeros((0, 0), dtype=np.int64)
+    except ValueError:
+        raise ValueError("Ma trận kề phải là ma trận vuông")
+    return from_matrix_array(array, is_directed, labels)
+
+def from_matrix_array(matrix: np.ndarray, is_directed: bool, labels: Optional[List[str]] = None) -> GraphData:
+    """GraphData from a square adjacency matrix; each cell > 0 is a link weighted by it.
+
+    Undirected graphs read the strict upper triangle, directed graphs every cell.
+    """
+    if matrix.ndim != 2 or matrix.shape[0] != matrix.shape[1]:
+        raise ValueError("Ma trận kề phải là ma trận vuông")
+    if matrix.dtype.kind not in 'biuf':
+        raise ValueError("Ma trận kề chỉ chứa số")
+    n = matrix.shape[0]
     if labels is None:
         labels = [str(i+1) for i in range(n)]
+    elif len(labels) != n:
+        raise ValueError("Số nhãn không khớp với kích thước ma trận")
     nodes = [{'id': str(i+1), 'label': labels[i], 'type': 'pc', 'x': (i % 5) * 150 + 100, 'y': (i // 5) * 150 + 100} for i in range(n)]
-    links = []
-    for i in range(n):
-        for j in range(n if is_directed else i+1, n):
-            if matrix[i][j] > 0:
-                links.append({'source': nodes[i]['id'], 'target': nodes[j]['id'], 'weight': matrix[i][j], 'capacity': 100})
+    present = matrix > 0
+    if not is_directed:
+        present = np.triu(present, k=1)
+    rows, cols = np.nonzero(present)
+    weights = matrix[rows, cols]
+    if weights.dtype.kind == 'b':
+        weights = weights.astype(np.int64)
+    ids = [node['id'] for node in nodes]
+    links = [{'source': ids[i], 'target': ids[j], 'weight': w, 'capacity': 100}
+             for i, j, w in zip(rows.tolist(), cols.tolist(), weights.tolist())]
     return GraphData(nodes, links, is_directed)
 
+def decode_matrix_buffer(data: bytes, encoding: str, dtype: str = '<f8', n: Optional[int] = None) -> np.ndarray:
+    """Adjacency matrix from an uploaded buffer.
+
+    'npy' is a NumPy .npy file. 'raw' is row-major little-endian values of dtype;
+    n is inferred when omitted. 'bits' is the n*n row-major 0/1 cells packed MSB
+    first, as np.packbits of the flattened matrix gives them, and needs n.
+    """
+    if encoding == 'npy':
+        try:
+            return np.load(io.BytesIO(data), allow_pickle=False)
+        except (ValueError, OSError, EOFError):
+            raise ValueError("Tệp .npy không hợp lệ")
+    if encoding == 'raw':
+        try:
+            item = np.dtype(dtype).newbyteorder('<')
+        except TypeError:
+            raise ValueError(f"Không hỗ trợ kiểu dữ liệu {dtype}")
+        if item.kind not in 'biuf' or len(data) % item.itemsize:
+            raise ValueError(f"Không hỗ trợ kiểu dữ liệu {dtype}")
+        values = np.frombuffer(data, dtype=item)
+        if n is None:
+            n = math.isqrt(values.size)
+        if n * n != values.size:
+            raise ValueError("Ma trận kề phải là ma trận vuông")
+        return values.reshape(n, n)
+    if encoding == 'bits':
+        if n is None:
+            raise ValueError("Ma trận bit cần kích thước n")
+        if len(data) != -(-n * n // 8):
+            raise ValueError("Ma trận bit không đúng kích thước")
+        return np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=n * n).reshape(n, n)
+    raise ValueError(f"Không hỗ trợ định dạng {encoding}")
+
 def to_edge_list(graph: GraphData) -> List[Tuple[str, str, int]]:
-    return [(get_label(graph, link['source']), get_label(graph, link['target']), link['weight']) for link in graph.links]
+    labels = label_index(graph)
+    return [(labels.get(link['source'], link['source']), labels.get(link['target'], link['target']), link['weight']) for link in graph.links]
 
 def from_edge_list(edge_list: List[Tuple[str, str, int]], is_directed: bool) -> GraphData:
     node_map = {}
@@ -723,10 +2734,11 @@ def from_edge_list(edge_list: List[Tuple[str, str, int]], is_directed: bool) ->
     return GraphData(nodes, links, is_directed)
 
 def to_adjacency_list(graph: GraphData) -> Dict[str, List[str]]:
+    labels = label_index(graph)
     adj = defaultdict(list)
     for link in graph.links:
-        s_label = get_label(graph, link['source'])
-        t_label = get_label(graph, link['target'])
+        s_label = labels.get(link['source'], link['source'])
+        t_label = labels.get(link['target'], link['target'])
         adj[s_label].append(t_label)
         if not graph.isDirected:
             adj[t_label].append(s_label)
@@ -755,4 +2767,353 @@ def from_adjacency_list(adj_list: Dict[str, List[Tuple[str, int]]], is_directed:
             if key not in seen:
                 links.append({'source': node_map[s_label], 'target': node_map[t_label], 'weight': w, 'capacity': 100})
                 seen.add(key)
-    return GraphData(nodes, links, is_directed)
\ No newline at end of file
+    return GraphData(nodes, links, is_directed)
+
+# Bulk import/export. Readers are fed raw chunks as they arrive and build the
+# GraphData once; writers yield text a batch of lines at a time.
+EXPORT_CHUNK_LINES = 1000
+# Largest graph an import may build; past this the reader raises ValueError
+IMPORT_MAX_NODES = 100_000
+IMPORT_MAX_LINKS = 500_000
+
+def _grid_node(i: int, node_id: str, label: str) -> Dict[str, Any]:
+    # Same default layout as the from_* converters
+    return {'id': node_id, 'label': label, 'type': 'pc', 'x': (i % 5) * 150 + 100, 'y': (i // 5) * 150 + 100}
+
+def _number(text: Any, line: Optional[int] = None) -> Any:
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        where = f"Dòng {line}: " if line is not None else ""
+        raise ValueError(f"{where}giá trị {text!r} không phải là số")
+
+class GraphReader(abc.ABC):
+    """Incremental graph parser: feed() raw bytes as they arrive, close() returns the GraphData.
+
+    is_directed overrides whatever the file says; formats without a direction
+    default to undirected.
+    """
+
+    def __init__(self, is_directed: Optional[bool] = None):
+        self.is_directed = is_directed
+        self.nodes = []
+        self.links = []
+        self.node_ids = set()
+
+    def add_node(self, node: Dict[str, Any]):
+        if node['id'] not in self.node_ids:
+            if len(self.nodes) >= IMPORT_MAX_NODES:
+                raise ValueError(f"Đồ thị có quá {IMPORT_MAX_NODES} đỉnh")
+            self.node_ids.add(node['id'])
+            self.nodes.append(node)
+
+    def add_link(self, link: Dict[str, Any]):
+        if len(self.links) >= IMPORT_MAX_LINKS:
+            raise ValueError(f"Đồ thị có quá {IMPORT_MAX_LINKS} cạnh")
+        self.links.append(link)
+
+    @abc.abstractmethod
+    def feed(self, data: bytes):
+        pass
+
+    def close(self) -> GraphData:
+        # Links may name nodes the file never declared
+        for link in self.links:
+            for end in (link['source'], link['target']):
+                if end not in self.node_ids:
+                    self.add_node(_grid_node(len(self.nodes), end, end))
+        return GraphData(self.nodes, self.links, bool(self.is_directed))
+
+class _LineGraphReader(GraphReader):
+    def __init__(self, is_directed: Optional[bool] = None):
+        super().__init__(is_directed)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._pending = ''
+        self.line_number = 0
+
+    def feed(self, data: bytes):
+        lines = (self._pending + self._decoder.decode(data)).split('\n')
+        self._pending = lines.pop()
+        self.read_lines(lines)
+
+    def close(self) -> GraphData:
+        rest = self._pending + self._decoder.decode(b'', final=True)
+        self._pending = ''
+        if rest:
+            self.read_lines([rest])
+        return super().close()
+
+    @abc.abstractmethod
+    def read_lines(self, lines: List[str]):
+        pass
+
+class CsvGraphReader(_LineGraphReader):
+    """source,target[,weight[,capacity]] rows naming nodes by label, as from_edge_list does.
+
+    A first row containing 'source' and 'target' is a header and may order the
+    columns freely. Weight defaults to 1 and capacity to 100.
+    """
+
+    def __init__(self, is_directed: Optional[bool] = None):
+        super().__init__(is_directed)
+        self.columns = None
+        self.node_map = {}
+
+    def node(self, label: str) -> str:
+        node_id = self.node_map.get(label)
+        if node_id is None:
+            node_id = self.node_map[label] = str(len(self.node_map) + 1)
+            self.add_node(_grid_node(len(self.nodes), node_id, label))
+        return node_id
+
+    def read_lines(self, lines: List[str]):
+        for row in csv.reader(lines):
+            self.line_number += 1
+            if not any(cell.strip() for cell in row):
+                continue
+            if self.columns is None:
+                header = [cell.strip().lower() for cell in row]
+                if 'source' in header and 'target' in header:
+                    self.columns = [header.index(name) if name in header else None for name in ('source', 'target', 'weight', 'capacity')]
+                    continue
+                self.columns = [0, 1, 2, 3]
+            values = [row[c].strip() if c is not None and c < len(row) else '' for c in self.columns]
+            if not values[0] or not values[1]:
+                raise ValueError(f"Dòng {self.line_number}: thiếu đỉnh")
+            self.add_link({'source': self.node(values[0]), 'target': self.node(values[1]),
+                               'weight': _number(values[2], self.line_number) if values[2] else 1,
+                               'capacity': _number(values[3], self.line_number) if values[3] else 100})
+
+class NdjsonGraphReader(_LineGraphReader):
+    """One JSON object per line: {"graph": {"isDirected": ...}}, {"node": {...}} or
+    {"link": {...}}. A bare object is read as a link if it has a source and a
+    target, as a node otherwise."""
+
+    def read_lines(self, lines: List[str]):
+        for line in lines:
+            self.line_number += 1
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise ValueError(f"Dòng {self.line_number}: JSON không hợp lệ")
+            if not isinstance(record, dict):
+                raise ValueError(f"Dòng {self.line_number}: cần một đối tượng JSON")
+            if len(record) == 1 and next(iter(record)) in ('graph', 'node', 'link'):
+                kind, record = next(iter(record.items()))
+                if not isinstance(record, dict):
+                    raise ValueError(f"Dòng {self.line_number}: cần một đối tượng JSON")
+            else:
+                kind = 'link' if 'source' in record and 'target' in record else 'node'
+            if kind == 'graph':
+                if self.is_directed is None:
+                    self.is_directed = bool(record.get('isDirected', False))
+            elif kind == 'node':
+                if 'id' not in record:
+                    raise ValueError(f"Dòng {self.line_number}: đỉnh thiếu id")
+                record['id'] = str(record['id'])
+                self.add_node(record)
+            else:
+                if 'source' not in record or 'target' not in record:
+                    raise ValueError(f"Dòng {self.line_number}: cạnh thiếu source hoặc target")
+                record['source'], record['target'] = str(record['source']), str(record['target'])
+                record.setdefault('weight', 1)
+                self.add_link(record)
+
+class DimacsGraphReader(_LineGraphReader):
+    """DIMACS shortest-path format: 'c' comments, one 'p sp <n> <m>' line, then
+    'a <u> <v> <w>' arcs over vertices 1..n. Directed unless told otherwise, or
+    unless a 'c undirected' comment (as _dimacs_lines writes) comes before the
+    'p' line."""
+
+    def __init__(self, is_directed: Optional[bool] = None):
+        super().__init__(is_directed)
+        self.n = None
+
+    def read_lines(self, lines: List[str]):
+        for line in lines:
+            self.line_number += 1
+            fields = line.split()
+            if not fields:
+                continue
+            if fields[0] == 'c':
+                if self.n is None and self.is_directed is None and len(fields) > 1 and fields[1] in ('directed', 'undirected'):
+                    self.is_directed = fields[1] == 'directed'
+                continue
+            if fields[0] == 'p':
+                if self.n is not None or len(fields) < 4:
+                    raise ValueError(f"Dòng {self.line_number}: dòng 'p' không hợp lệ")
+                n = _number(fields[2], self.line_number)
+                if not isinstance(n, int) or not 0 <= n <= IMPORT_MAX_NODES:
+                    raise ValueError(f"Dòng {self.line_number}: số đỉnh phải từ 0 đến {IMPORT_MAX_NODES}")
+                self.n = n
+                for i in range(self.n):
+                    self.add_node(_grid_node(i, str(i + 1), str(i + 1)))
+            elif fields[0] == 'a':
+                if self.n is None:
+                    raise ValueError(f"Dòng {self.line_number}: cung xuất hiện trước dòng 'p'")
+                if len(fields) < 3:
+                    raise ValueError(f"Dòng {self.line_number}: cung không hợp lệ")
+                u, v = fields[1], fields[2]
+                if not (u.isdigit() and v.isdigit() and 1 <= int(u) <= self.n and 1 <= int(v) <= self.n):
+                    raise ValueError(f"Dòng {self.line_number}: đỉnh ngoài khoảng 1..{self.n}")
+                weight = _number(fields[3], self.line_number) if len(fields) > 3 else 1
+                self.add_link({'source': str(int(u)), 'target': str(int(v)), 'weight': weight})
+            else:
+                raise ValueError(f"Dòng {self.line_number}: không hỗ trợ dòng '{fields[0]}'")
+
+    def close(self) -> GraphData:
+        if self.is_directed is None:
+            self.is_directed = True
+        return super().close()
+
+class GraphMLGraphReader(GraphReader):
+    """GraphML through an incremental XML pull parser. <data> values are keyed by the
+    attr.name of their <key>; x, y, weight and capacity are read as numbers. Each
+    node and edge element is dropped once read, so the tree never grows."""
+
+    NUMERIC = ('x', 'y', 'weight', 'capacity')
+
+    def __init__(self, is_directed: Optional[bool] = None):
+        super().__init__(is_directed)
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._keys = {}
+        self._graph = None
+        self._tags = {}
+
+    def _local(self, tag: str) -> str:
+        # Tag without its namespace, cached since every element repeats one of a few tags
+        local = self._tags.get(tag)
+        if local is None:
+            local = self._tags[tag] = tag.rsplit('}', 1)[-1]
+        return local
+
+    def feed(self, data: bytes):
+        try:
+            self._parser.feed(data)
+            self._drain()
+        except ET.ParseError as e:
+            raise ValueError(f"GraphML không hợp lệ: {e}")
+
+    def close(self) -> GraphData:
+        try:
+            self._parser.close()
+            self._drain()
+        except ET.ParseError as e:
+            raise ValueError(f"GraphML không hợp lệ: {e}")
+        return super().close()
+
+    def _data(self, element: ET.Element) -> Dict[str, Any]:
+        values = {}
+        for child in element:
+            if self._local(child.tag) == 'data':
+                name = self._keys.get(child.get('key'), child.get('key'))
+                text = (child.text or '').strip()
+                values[name] = _number(text) if name in self.NUMERIC else text
+        return values
+
+    def _drain(self):
+        for event, element in self._parser.read_events():
+            tag = self._local(element.tag)
+            if event == 'start':
+                if tag == 'graph':
+                    self._graph = element
+                    if self.is_directed is None:
+                        self.is_directed = element.get('edgedefault', 'directed') == 'directed'
+                continue
+            if tag == 'key':
+                self._keys[element.get('id')] = element.get('attr.name') or element.get('id')
+            elif tag == 'node':
+                if element.get('id') is None:
+                    raise ValueError("Đỉnh cần id")
+                self.add_node({'id': element.get('id'), **self._data(element)})
+            elif tag == 'edge':
+                if element.get('source') is None or element.get('target') is None:
+                    raise ValueError("Cạnh cần source và target")
+                link = {'source': element.get('source'), 'target': element.get('target'), **self._data(element)}
+                link.setdefault('weight', 1)
+                self.add_link(link)
+            if tag in ('node', 'edge') and self._graph is not None:
+                self._graph.remove(element)
+
+GRAPH_READERS = {'csv': CsvGraphReader, 'ndjson': NdjsonGraphReader, 'dimacs': DimacsGraphReader, 'graphml': GraphMLGraphReader}
+
+def graph_reader(fmt: str, is_directed: Optional[bool] = None) -> GraphReader:
+    if fmt not in GRAPH_READERS:
+        raise ValueError(f"Không hỗ trợ định dạng {fmt}")
+    return GRAPH_READERS[fmt](is_directed)
+
+def _batched(lines: Iterator[str]) -> Iterator[str]:
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= EXPORT_CHUNK_LINES:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+def _csv_lines(graph: GraphData) -> Iterator[str]:
+    labels = label_index(graph)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+
+    def row(values):
+        writer.writerow(values)
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    yield row(('source', 'target', 'weight', 'capacity'))
+    for link in graph.links:
+        yield row((labels.get(link['source'], link['source']), labels.get(link['target'], link['target']),
+                   link['weight'], link.get('capacity', link['weight'])))
+
+def _ndjson_lines(graph: GraphData) -> Iterator[str]:
+    yield json.dumps({'graph': {'isDirected': graph.isDirected}}) + '\n'
+    for node in graph.nodes:
+        yield json.dumps({'node': node}, ensure_ascii=False) + '\n'
+    for link in graph.links:
+        yield json.dumps({'link': link}, ensure_ascii=False) + '\n'
+
+def _dimacs_lines(graph: GraphData) -> Iterator[str]:
+    # Vertices are numbered in node order; an undirected link is written once
+    index = {}
+    for node in graph.nodes:
+        index.setdefault(node['id'], len(index) + 1)
+    for link in graph.links:
+        for end in (link['source'], link['target']):
+            index.setdefault(end, len(index) + 1)
+    yield f"c {'directed' if graph.isDirected else 'undirected'} graph\n"
+    yield f"p sp {len(index)} {len(graph.links)}\n"
+    for link in graph.links:
+        yield f"a {index[link['source']]} {index[link['target']]} {link['weight']}\n"
+
+def _graphml_lines(graph: GraphData) -> Iterator[str]:
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+    for key, owner, kind in (('label', 'node', 'string'), ('x', 'node', 'double'), ('y', 'node', 'double'),
+                             ('weight', 'edge', 'double'), ('capacity', 'edge', 'double')):
+        yield f'  <key id="{key}" for="{owner}" attr.name="{key}" attr.type="{kind}"/>\n'
+    yield f'  <graph edgedefault="{"directed" if graph.isDirected else "undirected"}">\n'
+    for node in graph.nodes:
+        data = ''.join(f'<data key="{key}">{xml_escape(str(node[key]))}</data>' for key in ('label', 'x', 'y') if key in node)
+        yield f'    <node id={xml_quoteattr(str(node["id"]))}>{data}</node>\n'
+    for link in graph.links:
+        data = ''.join(f'<data key="{key}">{xml_escape(str(link[key]))}</data>' for key in ('weight', 'capacity') if key in link)
+        yield f'    <edge source={xml_quoteattr(str(link["source"]))} target={xml_quoteattr(str(link["target"]))}>{data}</edge>\n'
+    yield '  </graph>\n</graphml>\n'
+
+GRAPH_WRITERS = {'csv': _csv_lines, 'ndjson': _ndjson_lines, 'dimacs': _dimacs_lines, 'graphml': _graphml_lines}
+
+def iter_graph_export(graph: GraphData, fmt: str) -> Iterator[str]:
+    """The graph in fmt as text chunks of EXPORT_CHUNK_LINES lines each."""
+    if fmt not in GRAPH_WRITERS:
+        raise ValueError(f"Không hỗ trợ định dạng {fmt}")
+    return _batched(GRAPH_WRITERS[fmt](graph))
@@ -0,0 +1,276 @@
+# Named, versioned graph storage for /save, /load and /graphs, backed by SQLite in WAL mode
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_GRAPH = 'default'
+EMPTY_GRAPH = {"nodes": [], "links": [], "isDirected": False}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS graphs (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    is_directed INTEGER NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS nodes (
+    seq INTEGER PRIMARY KEY,
+    graph TEXT NOT NULL,
+    id TEXT NOT NULL,
+    data TEXT NOT NULL,
+    UNIQUE (graph, id)
+);
+CREATE INDEX IF NOT EXISTS nodes_in_order ON nodes (graph, seq);
+CREATE TABLE IF NOT EXISTS links (
+    seq INTEGER PRIMARY KEY,
+    graph TEXT NOT NULL,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS links_in_order ON links (graph, seq);
+CREATE INDEX IF NOT EXISTS links_by_source ON links (graph, source, target);
+CREATE INDEX IF NOT EXISTS links_by_target ON links (graph, target);
+"""
+
+class GraphNotFound(KeyError):
+    pass
+
+class VersionConflict(Exception):
+    """The graph moved past the version the caller based its write on."""
+
+    def __init__(self, current: int):
+        super().__init__(f"Đồ thị đã ở phiên bản {current}")
+        self.current = current
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+class GraphStore:
+    """Graphs stored as one row per node and per link, so a patch only touches the
+    rows it changes. Every write is a single BEGIN IMMEDIATE transaction that bumps
+    the graph's version; WAL mode lets readers keep going while it commits, from
+    any number of threads or worker processes.
+
+    load() returns the stored JSON fragments joined into one body, cached per
+    version for the max_bodies most recently loaded graphs, so unchanged graphs
+    are never re-read or re-serialized.
+    """
+
+    def __init__(self, path: str, legacy_path: Optional[str] = None, max_bodies: int = 32):
+        self.path = path
+        self.legacy_path = legacy_path
+        self._local = threading.local()
+        self._ready = False
+        self._init_lock = threading.Lock()
+        self.max_bodies = max_bodies
+        self._bodies: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        self._bodies_lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        if not self._ready:
+            with self._init_lock:
+                if not self._ready:
+                    db.executescript(SCHEMA)
+                    if self.legacy_path:
+                        self._migrate_legacy(db)
+                    self._ready = True
+        return db
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _migrate_legacy(self, db: sqlite3.Connection):
+        # Import the old single graph.json once, as version 1 of the default graph
+        if not os.path.exists(self.legacy_path):
+            return
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if db.execute("SELECT 1 FROM graphs WHERE name = ?", (DEFAULT_GRAPH,)).fetchone() is None:
+                with open(self.legacy_path, 'r') as f:
+                    self._replace(db, DEFAULT_GRAPH, json.load(f), None)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    @staticmethod
+    def etag(version: int, created: float) -> str:
+        # created tells apart a graph recreated under the same name from its old versions
+        return f'"{version}-{int(created * 1000)}"'
+
+    def _head(self, db: sqlite3.Connection, name: str) -> Optional[Tuple[int, bool, float]]:
+        row = db.execute("SELECT version, is_directed, created FROM graphs WHERE name = ?", (name,)).fetchone()
+        return (row[0], bool(row[1]), row[2]) if row else None
+
+    def current_etag(self, name: str) -> Optional[str]:
+        head = self._head(self._db(), name)
+        return self.etag(head[0], head[2]) if head else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        rows = self._db().execute(
+            "SELECT g.name, g.version, g.updated, "
+            "(SELECT COUNT(*) FROM nodes WHERE graph = g.name), (SELECT COUNT(*) FROM links WHERE graph = g.name) "
+            "FROM graphs g ORDER BY g.name").fetchall()
+        return [{"name": name, "version": version, "updated": updated, "nodeCount": nodes, "linkCount": links}
+                for name, version, updated, nodes, links in rows]
+
+    def load(self, name: str) -> Tuple[str, bytes]:
+        """(etag, JSON body) of the latest version; raises GraphNotFound."""
+        db = self._db()
+        # One read transaction so the head and the rows come from the same snapshot
+        db.execute("BEGIN")
+        try:
+            head = self._head(db, name)
+            if head is None:
+                raise GraphNotFound(name)
+            etag = self.etag(head[0], head[2])
+            with self._bodies_lock:
+                cached = self._bodies.get(name)
+                if cached and cached[0] == etag:
+                    self._bodies.move_to_end(name)
+                    return cached
+            nodes = ",".join(row[0] for row in db.execute("SELECT data FROM nodes WHERE graph = ? ORDER BY seq", (name,)))
+            links = ",".join(row[0] for row in db.execute("SELECT data FROM links WHERE graph = ? ORDER BY seq", (name,)))
+        finally:
+            db.execute("COMMIT")
+        body = f'{{"nodes":[{nodes}],"links":[{links}],"isDirected":{"true" if head[1] else "false"}}}'.encode('utf-8')
+        with self._bodies_lock:
+            self._bodies[name] = (etag, body)
+            self._bodies.move_to_end(name)
+            while len(self._bodies) > self.max_bodies:
+                self._bodies.popitem(last=False)
+        return etag, body
+
+    def _forget(self, name: str):
+        # The cached body is stale once a write commits
+        with self._bodies_lock:
+            self._bodies.pop(name, None)
+
+    def _check(self, head: Optional[Tuple[int, bool, float]], if_match: Optional[str]):
+        if if_match is not None and if_match != "*":
+            current = self.etag(head[0], head[2]) if head else None
+            if current != if_match:
+                raise VersionConflict(head[0] if head else 0)
+
+    def _bump(self, db: sqlite3.Connection, name: str, head: Optional[Tuple[int, bool, float]], is_directed: bool) -> Tuple[int, str]:
+        now = time.time()
+        if head is None:
+            db.execute("INSERT INTO graphs (name, version, is_directed, created, updated) VALUES (?, 1, ?, ?, ?)",
+                       (name, int(is_directed), now, now))
+            return 1, self.etag(1, now)
+        db.execute("UPDATE graphs SET version = ?, is_directed = ?, updated = ? WHERE name = ?",
+                   (head[0] + 1, int(is_directed), now, name))
+        return head[0] + 1, self.etag(head[0] + 1, head[2])
+
+    def _replace(self, db: sqlite3.Connection, name: str, graph: Dict[str, Any], if_match: Optional[str]) -> Tuple[int, str]:
+        nodes, links = graph.get('nodes', []), graph.get('links', [])
+        if any(not isinstance(node, dict) or 'id' not in node for node in nodes):
+            raise ValueError("Đỉnh cần id")
+        if any(not isinstance(link, dict) or 'source' not in link or 'target' not in link for link in links):
+            raise ValueError("Cạnh cần source và target")
+        head = self._head(db, name)
+        self._check(head, if_match)
+        db.execute("DELETE FROM nodes WHERE graph = ?", (name,))
+        db.execute("DELETE FROM links WHERE graph = ?", (name,))
+        # A repeated node id keeps its first position and its last data
+        db.executemany("INSERT INTO nodes (graph, id, data) VALUES (?, ?, ?) "
+                       "ON CONFLICT (graph, id) DO UPDATE SET data = excluded.data",
+                       ((name, str(node['id']), _dumps(node)) for node in nodes))
+        db.executemany("INSERT INTO links (graph, source, target, data) VALUES (?, ?, ?, ?)",
+                       ((name, str(link['source']), str(link['target']), _dumps(link)) for link in links))
+        return self._bump(db, name, head, bool(graph.get('isDirected', False)))
+
+    def save(self, name: str, graph: Dict[str, Any], if_match: Optional[str] = None) -> Tuple[int, str]:
+        """Replace the whole graph in one commit; returns the new (version, etag).
+        Raises VersionConflict, or ValueError for nodes without id and links
+        without source and target."""
+        with self._write() as db:
+            written = self._replace(db, name, graph, if_match)
+        self._forget(name)
+        return written
+
+    def patch(self, name: str, delta: Dict[str, Any], if_match: Optional[str] = None) -> Tuple[int, str]:
+        """Apply node and link deltas in one commit; returns the new (version, etag).
+
+        Removals run first (removing a node drops its links), then node adds
+        (upserts) and updates, then link adds and updates. Links are matched by
+        source and target, either way round on undirected graphs; updates merge
+        fields into every match. Raises GraphNotFound, VersionConflict, or
+        ValueError for updates of missing items and links to missing nodes.
+        """
+        with self._write() as db:
+            head = self._head(db, name)
+            if head is None:
+                raise GraphNotFound(name)
+            self._check(head, if_match)
+            is_directed = head[1] if delta.get('isDirected') is None else bool(delta['isDirected'])
+
+            def matching_links(ends: Dict[str, Any]) -> List[Tuple[int, str]]:
+                if 'source' not in ends or 'target' not in ends:
+                    raise ValueError("Cạnh cần source và target")
+                source, target = str(ends['source']), str(ends['target'])
+                query = "SELECT seq, data FROM links WHERE graph = ? AND source = ? AND target = ?"
+                rows = db.execute(query, (name, source, target)).fetchall()
+                if not is_directed and source != target:
+                    rows += db.execute(query, (name, target, source)).fetchall()
+                return rows
+
+            for ends in delta.get('removeLinks') or []:
+                db.executemany("DELETE FROM links WHERE seq = ?", ((seq,) for seq, _ in matching_links(ends)))
+            for node_id in delta.get('removeNodes') or []:
+                node_id = str(node_id)
+                db.execute("DELETE FROM nodes WHERE graph = ? AND id = ?", (name, node_id))
+                db.execute("DELETE FROM links WHERE graph = ? AND source = ?", (name, node_id))
+                db.execute("DELETE FROM links WHERE graph = ? AND target = ?", (name, node_id))
+            for node in delta.get('addNodes') or []:
+                if 'id' not in node:
+                    raise ValueError("Đỉnh cần id")
+                db.execute("INSERT INTO nodes (graph, id, data) VALUES (?, ?, ?) "
+                           "ON CONFLICT (graph, id) DO UPDATE SET data = excluded.data",
+                           (name, str(node['id']), _dumps(node)))
+            for changes in delta.get('updateNodes') or []:
+                node_id = str(changes.get('id'))
+                row = db.execute("SELECT seq, data FROM nodes WHERE graph = ? AND id = ?", (name, node_id)).fetchone()
+                if row is None:
+                    raise ValueError(f"Không tìm thấy đỉnh {node_id}")
+                node = json.loads(row[1])
+                db.execute("UPDATE nodes SET data = ? WHERE seq = ?", (_dumps({**node, **changes, 'id': node['id']}), row[0]))
+            for link in delta.get('addLinks') or []:
+                if 'source' not in link or 'target' not in link:
+                    raise ValueError("Cạnh cần source và target")
+                for end in (str(link['source']), str(link['target'])):
+                    if db.execute("SELECT 1 FROM nodes WHERE graph = ? AND id = ?", (name, end)).fetchone() is None:
+                        raise ValueError(f"Không tìm thấy đỉnh {end}")
+                db.execute("INSERT INTO links (graph, source, target, data) VALUES (?, ?, ?, ?)",
+                           (name, str(link['source']), str(link['target']), _dumps(link)))
+            for changes in delta.get('updateLinks') or []:
+                rows = matching_links(changes)
+                if not rows:
+                    raise ValueError(f"Không tìm thấy cạnh {changes['source']} - {changes['target']}")
+                fields = {key: value for key, value in changes.items() if key not in ('source', 'target')}
+                db.executemany("UPDATE links SET data = ? WHERE seq = ?",
+                               ((_dumps({**json.loads(data), **fields}), seq) for seq, data in rows))
+            written = self._bump(db, name, head, is_directed)
+        self._forget(name)
+        return written
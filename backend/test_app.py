@@ -0,0 +1,276 @@
+import base64
+import io
+import json
+import struct
+
+from fastapi.testclient import TestClient
+import numpy as np
+import pytest
+
+import app
+
+client = TestClient(app.app)
+
+GRAPH = {'nodes': [{'id': '1'}, {'id': '2'}], 'links': [{'source': '1', 'target': '2', 'weight': 1}], 'isDirected': True}
+
+def test_stream_without_trace_answers_with_the_result():
+    response = client.post('/bfs', json={'graph': GRAPH, 'startId': '1', 'stream': 'ndjson', 'trace': 'none'})
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event['type'] for event in events] == ['result']
+    assert events[0]['data']['visited'] == ['1', '2']
+
+def test_stream_with_invalid_start_is_a_400():
+    response = client.post('/bfs', json={'graph': GRAPH, 'startId': '9', 'stream': 'sse'})
+    assert response.status_code == 400
+
+def test_save_with_a_node_without_id_is_a_400(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'graph_store', app.GraphStore(str(tmp_path / 'graphs.db')))
+    response = client.post('/save?name=t', json={'nodes': [{'label': 'a'}], 'links': [], 'isDirected': False})
+    assert response.status_code == 400
+    response = client.post('/save?name=t', json={'nodes': [{'id': 'a'}], 'links': [{'source': 'a'}], 'isDirected': False})
+    assert response.status_code == 400
+    assert client.get('/graphs/t').status_code == 404
+
+def test_cooperative_run_past_its_budget_is_a_504(monkeypatch):
+    monkeypatch.setattr(app, 'SCHEDULER', 'cooperative')
+    n = 20000
+    graph = {'nodes': [{'id': str(i)} for i in range(n)],
+             'links': [{'source': str(i), 'target': str(i + 1), 'weight': 1} for i in range(n - 1)], 'isDirected': True}
+    response = client.post('/bellmanFord', json={'graph': graph, 'startId': '0', 'endId': str(n - 1), 'timeoutMs': 1})
+    assert response.status_code == 504
+    response = client.post('/bfs', json={'graph': GRAPH, 'startId': '1', 'trace': 'none'})
+    assert response.status_code == 200
+    assert response.json()['visited'] == ['1', '2']
+
+def test_import_parses_the_upload_and_caps_its_size(monkeypatch):
+    response = client.post('/import/csv', content=b'source,target,weight\na,b,2\nb,c,3\n')
+    assert response.status_code == 200
+    assert [link['weight'] for link in response.json()['links']] == [2, 3]
+    assert client.post('/import/dimacs', content=b'p sp 2000000000 0\n').status_code == 400
+    monkeypatch.setattr(app, 'IMPORT_MAX_BYTES', 16)
+    assert client.post('/import/csv', content=b'a,b\n' * 10).status_code == 413
+
+def test_stream_past_its_deadline_ends_with_an_error_event():
+    n = 20000
+    graph = {'nodes': [{'id': str(i)} for i in range(n)],
+             'links': [{'source': str(i), 'target': str(i + 1), 'weight': 1} for i in range(n - 1)], 'isDirected': True}
+    response = client.post('/bellmanFord', json={'graph': graph, 'startId': '0', 'endId': str(n - 1),
+                                                 'stream': 'ndjson', 'timeoutMs': 200})
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0]['type'] == 'step'
+    assert events[-1]['type'] == 'error'
+    assert 'result' not in [event['type'] for event in events]
+
+def test_cooperative_streams_and_all_pairs_run_on_the_slice_scheduler(monkeypatch):
+    monkeypatch.setattr(app, 'SCHEDULER', 'cooperative')
+    runs = []
+    schedule = app.scheduler.run
+    monkeypatch.setattr(app.scheduler, 'run', lambda steps, *args: runs.append(steps) or schedule(steps, *args))
+
+    response = client.post('/bfs', json={'graph': GRAPH, 'startId': '1', 'stream': 'ndjson', 'traceFormat': 'delta'})
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [event['type'] for event in events][-1] == 'result'
+    assert events[-1]['data']['visited'] == ['1', '2']
+    assert client.post('/bfs', json={'graph': GRAPH, 'startId': '9', 'stream': 'ndjson'}).status_code == 400
+
+    response = client.post('/allPairs', json={**GRAPH, 'method': 'floydWarshall'})
+    assert response.status_code == 200
+    assert response.json()['distances'] == [0, 1, None, 0]
+    assert len(runs) == 3
+
+def test_cooperative_stream_past_its_budget_ends_with_an_error_event(monkeypatch):
+    monkeypatch.setattr(app, 'SCHEDULER', 'cooperative')
+    n = 20000
+    graph = {'nodes': [{'id': str(i)} for i in range(n)],
+             'links': [{'source': str(i), 'target': str(i + 1), 'weight': 1} for i in range(n - 1)], 'isDirected': True}
+    response = client.post('/bellmanFord', json={'graph': graph, 'startId': '0', 'endId': str(n - 1),
+                                                 'stream': 'ndjson', 'timeoutMs': 200})
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[-1]['type'] == 'error'
+
+def unpack_matrix(body):
+    # Inverse of app.pack_matrix
+    size, = struct.unpack_from('<I', body)
+    header = json.loads(body[4:4 + size])
+    arrays = {name: np.frombuffer(body, dtype=layout['dtype'], count=int(np.prod(layout['shape'])),
+                                  offset=layout['offset']).reshape(layout['shape'])
+              for name, layout in header.pop('arrays').items()}
+    return header, arrays
+
+@pytest.mark.parametrize('scheduler', ['pool', 'cooperative'])
+def test_all_pairs_encodings_carry_the_json_distances(monkeypatch, scheduler):
+    monkeypatch.setattr(app, 'SCHEDULER', scheduler)
+    graph = {'nodes': [{'id': str(i)} for i in range(4)],
+             'links': [{'source': '0', 'target': '1', 'weight': 2}, {'source': '1', 'target': '2', 'weight': -1},
+                       {'source': '0', 'target': '2', 'weight': 3}], 'isDirected': True}
+    for method in ('floydWarshall', 'johnson'):
+        expected = client.post('/allPairs', json={**graph, 'method': method}).json()
+        distances = np.array([np.inf if d is None else d for d in expected['distances']]).reshape(4, 4)
+
+        response = client.post('/allPairs', json={**graph, 'method': method, 'encoding': 'base64'})
+        payload = response.json()
+        assert payload['nodes'] == expected['nodes'] and payload['n'] == 4
+        data = np.frombuffer(base64.b64decode(payload['distances']['data']), dtype=payload['distances']['dtype'])
+        assert np.array_equal(data.reshape(4, 4), distances)
+
+        response = client.post('/allPairs', json={**graph, 'method': method, 'encoding': 'binary'})
+        assert response.headers['content-type'] == 'application/octet-stream'
+        header, arrays = unpack_matrix(response.content)
+        assert header['nodes'] == expected['nodes'] and header['method'] == expected['method']
+        assert np.array_equal(arrays['distances'], distances)
+
+def test_encode_body_writes_inf_as_null_and_rejects_unknown_objects():
+    result = app.AlgorithmResult(distances={'1': 0, '2': float('inf')}, matrix=np.array([0.0, np.inf]))
+    assert json.loads(app.encode_body(result)) == {'logs': [], 'steps': [], 'labels': [],
+                                                   'distances': {'1': 0, '2': None}, 'matrix': [0.0, None]}
+    with pytest.raises(TypeError):
+        app.encode_body({'value': object()})
+    with pytest.raises(TypeError):
+        app.encode_body(app.GraphData([], [], True))
+
+def sparse_to_dense(matrix, arrays):
+    # Weighted dense matrix from a coo or csr /toMatrix answer
+    n = matrix['shape'][0]
+    dense = np.zeros((n, n))
+    if matrix['format'] == 'coo':
+        rows = np.asarray(arrays['row'])
+    else:
+        rows = np.repeat(np.arange(n), np.diff(np.asarray(arrays['indptr'])))
+    cols = np.asarray(arrays['col' if matrix['format'] == 'coo' else 'indices'])
+    np.add.at(dense, (rows, cols), np.asarray(arrays['data']))
+    return dense
+
+def to_matrix_arrays(body, encoding):
+    if encoding == 'binary':
+        return unpack_matrix(body)
+    matrix = json.loads(body)
+    arrays = {}
+    for key, value in list(matrix.items()):
+        if encoding == 'base64' and isinstance(value, dict):
+            arrays[key] = np.frombuffer(base64.b64decode(value['data']), dtype=value['dtype'])
+        elif key in ('row', 'col', 'indptr', 'indices', 'data', 'matrix'):
+            arrays[key] = np.asarray(value)
+        else:
+            continue
+        del matrix[key]
+    return matrix, arrays
+
+def test_to_matrix_formats_and_encodings_agree(monkeypatch):
+    offloaded = []
+    offload = app.run_in_threadpool
+    monkeypatch.setattr(app, 'run_in_threadpool', lambda fn, *args: offloaded.append(fn) or offload(fn, *args))
+    graph = {'nodes': [{'id': str(i)} for i in range(1, 5)],
+             'links': [{'source': '1', 'target': '2', 'weight': 3}, {'source': '3', 'target': '1', 'weight': 2.5},
+                       {'source': '4', 'target': '2', 'weight': 1}], 'isDirected': False}
+    expected = np.zeros((4, 4))
+    for link in graph['links']:
+        u, v = int(link['source']) - 1, int(link['target']) - 1
+        expected[u, v] = expected[v, u] = link['weight']
+
+    for encoding in ('json', 'base64', 'binary'):
+        for fmt in ('coo', 'csr'):
+            response = client.post('/toMatrix', json={**graph, 'format': fmt, 'encoding': encoding})
+            assert response.status_code == 200
+            matrix, arrays = to_matrix_arrays(response.content, encoding)
+            assert matrix['nodes'] == ['1', '2', '3', '4'] and matrix['shape'] == [4, 4]
+            assert np.array_equal(sparse_to_dense(matrix, arrays), expected), (fmt, encoding)
+        response = client.post('/toMatrix', json={**graph, 'encoding': encoding})
+        dense = response.json()['matrix'] if encoding == 'json' else to_matrix_arrays(response.content, encoding)[1]['matrix']
+        assert np.array_equal(np.asarray(dense).reshape(4, 4), expected > 0), encoding
+    assert offloaded == [app.matrix_response] * 9
+
+    bad = {**graph, 'links': [{'source': '1', 'target': '9', 'weight': 1}]}
+    assert client.post('/toMatrix', json={**bad, 'format': 'csr'}).status_code == 400
+
+def test_from_matrix_uploads_round_trip_to_matrix(monkeypatch):
+    offloaded = []
+    offload = app.run_in_threadpool
+    monkeypatch.setattr(app, 'run_in_threadpool', lambda fn, *args: offloaded.append(fn) or offload(fn, *args))
+    graph = {'nodes': [{'id': str(i)} for i in range(1, 6)],
+             'links': [{'source': '1', 'target': '2', 'weight': 3}, {'source': '2', 'target': '5', 'weight': 2},
+                       {'source': '5', 'target': '1', 'weight': 7}, {'source': '4', 'target': '3', 'weight': 1}],
+             'isDirected': True}
+    links = lambda answer: sorted((l['source'], l['target'], l['weight']) for l in answer['links'])
+    header, arrays = unpack_matrix(client.post('/toMatrix', json={**graph, 'format': 'csr', 'encoding': 'binary'}).content)
+    weighted = sparse_to_dense(header, arrays)
+    dense = unpack_matrix(client.post('/toMatrix', json={**graph, 'encoding': 'binary'}).content)[1]['matrix']
+
+    expected = client.post('/fromMatrix', json={'typeFrom': 'matrix', 'data': weighted.astype(int).tolist(), 'isDirected': True})
+    assert expected.status_code == 200
+    assert links(expected.json()) == sorted((l['source'], l['target'], l['weight']) for l in graph['links'])
+
+    npy = io.BytesIO()
+    np.save(npy, weighted.astype(np.int32))
+    uploads = [({'encoding': 'npy'}, npy.getvalue(), expected.json()),
+               ({'encoding': 'raw', 'dtype': '<f8'}, weighted.tobytes(), expected.json()),
+               ({'encoding': 'bits', 'n': '5'}, np.packbits(dense.ravel()).tobytes(), None)]
+    for fields, data, answer in uploads:
+        response = client.post('/fromMatrix', files={'file': ('m.bin', data)}, data={**fields, 'isDirected': 'true'})
+        assert response.status_code == 200, fields
+        if answer is None:  # 0/1 cells: the same links with weight 1
+            assert links(response.json()) == [(u, v, 1) for u, v, _ in links(expected.json())]
+        else:
+            assert links(response.json()) == links(answer), fields
+
+    assert client.post('/fromMatrix', json={'typeFrom': 'matrix', 'data': [[0, 1]], 'isDirected': True}).status_code == 400
+    assert client.post('/fromMatrix', content=b'{', headers={'content-type': 'application/json'}).status_code == 400
+    assert app.from_adjacency_matrix in offloaded
+
+def test_result_cache_evicts_least_recently_used_by_bytes():
+    cache = app.ResultCache(10)
+    cache.put('a', b'1234')
+    cache.put('b', b'5678')
+    assert cache.get('a') == b'1234'  # b is now the least recently used
+    cache.put('c', b'90ab')
+    assert cache.get('b') is None and cache.get('a') == b'1234' and cache.get('c') == b'90ab'
+    cache.put('a', b'123')  # replacing an entry counts only the new body
+    cache.put('big', b'x' * 11)  # larger than the whole cache: never stored
+    assert cache.get('big') is None
+    assert cache.stats() == {'entries': 2, 'bytes': 7, 'maxBytes': 10, 'hits': 3, 'misses': 2, 'evictions': 1,
+                             'hitRate': 3 / 5}
+
+def test_algorithm_responses_are_cached_per_request(monkeypatch):
+    monkeypatch.setattr(app, 'result_cache', app.ResultCache(1 << 20))
+    request = {'graph': GRAPH, 'startId': '1', 'trace': 'full'}
+    first = client.post('/bfs', json=request)
+    assert first.headers['x-cache'] == 'MISS'
+    # Transport options do not change the answer
+    again = client.post('/bfs', json={**request, 'timeoutMs': 5000})
+    assert again.headers['x-cache'] == 'HIT' and again.content == first.content
+    assert client.post('/bfs', json={**request, 'trace': 'none'}).headers['x-cache'] == 'MISS'
+    moved = {**GRAPH, 'links': [{'source': '2', 'target': '1', 'weight': 1}]}
+    assert client.post('/bfs', json={**request, 'graph': moved}).headers['x-cache'] == 'MISS'
+    stats = client.get('/cache/stats').json()
+    assert (stats['entries'], stats['hits'], stats['misses']) == (3, 1, 3)
+
+@pytest.mark.parametrize('scheduler', ['pool', 'cooperative'])
+def test_batch_answers_every_job_and_reports_errors_per_entry(monkeypatch, scheduler):
+    monkeypatch.setattr(app, 'SCHEDULER', scheduler)
+    jobs = [{'algorithm': 'bfs', 'startId': '1'},
+            {'algorithm': 'dijkstra', 'startId': '1', 'endId': '2', 'trace': 'none'},
+            {'algorithm': 'sorting'},
+            {'algorithm': 'dijkstra', 'startId': '1'},
+            {'algorithm': 'bfs', 'startId': '9'},
+            {'algorithm': 'dfs', 'startId': '1', 'logs': 'client', 'traceFormat': 'delta'}]
+    response = client.post('/batch', json={**GRAPH, 'jobs': jobs})
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert [entry['algorithm'] for entry in results] == [job['algorithm'] for job in jobs]
+    assert [entry['status'] for entry in results] == ['ok', 'ok', 'error', 'error', 'error', 'ok']
+    for job, entry in zip(jobs, results):
+        if entry['status'] == 'ok':
+            options = {key: value for key, value in job.items() if key != 'algorithm'}
+            alone = client.post(f"/{job['algorithm']}", json={'graph': GRAPH, **options}).json()
+            assert entry['result'] == alone, job
+            assert entry['stepCount'] == len(alone['steps'])
+        else:
+            assert entry['detail'] and entry['stepCount'] == 0, job
+    assert results[3]['detail'] == "Vui lòng chọn đỉnh kết thúc"
+
+def test_batch_rejects_a_graph_that_does_not_compile():
+    graph = {**GRAPH, 'links': [{'source': '1', 'target': '2'}]}  # no weight
+    assert client.post('/batch', json={**graph, 'jobs': [{'algorithm': 'bfs', 'startId': '1'}]}).status_code == 400
+    assert client.post('/batch', json={**GRAPH, 'jobs': []}).status_code == 422
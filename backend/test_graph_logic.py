@@ -0,0 +1,521 @@
+import random
+
+import pytest
+
+import graph_logic
+from graph_logic import (AlgorithmStep, CircuitView, GraphData, IndexedHeap, JournalView, ListView, RadixHeap, StepTrace,
+                         all_pairs_shortest_paths, compile_graph, decode_trace, graph_reader, iter_graph_export, render_log,
+                         result_to_dict,
+                         check_bipartite, run_astar, run_bellman_ford, run_bfs, run_boruvka, run_dfs, run_dijkstra, run_fleury,
+                         run_ford_fulkerson, run_hierholzer, run_kruskal, run_prim)
+
+def graph(links, directed=True):
+    ids = sorted({end for link in links for end in (link[0], link[1])})
+    return GraphData([{'id': i} for i in ids],
+                     [{'source': u, 'target': v, 'weight': w} for u, v, w in links], directed)
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_spfa_parallel_links_are_not_a_negative_cycle(directed):
+    g = graph([('1', '2', 2), ('1', '2', 1)], directed)
+    result = run_bellman_ford(g, '1', '2', mode='spfa', trace='none')
+    assert result.negativeCycle is None
+    assert result.distances == {'1': 0, '2': 1}
+    assert result.path == ['1', '2']
+
+def test_spfa_matches_rounds_on_random_multigraphs():
+    for seed in range(400):
+        rng = random.Random(seed)
+        n = rng.randint(2, 6)
+        links = [(str(rng.randrange(n)), str(rng.randrange(n)), rng.randint(-2, 6)) for _ in range(rng.randint(1, 12))]
+        g = graph(links + [('0', '0', 0)], rng.random() < 0.5)
+        rounds = run_bellman_ford(g, '0', mode='rounds', trace='none')
+        spfa = run_bellman_ford(g, '0', mode='spfa', trace='none')
+        assert (spfa.negativeCycle is None) == (rounds.negativeCycle is None), seed
+        if rounds.negativeCycle is None:
+            assert spfa.distances == rounds.distances, seed
+
+def test_spfa_reports_negative_cycle():
+    g = graph([('1', '2', 1), ('2', '3', -2), ('3', '2', 1)])
+    result = run_bellman_ford(g, '1', mode='spfa', trace='none')
+    assert result.negativeCycle is not None
+    assert result.negativeCycle[0] == result.negativeCycle[-1]
+    assert set(result.negativeCycle) == {'2', '3'}
+
+def test_johnson_matches_floyd_warshall_on_parallel_links():
+    g = graph([('1', '2', -1), ('1', '2', -2), ('1', '2', -3), ('2', '3', 1)])
+    johnson = all_pairs_shortest_paths(g, 'johnson')
+    assert johnson['distances'] == [0, -3, -2, None, 0, 1, None, None, 0]
+    assert johnson['distances'] == all_pairs_shortest_paths(g, 'floydWarshall')['distances']
+
+def test_johnson_matches_floyd_warshall_on_random_multigraphs():
+    for seed in range(200):
+        rng = random.Random(seed)
+        n = rng.randint(2, 6)
+        # Arcs only go from lower to higher ids, so negative weights never close a cycle
+        links = []
+        for _ in range(rng.randint(1, 12)):
+            u, v = sorted(rng.sample(range(n), 2))
+            links.append((str(u), str(v), rng.randint(-3, 6)))
+        g = graph(links)
+        expected = all_pairs_shortest_paths(g, 'floydWarshall')['distances']
+        assert all_pairs_shortest_paths(g, 'johnson')['distances'] == expected, seed
+
+def test_johnson_and_floyd_warshall_agree_on_negative_cycles():
+    for seed in range(300):
+        rng = random.Random(seed)
+        n = rng.randint(2, 6)
+        links = [(str(rng.randrange(n)), str(rng.randrange(n)), rng.randint(-3, 6)) for _ in range(rng.randint(1, 12))]
+        g = graph(links, rng.random() < 0.5)
+        answers = []
+        for method in ('floydWarshall', 'johnson'):
+            try:
+                answers.append(all_pairs_shortest_paths(g, method)['distances'])
+            except ValueError:
+                answers.append(None)
+        assert answers[0] == answers[1], seed
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_dimacs_export_round_trips_the_direction(directed):
+    g = graph([('1', '2', 3), ('2', '3', 4)], directed)
+    reader = graph_reader('dimacs')
+    for chunk in iter_graph_export(g, 'dimacs'):
+        reader.feed(chunk.encode('utf-8'))
+    imported = reader.close()
+    assert imported.isDirected == directed
+    assert [(l['source'], l['target'], l['weight']) for l in imported.links] == [('1', '2', 3), ('2', '3', 4)]
+
+def random_graph(seed, directed=None, euler=False):
+    rng = random.Random(seed)
+    n = rng.randint(2, 8)
+    if directed is None:
+        directed = rng.random() < 0.5
+    if euler:
+        # A closed walk over random vertices, so every degree is even (in = out when directed)
+        walk = [rng.randrange(n) for _ in range(rng.randint(2, 10))]
+        pairs = [(u, v) for u, v in zip(walk, walk[1:] + walk[:1]) if u != v]
+    else:
+        pairs = [(rng.randrange(n), rng.randrange(n)) for _ in range(rng.randint(1, 16))]
+    links = [{'source': str(u), 'target': str(v), 'weight': rng.randint(1, 9), 'capacity': rng.randint(1, 9)} for u, v in pairs]
+    return GraphData([{'id': str(i)} for i in range(n)], links, directed)
+
+TRACED_RUNS = {
+    'bfs': lambda g, trace: run_bfs(g, '0', trace=trace),
+    'dfs': lambda g, trace: run_dfs(g, '0', trace=trace),
+    'dijkstra': lambda g, trace: run_dijkstra(g, '0', '1', trace=trace),
+    'dijkstra.bidirectional': lambda g, trace: run_dijkstra(g, '0', '1', 'bidirectional', trace=trace),
+    'dijkstra.endIds': lambda g, trace: run_dijkstra(g, '0', trace=trace, end_ids='all'),
+    'astar': lambda g, trace: run_astar(g, '0', '1', trace=trace),
+    'bellmanFord': lambda g, trace: run_bellman_ford(g, '0', '1', trace=trace),
+    'bellmanFord.spfa': lambda g, trace: run_bellman_ford(g, '0', '1', 'spfa', trace=trace),
+    'prim': lambda g, trace: run_prim(g, trace=trace),
+    'kruskal': lambda g, trace: run_kruskal(g, trace=trace),
+    'boruvka': lambda g, trace: run_boruvka(g, trace=trace),
+    'fordFulkerson': lambda g, trace: run_ford_fulkerson(g, '0', '1', trace=trace),
+    'fordFulkerson.dinic': lambda g, trace: run_ford_fulkerson(g, '0', '1', 'dinic', trace=trace),
+    'bipartite': lambda g, trace: check_bipartite(g, trace=trace),
+    'bipartite.stream': lambda g, trace: check_bipartite(g, trace, 'stream'),
+}
+EULER_RUNS = {
+    'fleury': lambda g, trace: run_fleury(g, trace=trace),
+    'fleury.fast': lambda g, trace: run_fleury(g, 'fast', trace=trace),
+    'hierholzer': lambda g, trace: run_hierholzer(g, trace=trace),
+}
+
+def traced_results(name, trace, seeds=range(60)):
+    run = TRACED_RUNS.get(name) or EULER_RUNS[name]
+    for seed in seeds:
+        g = random_graph(seed, euler=name in EULER_RUNS)
+        try:
+            yield seed, run(g, trace)
+        except ValueError:  # not Eulerian, missing node, ...
+            continue
+
+@pytest.mark.parametrize('trace', ['full', 'summary', 'none'])
+@pytest.mark.parametrize('name', [*TRACED_RUNS, *EULER_RUNS])
+def test_delta_trace_decodes_to_the_full_trace(name, trace):
+    for seed, result in traced_results(name, trace):
+        for logs in ('server', 'client'):
+            full = result_to_dict(result, logs)['steps']
+            for interval in (1, 3, 50):
+                delta = result_to_dict(result, logs, 'delta', interval)['steps']
+                assert decode_trace(delta) == full, (seed, logs, interval)
+
+@pytest.mark.parametrize('name', [*TRACED_RUNS, *EULER_RUNS])
+def test_trace_levels_agree_with_the_full_trace(name):
+    full_runs = dict(traced_results(name, 'full'))
+    for trace in ('summary', 'none'):
+        for seed, result in traced_results(name, trace):
+            full = full_runs[seed]
+            answer = {k: v for k, v in result_to_dict(result).items() if k != 'steps'}
+            assert answer == {k: v for k, v in result_to_dict(full).items() if k != 'steps'}, seed
+            if trace == 'none':
+                assert len(result.steps) == 0
+            else:
+                decoded = decode_trace(result_to_dict(result, 'none', 'delta', 3)['steps'])
+                assert decoded == result_to_dict(result, 'none')['steps'], seed
+
+def test_bfs_summary_levels_are_states_of_the_full_trace():
+    for seed in range(150):
+        g = random_graph(seed)
+        full = result_to_dict(run_bfs(g, '0'), 'none')['steps']
+        summary = decode_trace(result_to_dict(run_bfs(g, '0', trace='summary'), 'none', 'delta', 50)['steps'])
+        visited_prefixes = [state.get('visited') for state in full]
+        for state in summary[1:]:
+            assert state['visited'] in visited_prefixes, seed
+        # Between levels the queue starts at the first vertex of the next level
+        for state in summary[1:-1]:
+            assert state['queue'][0] not in state['visited'], seed
+        assert summary[-1]['visited'] == run_bfs(g, '0', trace='none').visited
+
+@pytest.mark.parametrize('text', [b'p sp 2000000000 0\n', b'p sp -1 0\n', b'p sp 2.5 0\n'])
+def test_dimacs_rejects_vertex_counts_out_of_range(text):
+    reader = graph_reader('dimacs')
+    with pytest.raises(ValueError):
+        reader.feed(text)
+
+@pytest.mark.parametrize('element', [b'<node/>', b'<edge source="a"/>', b'<edge target="a"/>'])
+def test_graphml_rejects_elements_without_ids(element):
+    reader = graph_reader('graphml')
+    with pytest.raises(ValueError):
+        reader.feed(b'<graphml><graph edgedefault="directed"><node id="a"/>' + element + b'</graph></graphml>')
+        reader.close()
+
+def expected_arcs(g, node_id, outgoing):
+    # (link index, other end, weight) of every arc at node_id, in link order
+    arcs = []
+    for e, link in enumerate(g.links):
+        tail, head = (link['source'], link['target']) if outgoing else (link['target'], link['source'])
+        if tail == node_id:
+            arcs.append((e, head, link['weight']))
+        if not g.isDirected and head == node_id:
+            arcs.append((e, tail, link['weight']))
+    return arcs
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_compiled_graph_arcs_follow_the_links(directed):
+    for seed in range(50):
+        g = random_graph(seed, directed)
+        cg = compile_graph(g)
+        assert compile_graph(g) is cg
+        assert cg.ids == [node['id'] for node in g.nodes] and cg.m == len(g.links)
+        for u, node_id in enumerate(cg.ids):
+            out_arcs = range(cg.out_offsets[u], cg.out_offsets[u + 1])
+            assert [(cg.out_edges[a], cg.ids[cg.out_targets[a]], cg.out_weights[a]) for a in out_arcs] == \
+                expected_arcs(g, node_id, True), seed
+            in_arcs = range(cg.in_offsets[u], cg.in_offsets[u + 1])
+            assert [(cg.in_edges[a], cg.ids[cg.in_sources[a]], cg.in_weights[a]) for a in in_arcs] == \
+                expected_arcs(g, node_id, False), seed
+
+def test_compiled_graph_interns_link_ends_missing_from_nodes():
+    cg = compile_graph(GraphData([{'id': 'a', 'label': 'A'}], [{'source': 'a', 'target': 'b', 'weight': 2}], True))
+    assert cg.ids == ['a', 'b'] and cg.labels == ['A', 'b']
+    assert cg.node_index('b') == 1
+    with pytest.raises(ValueError):
+        cg.node_index('c')
+
+LABELED = GraphData([{'id': '1', 'label': 'A'}, {'id': '2', 'label': 'B'}, {'id': '3', 'label': 'C'}, {'id': '4', 'label': 'D'}],
+                    [{'source': '1', 'target': '2', 'weight': 4}, {'source': '1', 'target': '3', 'weight': 1},
+                     {'source': '3', 'target': '2', 'weight': 2}, {'source': '2', 'target': '4', 'weight': 5}], False)
+
+# Text the algorithms wrote directly before logs became event codes
+OLD_LOGS = {
+    'bfs': (lambda g: run_bfs(g, '1'), ['Thăm A', 'Thăm B', 'Thăm C', 'Thăm D'],
+            ['Bắt đầu BFS từ A', 'Thăm A', 'Thêm B vào hàng đợi', 'Thêm C vào hàng đợi', 'Thăm B',
+             'Thêm C vào hàng đợi', 'Thêm D vào hàng đợi', 'Thăm C', 'Thăm D']),
+    'dijkstra': (lambda g: run_dijkstra(g, '1', '4'), ['Thăm A: 0', 'Thăm C: 1', 'Thăm B: 3', 'Thăm D: 8'],
+                 ['Bắt đầu Dijkstra từ A', 'Thăm A với khoảng cách 0', 'Cập nhật khoảng cách đến B: 4',
+                  'Cập nhật khoảng cách đến C: 1', 'Thăm C với khoảng cách 1', 'Cập nhật khoảng cách đến B: 3',
+                  'Thăm B với khoảng cách 3', 'Cập nhật khoảng cách đến D: 8', 'Thăm D với khoảng cách 8']),
+    'kruskal': (run_kruskal, ['Thêm A - C (1)', 'Thêm C - B (2)', 'Thêm B - D (5)'],
+                ['Bắt đầu Kruskal', 'Thêm cạnh A - C (1)', 'Thêm cạnh C - B (2)', 'Thêm cạnh B - D (5)']),
+    'bipartite': (check_bipartite, ['Không phải đồ thị hai phía'], ['Thăm A với màu 0', 'Thăm B với màu 1']),
+}
+
+@pytest.mark.parametrize('name', OLD_LOGS)
+def test_rendered_logs_match_the_old_text(name):
+    run, logs, step_logs = OLD_LOGS[name]
+    result = run(LABELED)
+    server = result_to_dict(result)
+    assert server['logs'] == logs
+    assert [step['log'] for step in server['steps']] == step_logs
+    # 'client' sends codes, plain arguments and the label table, which render to the same text
+    client = result_to_dict(result, 'client')
+    assert [render_log(event, args, client['labels']) for event, args in client['logs']] == logs
+    assert [render_log(step['event'], step['args'], client['labels']) for step in client['steps']] == step_logs
+
+@pytest.mark.parametrize('mode', ['edmondsKarp', 'dinic'])
+def test_max_flow_is_feasible_and_equals_its_min_cut(mode):
+    for seed in range(150):
+        g = random_graph(seed, directed=True)
+        result = run_ford_fulkerson(g, '0', '1', mode, trace='none')
+        assert result.maxFlow == run_ford_fulkerson(g, '0', '1', 'edmondsKarp', trace='none').maxFlow, seed
+        capacity, balance = {}, {node['id']: 0 for node in g.nodes}
+        for link in g.links:
+            if link['source'] != link['target']:
+                pair = (link['source'], link['target'])
+                capacity[pair] = capacity.get(pair, 0) + link['capacity']
+        for pair, flow in result.flowDetails.items():
+            u, v = pair.split('-')
+            # Net flow u -> v is bounded by the capacity from u to v
+            assert 0 < flow <= capacity.get((u, v), 0), seed
+            balance[u] -= flow
+            balance[v] += flow
+        assert balance.pop('0') == -result.maxFlow and balance.pop('1') == result.maxFlow, seed
+        assert not any(balance.values()), seed
+        # A feasible flow as large as a cut is a maximum flow
+        cut = result.minCut
+        assert '0' in cut['sourceSide'] and '1' in cut['sinkSide'], seed
+        crossing = [l for l in g.links if l['source'] in cut['sourceSide'] and l['target'] in cut['sinkSide']]
+        assert cut['links'] == crossing, seed
+        assert cut['capacity'] == sum(l['capacity'] for l in cut['links']) == result.maxFlow, seed
+
+def euler_graph(seed, directed):
+    # The runs start from the first node, so leave out nodes the walk never reached
+    g = random_graph(seed, directed, euler=True)
+    ends = {end for link in g.links for end in (link['source'], link['target'])}
+    return GraphData([node for node in g.nodes if node['id'] in ends], g.links, directed)
+
+def uses_every_link_once(g, path):
+    remaining = [(l['source'], l['target']) for l in g.links]
+    for u, v in zip(path, path[1:]):
+        if (u, v) in remaining:
+            remaining.remove((u, v))
+        elif not g.isDirected and (v, u) in remaining:
+            remaining.remove((v, u))
+        else:
+            return False
+    return not remaining
+
+def closed_walks_over_every_link(run, directed):
+    checked = 0
+    for seed in range(100):
+        g = euler_graph(seed, directed)
+        if not g.links:
+            continue
+        path = run(g, 'none').eulerPath
+        assert path[0] == path[-1] and uses_every_link_once(g, path), seed
+        checked += 1
+    return checked
+
+@pytest.mark.parametrize('mode', ['classic', 'fast'])
+def test_fleury_circuit_uses_every_link_once(mode):
+    assert closed_walks_over_every_link(lambda g, trace: run_fleury(g, mode, trace=trace), False) > 50
+
+@pytest.mark.parametrize('mode', ['classic', 'fast'])
+def test_fleury_path_runs_between_the_odd_vertices(mode):
+    for seed in range(100):
+        g = euler_graph(seed, False)
+        if not g.links:
+            continue
+        # Dropping one link of the circuit leaves its two ends odd
+        dropped = g.links.pop(seed % len(g.links))
+        path = run_fleury(g, mode, trace='none').eulerPath
+        if g.links:
+            assert {path[0], path[-1]} == {dropped['source'], dropped['target']}, seed
+            assert uses_every_link_once(g, path), seed
+
+@pytest.mark.parametrize('directed', [False, True])
+def test_hierholzer_circuit_uses_every_link_once(directed):
+    assert closed_walks_over_every_link(run_hierholzer, directed) > 50
+
+def test_hierholzer_rejects_unbalanced_directed_graphs():
+    with pytest.raises(ValueError):
+        run_hierholzer(graph([('0', '1', 1), ('1', '2', 1), ('2', '0', 1), ('0', '2', 1)]))
+
+def path_weight(g, path):
+    total = 0
+    for u, v in zip(path, path[1:]):
+        total += min(l['weight'] for l in g.links if (l['source'], l['target']) == (u, v)
+                     or (not g.isDirected and (l['source'], l['target']) == (v, u)))
+    return total
+
+def test_astar_and_bidirectional_dijkstra_match_dijkstra():
+    for seed in range(200):
+        g = random_graph(seed)
+        rng = random.Random(seed)
+        if seed % 2:  # with coordinates A* has a heuristic; without it is plain Dijkstra
+            for node in g.nodes:
+                node['x'], node['y'] = rng.uniform(0, 100), rng.uniform(0, 100)
+        expected = run_dijkstra(g, '0', '1', trace='none')
+        for result in (run_astar(g, '0', '1', trace='none'), run_dijkstra(g, '0', '1', 'bidirectional', trace='none')):
+            assert result.distances['1'] == expected.distances['1'], seed
+            if expected.distances['1'] == float('inf'):
+                continue
+            assert result.path[0] == '0' and result.path[-1] == '1', seed
+            assert path_weight(g, result.path) == expected.distances['1'], seed
+
+def test_astar_settles_fewer_vertices_on_a_grid():
+    size = 12
+    nodes = [{'id': f'{x},{y}', 'x': x * 10, 'y': y * 10} for x in range(size) for y in range(size)]
+    links = [{'source': f'{x},{y}', 'target': f'{x + dx},{y + dy}', 'weight': 10}
+             for x in range(size) for y in range(size) for dx, dy in ((1, 0), (0, 1)) if x + dx < size and y + dy < size]
+    g = GraphData(nodes, links, False)
+    start, end = '0,5', f'{size - 1},5'
+    astar = run_astar(g, start, end, trace='none')
+    dijkstra = run_dijkstra(g, start, end, trace='none')
+    assert astar.distances[end] == dijkstra.distances[end] == (size - 1) * 10
+    assert astar.settledCount < dijkstra.settledCount / 2
+    assert run_dijkstra(g, start, end, 'bidirectional', trace='none').settledCount < dijkstra.settledCount
+
+def test_dijkstra_end_ids_answer_every_target_from_one_run():
+    for seed in range(150):
+        g = random_graph(seed)
+        ids = [node['id'] for node in g.nodes]
+        targets = random.Random(seed).sample(ids, k=min(3, len(ids)))
+        some = run_dijkstra(g, '0', trace='none', end_ids=targets)
+        every = run_dijkstra(g, '0', trace='none', end_ids='all')
+        assert set(some.paths) == set(targets) and set(every.paths) == set(ids), seed
+        # Stops once the last target is settled
+        assert some.settledCount <= every.settledCount, seed
+        for target in ids:
+            single = run_dijkstra(g, '0', target, trace='none')
+            path = every.paths[target]
+            if single.distances[target] == float('inf'):
+                assert path is None, seed
+                continue
+            assert path[0] == '0' and path[-1] == target and path_weight(g, path) == single.distances[target], seed
+            if target in targets:
+                assert some.paths[target] == path, seed
+
+def components(g):
+    parent = {node['id']: node['id'] for node in g.nodes}
+    def find(x):
+        while parent[x] != x:
+            x = parent[x]
+        return x
+    for link in g.links:
+        parent[find(link['source'])] = find(link['target'])
+    return len({find(x) for x in parent})
+
+@pytest.mark.parametrize('size', ['small', 'large'])
+def test_boruvka_total_matches_kruskal_and_prim(size):
+    for seed in range(100 if size == 'small' else 10):
+        if size == 'small':
+            g = random_graph(seed, directed=False)
+        else:  # ties and a float weight or two, on a graph big enough for several rounds
+            rng = random.Random(seed)
+            n = 300
+            links = [{'source': str(rng.randrange(n)), 'target': str(rng.randrange(n)), 'weight': rng.choice([1, 2, 3, 2.5])}
+                     for _ in range(900)]
+            g = GraphData([{'id': str(i)} for i in range(n)], links, False)
+        boruvka = run_boruvka(g, trace='none')
+        kruskal = run_kruskal(g, trace='none')
+        total = sum(link['weight'] for link in boruvka.mstLinks)
+        assert total == sum(link['weight'] for link in kruskal.mstLinks), seed
+        assert len(boruvka.mstLinks) == len(g.nodes) - components(g), seed
+        assert components(GraphData(g.nodes, boruvka.mstLinks, False)) == components(g), seed
+        if components(g) == 1:
+            assert total == sum(link['weight'] for link in run_prim(g, trace='none').mstLinks), seed
+
+@pytest.mark.parametrize('heap_type', [IndexedHeap, RadixHeap])
+def test_heaps_pop_in_key_order_after_decrease_key(heap_type):
+    for seed in range(100):
+        rng = random.Random(seed)
+        n = rng.randint(1, 30)
+        heap, queued, last = heap_type(n), {}, 0
+        for _ in range(200):
+            v = rng.randrange(n)
+            if queued and rng.random() < 0.3:
+                popped, key = heap.pop()
+                # Smallest key first; equal keys in any order
+                assert queued.pop(popped) == key == min([key, *queued.values()]), seed
+                last = key
+                continue
+            key = last + rng.randint(0, 20)  # RadixHeap keys never drop below the last pop
+            improves = v not in queued or key < queued[v]
+            assert heap.push(v, key) == improves, seed
+            if improves:
+                queued[v] = key
+            assert len(heap) == len(queued) and all((u in heap) == (u in queued) for u in range(n)), seed
+        while queued:
+            popped, key = heap.pop()
+            assert queued.pop(popped) == key == min([key, *queued.values()]), seed
+
+def test_indexed_heap_decrease_key_moves_a_vertex_up():
+    heap = IndexedHeap(4)
+    for v, key in ((0, 5), (1, 3), (2, 8), (3, 4)):
+        heap.push(v, key)
+    assert heap.push(2, 1) and not heap.push(0, 6)
+    assert len(heap) == 4 and heap.items()[0] == (2, 1)
+    assert [heap.pop() for _ in range(4)] == [(2, 1), (1, 3), (3, 4), (0, 5)]
+    assert all(pos == -1 for pos in heap.pos)
+
+def test_radix_heap_dijkstra_matches_the_binary_heap():
+    for seed in range(100):
+        g = random_graph(seed)
+        binary = run_dijkstra(g, '0', '1', trace='none')
+        radix = run_dijkstra(g, '0', '1', trace='none', heap='radix')
+        assert radix.distances == binary.distances, seed
+        if binary.distances['1'] != float('inf'):
+            assert path_weight(g, radix.path) == binary.distances['1'], seed
+
+def test_bipartite_stream_mode_agrees_with_bfs():
+    # Stream mode reads links as undirected; BFS mode follows arcs, so compare on undirected graphs
+    for seed in range(200):
+        g = random_graph(seed, directed=False)
+        bfs = check_bipartite(g, 'none')
+        stream = check_bipartite(g, 'none', 'stream')
+        assert stream.isBipartite == bfs.isBipartite, seed
+        assert stream.componentCount == components(g), seed
+        sets = stream.bipartiteSets
+        if stream.isBipartite:
+            assert stream.conflictEdge is None, seed
+            assert sorted(sets['setA'] + sets['setB']) == sorted(node['id'] for node in g.nodes), seed
+            side = {**{v: 'A' for v in sets['setA']}, **{v: 'B' for v in sets['setB']}}
+            assert all(side[l['source']] != side[l['target']] for l in g.links), seed
+            assert all(sorted(sets[key]) == sorted(bfs.bipartiteSets[key]) for key in ('setA', 'setB')), seed
+        else:
+            # The first link whose prefix of the edge list stops being bipartite
+            first = next(link for k, link in enumerate(g.links)
+                         if not check_bipartite(GraphData(g.nodes, g.links[:k + 1], False), 'none').isBipartite)
+            assert stream.conflictEdge == {'source': first['source'], 'target': first['target']}, seed
+
+def step_shape(value):
+    # What a step holds: views by the object they show and their bounds, everything else by type and value
+    if isinstance(value, AlgorithmStep):
+        return value.event, step_shape(list(value.args)), step_shape(value.fields)
+    if isinstance(value, ListView):
+        return 'L', id(value.items), value.start, value.stop
+    if isinstance(value, JournalView):
+        return 'J', id(value.journal), value.count
+    if isinstance(value, CircuitView):
+        return 'C', id(value.circuit), value.merges, id(value.names)
+    if isinstance(value, dict):
+        return {key: step_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value), [step_shape(item) for item in value]
+    return type(value), value
+
+def test_step_trace_iterates_to_the_steps_appended():
+    items = ['a', 'b', 'c']
+    steps = [AlgorithmStep('x', 1, 'a', 2 ** 40, -2 ** 31, 1.5, None, True, [1, 2], (3,)),
+             AlgorithmStep('x', 2, 'b', -2 ** 45, 0, float('inf'), None, False, [], ()),
+             AlgorithmStep('y', queue=ListView(items, 1), distances={'a': 0, 'b': float('inf')},
+                           big={str(i): i for i in range(100)}, visited=items, current='c')]
+    trace = StepTrace(steps)
+    assert len(trace) == 3
+    assert [step_shape(step) for step in trace] == [step_shape(step) for step in steps]
+    assert trace.strings == ['a', 'b', 'c'] and len(trace.layouts) == 2
+
+@pytest.mark.parametrize('name', [*TRACED_RUNS, *EULER_RUNS])
+def test_step_trace_of_every_run_decodes_to_its_steps(name, monkeypatch):
+    appended = []
+    collect = graph_logic.collect_steps
+
+    def tee(steps):
+        # Passes the run through, keeping a list of its steps as they were yielded
+        appended.clear()
+        while True:
+            try:
+                step = next(steps)
+            except StopIteration as stop:
+                return stop.value
+            if step is not None:
+                appended.append(step)
+            yield step
+
+    monkeypatch.setattr(graph_logic, 'collect_steps', lambda steps: collect(tee(steps)))
+    for trace in ('full', 'summary'):
+        for seed, result in traced_results(name, trace, range(30)):
+            assert isinstance(result.steps, StepTrace)
+            assert [step_shape(step) for step in result.steps] == [step_shape(step) for step in appended], (seed, trace)
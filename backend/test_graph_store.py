@@ -0,0 +1,32 @@
+import pytest
+
+from graph_store import GraphStore
+
+GRAPH = {'nodes': [{'id': 'a'}, {'id': 'b'}], 'links': [{'source': 'a', 'target': 'b', 'weight': 1}], 'isDirected': False}
+
+@pytest.fixture
+def store(tmp_path):
+    return GraphStore(str(tmp_path / 'graphs.db'), max_bodies=2)
+
+@pytest.mark.parametrize('graph', [
+    {'nodes': [{'label': 'a'}], 'links': []},
+    {'nodes': [{'id': 'a'}], 'links': [{'source': 'a'}]},
+    {'nodes': [{'id': 'a'}], 'links': [{'target': 'a'}]},
+])
+def test_save_rejects_nodes_and_links_without_ids(store, graph):
+    store.save('g', GRAPH)
+    with pytest.raises(ValueError):
+        store.save('g', graph)
+    # The failed write rolled back
+    etag, body = store.load('g')
+    assert etag == store.current_etag('g')
+    assert b'"id":"b"' in body
+
+def test_loaded_bodies_are_bounded_and_dropped_on_write(store):
+    for name in ('a', 'b', 'c'):
+        store.save(name, GRAPH)
+        store.load(name)
+    assert list(store._bodies) == ['b', 'c']
+    store.patch('c', {'addNodes': [{'id': 'd'}]})
+    assert list(store._bodies) == ['b']
+    assert b'"id":"d"' in store.load('c')[1]
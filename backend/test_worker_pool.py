@@ -0,0 +1,64 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app import run_all_pairs_job
+from worker_pool import DeadlineExceeded, ExecutionLayer, JobCancelled, Overloaded, cancellable
+
+def stubborn(seconds, release, cancel=None):
+    # Ignores cancel, like a job that never checks it
+    release.wait(seconds)
+    return 'done'
+
+def ticking(cancel=None):
+    def steps():
+        while True:
+            time.sleep(0.001)
+            yield None
+    for _ in cancellable(steps(), cancel):
+        pass
+
+def test_timed_out_thread_job_keeps_its_slot_until_it_stops():
+    async def scenario():
+        layer = ExecutionLayer(0, 1, 0)
+        release = threading.Event()
+        with pytest.raises(DeadlineExceeded):
+            await layer.run(stubborn, (5, release), timeout=0.05)
+        # The thread is still running, so the lane is still full
+        assert layer.stats()['thread']['active'] == 1
+        with pytest.raises(Overloaded):
+            await layer.run(stubborn, (0, release), timeout=1)
+        release.set()
+        for _ in range(100):
+            if not layer.stats()['thread']['active']:
+                break
+            await asyncio.sleep(0.01)
+        assert layer.stats()['thread']['active'] == 0
+        assert await layer.run(stubborn, (0, release), timeout=1) == 'done'
+        layer.shutdown()
+
+    asyncio.run(scenario())
+
+def test_cancellable_job_frees_its_slot_after_timeout():
+    async def scenario():
+        layer = ExecutionLayer(0, 1, 0)
+        with pytest.raises(DeadlineExceeded):
+            await layer.run(ticking, (), timeout=0.05)
+        for _ in range(100):
+            if not layer.stats()['thread']['active']:
+                break
+            await asyncio.sleep(0.01)
+        assert layer.stats()['thread']['active'] == 0
+        layer.shutdown()
+
+    asyncio.run(scenario())
+
+def test_all_pairs_job_stops_when_cancelled():
+    cancel = threading.Event()
+    cancel.set()
+    graph = {'nodes': [{'id': '1'}, {'id': '2'}], 'links': [{'source': '1', 'target': '2', 'weight': 1}], 'isDirected': True}
+    with pytest.raises(JobCancelled):
+        run_all_pairs_job(graph, 'dijkstra', cancel=cancel)
+    assert run_all_pairs_job(graph, 'dijkstra') == b'{"nodes":["1","2"],"n":2,"distances":[0,1,null,0],"method":"dijkstra"}'
@@ -0,0 +1,322 @@
+# Runs algorithm jobs off the event loop: worker processes for heavy runs, threads for light ones,
+# or time slices on the loop itself (SliceScheduler) where there is only one core
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Awaitable, Callable, Iterator, List, Optional, Tuple
+
+class Overloaded(Exception):
+    """Every slot of the lane is busy and its wait queue is full."""
+
+class DeadlineExceeded(Exception):
+    pass
+
+class ClientDisconnected(Exception):
+    pass
+
+class JobCancelled(Exception):
+    pass
+
+def cancellable(steps: Iterator, cancel: Optional[threading.Event]) -> Iterator:
+    """Wraps an iter_* generator so a thread-lane run stops at the next step once
+    cancel is set. Threads cannot be killed, so this is how they are cancelled;
+    the generator's return value is passed through."""
+    while True:
+        if cancel is not None and cancel.is_set():
+            steps.close()
+            raise JobCancelled()
+        try:
+            step = next(steps)
+        except StopIteration as stop:
+            return stop.value
+        yield step
+
+async def _watch(is_disconnected: Callable[[], Awaitable[bool]], interval: float = 0.25):
+    # Returns once the client has gone away
+    while not await is_disconnected():
+        await asyncio.sleep(interval)
+
+def _serve(conn):
+    # Worker process loop: (fn, args) in, (ok, result or exception) out
+    while True:
+        try:
+            fn, args = conn.recv()
+        except EOFError:
+            return
+        try:
+            reply = (True, fn(*args))
+        except Exception as e:
+            reply = (False, e)
+        try:
+            conn.send(reply)
+        except Exception as e:  # unpicklable result or exception
+            conn.send((False, RuntimeError(str(e))))
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    def call(self, fn, args) -> Tuple[bool, Any]:
+        self.conn.send((fn, args))
+        return self.conn.recv()
+
+    def kill(self):
+        # Does not wait for the process to exit; reap() does, off the event loop
+        self.process.kill()
+
+    def reap(self):
+        self.process.join()
+
+class _Lane:
+    def __init__(self, name: str, slots: int, queue_depth: int):
+        self.name = name
+        self.slots = slots
+        self.queue_depth = queue_depth
+        self.active = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created on first use so it belongs to the server's event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.slots)
+        return self._semaphore
+
+    def admit(self):
+        if self.active >= self.slots + self.queue_depth:
+            raise Overloaded(self.name)
+        self.active += 1
+
+    def settle(self, jobs: List[Future], _task=None):
+        """Gives back the admission taken by admit() once the run's task is done, or,
+        if the task handed a job to a thread (jobs), once that job has stopped. A
+        thread that ignores cancel keeps its slot after its caller has given up."""
+        if not jobs:
+            self.active -= 1
+            return
+        loop = asyncio.get_running_loop()
+        jobs[0].add_done_callback(lambda _: loop.call_soon_threadsafe(self._release_slot))
+
+    def _release_slot(self):
+        self.semaphore.release()
+        self.active -= 1
+
+class _ThreadLane(_Lane):
+    def __init__(self, slots: int, queue_depth: int):
+        super().__init__('thread', slots, queue_depth)
+        self.executor = ThreadPoolExecutor(max_workers=slots, thread_name_prefix='graph-job')
+
+    async def run(self, fn, args, cancel: threading.Event, jobs: List[Future]):
+        await self.semaphore.acquire()
+        try:
+            job = self.executor.submit(fn, *args, cancel=cancel)
+        except BaseException:
+            self.semaphore.release()
+            raise
+        # From here on the semaphore is released by settle(), when the thread is done
+        jobs.append(job)
+        return await asyncio.wrap_future(job)
+
+class _ProcessLane(_Lane):
+    """Fixed set of worker processes started on demand. A job that is cancelled or
+    runs past its deadline takes its worker down with it; the next job that needs
+    a worker starts a fresh one."""
+
+    def __init__(self, slots: int, queue_depth: int):
+        super().__init__('process', slots, queue_depth)
+        # spawn, not fork: the server process has running threads
+        self.context = multiprocessing.get_context('spawn')
+        self.idle: List[_Worker] = []
+        # One thread per running job waits on its worker's pipe
+        self.waiters = ThreadPoolExecutor(max_workers=slots, thread_name_prefix='graph-worker')
+
+    async def _worker(self) -> _Worker:
+        if self.idle:
+            return self.idle.pop()
+        starting = asyncio.get_running_loop().run_in_executor(self.waiters, _Worker, self.context)
+        try:
+            return await asyncio.shield(starting)
+        except asyncio.CancelledError:
+            # Keep the worker that is still starting for the next job
+            starting.add_done_callback(lambda f: None if f.exception() else self.idle.append(f.result()))
+            raise
+
+    async def run(self, fn, args, cancel: threading.Event, jobs: List[Future]):
+        await self.semaphore.acquire()
+        try:
+            worker = await self._worker()
+            job = self.waiters.submit(worker.call, fn, args)
+        except BaseException:
+            self.semaphore.release()
+            raise
+        # From here on the semaphore is released by settle(), when the waiter is done
+        jobs.append(job)
+        try:
+            ok, value = await asyncio.wrap_future(job)
+        except BaseException:
+            # Cancelled, timed out or the worker died: it cannot be trusted to be idle.
+            # Its waiter sees the pipe close and finishes, which frees the slot
+            worker.kill()
+            self.waiters.submit(worker.reap)
+            raise
+        self.idle.append(worker)
+        if not ok:
+            raise value
+        return value
+
+    def shutdown(self):
+        while self.idle:
+            worker = self.idle.pop()
+            worker.kill()
+            worker.reap()
+
+class ExecutionLayer:
+    """Bounded execution of blocking jobs for async endpoints.
+
+    Each lane runs at most `slots` jobs and queues at most `queue_depth` more;
+    anything beyond that raises Overloaded at once instead of waiting. A job is
+    fn(*args, cancel=None) for the process lane and fn(*args, cancel=event) for
+    the thread lane, and must be picklable (a module-level function) to be
+    heavy. With processes=0, heavy jobs run on the thread lane. A job holds its
+    slot until it has really stopped, so a thread that ignores cancel still
+    counts after a timeout.
+    """
+
+    def __init__(self, processes: int, threads: int, queue_depth: int):
+        self.threads = _ThreadLane(threads, queue_depth)
+        self.processes = _ProcessLane(processes, queue_depth) if processes > 0 else None
+
+    async def run(self, fn: Callable, args: tuple, heavy: bool = False, timeout: Optional[float] = None,
+                  is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None) -> Any:
+        """Result of fn(*args). Raises Overloaded, DeadlineExceeded once timeout
+        seconds (queueing included) have passed, or ClientDisconnected; in both
+        of the latter cases the job is cancelled."""
+        lane = self.processes if heavy and self.processes else self.threads
+        lane.admit()
+        cancel = threading.Event()
+        jobs: List[Future] = []
+        task = asyncio.ensure_future(lane.run(fn, args, cancel, jobs))
+        task.add_done_callback(partial(lane.settle, jobs))
+        waits = {task}
+        watcher = None
+        if is_disconnected is not None:
+            watcher = asyncio.ensure_future(_watch(is_disconnected))
+            waits.add(watcher)
+        try:
+            done, _ = await asyncio.wait(waits, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if task in done:
+                return task.result()
+            raise ClientDisconnected() if watcher in done else DeadlineExceeded(timeout)
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            if not task.done():
+                cancel.set()
+                task.cancel()
+
+    def stats(self):
+        lanes = [self.threads] + ([self.processes] if self.processes else [])
+        return {lane.name: {"slots": lane.slots, "queueDepth": lane.queue_depth, "active": lane.active} for lane in lanes}
+
+    def shutdown(self):
+        self.threads.executor.shutdown(wait=False, cancel_futures=True)
+        if self.processes:
+            self.processes.shutdown()
+
+class _SlicedRun:
+    __slots__ = ('steps', 'collected', 'budget', 'used', 'future')
+
+    def __init__(self, steps: Iterator, budget: float, future: asyncio.Future, collected):
+        self.steps = steps
+        self.collected = collected
+        self.budget = budget
+        self.used = 0.0
+        self.future = future
+
+class SliceScheduler:
+    """Cooperative alternative to the worker pool for single-core hosts.
+
+    Step generators (which also yield None ticks every so often, see
+    TICK_INTERVAL in graph_logic) are advanced round-robin on the event loop,
+    slice_s seconds at a time, and the loop serves other requests between
+    slices. Each run has a budget of slice time; when it is used up the run
+    stops and returns the steps it has produced so far.
+    """
+
+    def __init__(self, slice_s: float, max_runs: int):
+        self.slice_s = slice_s
+        self.max_runs = max_runs
+        self.ready: deque = deque()
+        self.runner: Optional[asyncio.Task] = None
+
+    async def run(self, steps: Iterator, budget: float,
+                  is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None, collected=None) -> Tuple[bool, Any, Any]:
+        """Drains steps like collect_steps into collected (anything with append,
+        a new list by default): (True, return value, collected), or (False, None,
+        collected) with the steps so far once the budget is spent. Raises
+        Overloaded, or ClientDisconnected after dropping the run."""
+        if len(self.ready) >= self.max_runs:
+            raise Overloaded('cooperative')
+        run = _SlicedRun(steps, budget, asyncio.get_running_loop().create_future(), [] if collected is None else collected)
+        self.ready.append(run)
+        if self.runner is None or self.runner.done():
+            self.runner = asyncio.ensure_future(self._loop())
+        waits = {run.future}
+        watcher = None
+        if is_disconnected is not None:
+            watcher = asyncio.ensure_future(_watch(is_disconnected))
+            waits.add(watcher)
+        try:
+            await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+            if not run.future.done():
+                raise ClientDisconnected()
+            return run.future.result()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            # The loop drops runs whose future is done
+            run.future.cancel()
+
+    async def _loop(self):
+        while self.ready:
+            run = self.ready.popleft()
+            if run.future.done():
+                run.steps.close()
+                continue
+            self._advance(run)
+            if not run.future.done():
+                self.ready.append(run)
+            await asyncio.sleep(0)
+
+    def _advance(self, run: _SlicedRun):
+        started = time.perf_counter()
+        stop_at = started + min(self.slice_s, run.budget - run.used)
+        collected, steps, clock = run.collected, run.steps, time.perf_counter
+        try:
+            while True:
+                step = next(steps)
+                if step is not None:
+                    collected.append(step)
+                if clock() >= stop_at:
+                    break
+        except StopIteration as stop:
+            run.future.set_result((True, stop.value, collected))
+            return
+        except Exception as e:
+            run.future.set_exception(e)
+            return
+        finally:
+            run.used += clock() - started
+        if run.used >= run.budget:
+            steps.close()
+            run.future.set_result((False, None, collected))
+
+    def stats(self):
+        return {"sliceMs": self.slice_s * 1000, "maxRuns": self.max_runs, "active": len(self.ready)}
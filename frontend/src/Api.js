@@ -2,8 +2,10 @@
 // Use environment variable or fallback to relative URL for production
 const BASE_URL = import.meta.env.VITE_API_URL || "";
 
-export async function saveGraph(graph) {
-  const res = await fetch(`${BASE_URL}/save`, {
+// Graphs are stored by name (default "default"); every save bumps the version.
+export async function saveGraph(graph, name) {
+  const query = name ? `?name=${encodeURIComponent(name)}` : "";
+  const res = await fetch(`${BASE_URL}/save${query}`, {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify(graph),
@@ -12,12 +14,34 @@ export async function saveGraph(graph) {
   return res.json();
 }
 
-export async function loadGraph() {
-  const res = await fetch(`${BASE_URL}/load`);
+// The browser cache revalidates with If-None-Match, so an unchanged graph costs a 304
+export async function loadGraph(name) {
+  const query = name ? `?name=${encodeURIComponent(name)}` : "";
+  const res = await fetch(`${BASE_URL}/load${query}`, { cache: "no-cache" });
   if (!res.ok) throw new Error(await res.text());
   return res.json();
 }
 
+export async function listGraphs() {
+  const res = await fetch(`${BASE_URL}/graphs`);
+  if (!res.ok) throw new Error(await res.text());
+  return res.json();
+}
+
+// delta: { addNodes, updateNodes, removeNodes, addLinks, updateLinks, removeLinks, isDirected }.
+// Pass the ETag from the last load/save as etag to fail with 412 if someone else saved since.
+export async function patchGraph(name, delta, etag) {
+  const headers = { "Content-Type": "application/json" };
+  if (etag) headers["If-Match"] = etag;
+  const res = await fetch(`${BASE_URL}/graphs/${encodeURIComponent(name)}`, {
+    method: "PATCH",
+    headers,
+    body: JSON.stringify(delta),
+  });
+  if (!res.ok) throw new Error(await res.text());
+  return { ...(await res.json()), etag: res.headers.get("ETag") };
+}
+
 async function post(endpoint, payload) {
   const res = await fetch(`${BASE_URL}${endpoint}`, {
     method: "POST",
@@ -30,19 +54,186 @@ async function post(endpoint, payload) {
 
 export const runBFS = (graph, startId) => post("/bfs", { graph, startId });
 export const runDFS = (graph, startId) => post("/dfs", { graph, startId });
-export const runDijkstra = (graph, startId, endId) => post("/dijkstra", { graph, startId, endId });
+export const runDijkstra = (graph, startId, endId, mode, heap) => post("/dijkstra", { graph, startId, endId, mode, heap });
+// endIds: array of target ids or "all"; the response maps each one to its path in paths
+export const runDijkstraMany = (graph, startId, endIds) => post("/dijkstra", { graph, startId, endIds });
+export const runAStar = (graph, startId, endId) => post("/astar", { graph, startId, endId });
 export const runBellmanFord = (graph, startId, endId) => post("/bellmanFord", { graph, startId, endId });
 export const runPrim = (graph) => post("/prim", graph);
 export const runKruskal = (graph) => post("/kruskal", graph);
+export const runBoruvka = (graph) => post("/boruvka", graph);
 export const runFordFulkerson = (graph, startId, endId) => post("/fordFulkerson", { graph, startId, endId });
 export const runFleury = (graph) => post("/fleury", graph);
 export const runHierholzer = (graph) => post("/hierholzer", graph);
-export const checkBipartite = (graph) => post("/bipartite", graph);
+export const checkBipartite = (graph, mode) => post("/bipartite", { ...graph, mode });
+// With binary = true, distances come back as a row-major Float64Array (Infinity where there is no path)
+export async function allPairsDistances(graph, method, binary = false) {
+  if (!binary) return post("/allPairs", { ...graph, method });
+  const res = await fetch(`${BASE_URL}/allPairs`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ ...graph, method, encoding: "binary" }),
+  });
+  if (!res.ok) throw new Error(await res.text());
+  return decodeMatrix(await res.arrayBuffer());
+}
+export const runBatch = (graph, jobs) => post("/batch", { ...graph, jobs });
 
 export const toAdjacencyMatrix = (graph) => post("/toMatrix", graph).then(r => r.matrix);
+
+// Weighted adjacency matrix as "coo" (row/col/data) or "csr" (indptr/indices/data).
+// With binary = true the server sends packed arrays, decoded by decodeMatrix.
+export async function toSparseMatrix(graph, format = "csr", binary = false) {
+  if (!binary) return post("/toMatrix", { ...graph, format });
+  const res = await fetch(`${BASE_URL}/toMatrix`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ ...graph, format, encoding: "binary" }),
+  });
+  if (!res.ok) throw new Error(await res.text());
+  return decodeMatrix(await res.arrayBuffer());
+}
+
+// Unpack pack_matrix output (app.py): uint32 header length, JSON header, aligned arrays.
+const MATRIX_TYPES = { "|u1": Uint8Array, "<i4": Int32Array, "<i8": BigInt64Array, "<f8": Float64Array };
+export function decodeMatrix(buffer) {
+  const headerLength = new DataView(buffer).getUint32(0, true);
+  const { arrays, ...matrix } = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength)));
+  for (const [name, { dtype, shape, offset }] of Object.entries(arrays)) {
+    const size = shape.reduce((a, b) => a * b, 1);
+    const values = new MATRIX_TYPES[dtype](buffer, offset, size);
+    // int64 indices are exact as doubles for any realistic graph
+    matrix[name] = dtype === "<i8" ? Float64Array.from(values, Number) : values;
+  }
+  return matrix;
+}
 export const toAdjacencyList = (graph) => post("/toAdjList", graph).then(r => r.adjList);
 export const toEdgeList = (graph) => post("/toEdgeList", graph).then(r => r.edgeList);
 
 export const fromAdjacencyMatrix = (matrix, isDirected, labels) => post("/fromMatrix", { typeFrom: "matrix", data: matrix, isDirected, labels });
+// Upload a binary matrix: options.encoding is "npy", "raw" (with options.dtype, e.g. "<i4")
+// or "bits" (np.packbits of the flattened 0/1 matrix, needs options.n)
+export async function fromMatrixFile(file, isDirected, options = {}) {
+  const form = new FormData();
+  form.append("file", file);
+  form.append("isDirected", String(isDirected));
+  for (const key of ["encoding", "dtype", "n"]) {
+    if (options[key] !== undefined) form.append(key, String(options[key]));
+  }
+  if (options.labels) form.append("labels", JSON.stringify(options.labels));
+  const res = await fetch(`${BASE_URL}/fromMatrix`, { method: "POST", body: form });
+  if (!res.ok) throw new Error(await res.text());
+  return res.json();
+}
 export const fromAdjacencyList = (adjList, isDirected) => post("/fromAdjList", { typeFrom: "adjList", data: adjList, isDirected });
-export const fromEdgeList = (edgeList, isDirected) => post("/fromEdgeList", { typeFrom: "edgeList", data: edgeList, isDirected });
\ No newline at end of file
+export const fromEdgeList = (edgeList, isDirected) => post("/fromEdgeList", { typeFrom: "edgeList", data: edgeList, isDirected });
+// Bulk import/export: format is "csv", "ndjson", "dimacs" or "graphml".
+// The file is sent as the raw body so the server can parse it while it uploads.
+export async function importGraph(file, format, isDirected) {
+  const query = isDirected === undefined ? "" : `?isDirected=${isDirected}`;
+  const res = await fetch(`${BASE_URL}/import/${format}${query}`, { method: "POST", body: file });
+  if (!res.ok) throw new Error(await res.text());
+  return res.json();
+}
+
+export async function exportGraph(graph, format) {
+  const res = await fetch(`${BASE_URL}/export/${format}`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(graph),
+  });
+  if (!res.ok) throw new Error(await res.text());
+  return res.blob();
+}
+
+// Render a log event from a response requested with logs: "client".
+// templates/labels come from the same response (logTemplates, labels).
+export function renderLog(event, args, templates, labels) {
+  const [template, kinds] = templates[event];
+  const values = args.map((arg, i) => {
+    switch (kinds[i]) {
+      case "n": return labels[arg];
+      case "p": return arg.map(v => labels[v]).join(" → ");
+      case "s": return arg.map(v => labels[v]).join(", ");
+      case "i": return Math.trunc(arg);
+      default: return arg;
+    }
+  });
+  return template.replace(/\{(\d+)\}/g, (_, i) => values[Number(i)]);
+}
+
+// Rebuild full step states from a response requested with traceFormat: "delta"
+// (mirrors decode_trace in graph_logic.py). Operations apply in a fixed order,
+// shift before append; a list whose window moved past its old end arrives as a
+// set instead, which applies last.
+const getPath = (state, path) => {
+  const [key, sub] = path.split(/\.(.*)/s);
+  return sub ? state[key][sub] : state[key];
+};
+const setPath = (state, path, value) => {
+  const [key, sub] = path.split(/\.(.*)/s);
+  if (sub) state[key] = { ...(state[key] || {}), [sub]: value };
+  else state[key] = value;
+};
+
+export function applyTraceDelta(state, record) {
+  if (record.keyframe) return record.state;
+  const next = { ...state };
+  for (const path of record.unset || []) {
+    const [key, sub] = path.split(/\.(.*)/s);
+    if (sub) {
+      const { [sub]: _removed, ...rest } = next[key];
+      next[key] = rest;
+    } else {
+      delete next[key];
+    }
+  }
+  for (const [path, n] of Object.entries(record.shift || {})) setPath(next, path, getPath(next, path).slice(n));
+  for (const [path, n] of Object.entries(record.truncate || {})) setPath(next, path, getPath(next, path).slice(0, n));
+  for (const [path, items] of Object.entries(record.append || {})) setPath(next, path, getPath(next, path).concat(items));
+  for (const [path, changes] of Object.entries(record.patch || {})) setPath(next, path, { ...getPath(next, path), ...changes });
+  for (const [path, value] of Object.entries(record.set || {})) setPath(next, path, value);
+  return next;
+}
+
+export function decodeTrace(records) {
+  const states = [];
+  let state = {};
+  for (const record of records) {
+    state = applyTraceDelta(state, record);
+    states.push(state);
+  }
+  return states;
+}
+
+// POST with stream: "ndjson" and call onStep for every step as it arrives.
+// Resolves with the final result fields (logs, stepCount, ...).
+export async function streamAlgorithm(endpoint, payload, onStep) {
+  const res = await fetch(`${BASE_URL}${endpoint}`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ ...payload, stream: "ndjson" }),
+  });
+  if (!res.ok) throw new Error(await res.text());
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = "";
+  let result = null;
+  const handle = (line) => {
+    if (!line) return;
+    const event = JSON.parse(line);
+    if (event.type === "step") onStep(event.data);
+    else if (event.type === "result") result = event.data;
+    else if (event.type === "error") throw new Error(event.data.detail);
+  };
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffered += decoder.decode(value, { stream: true });
+    const lines = buffered.split("\n");
+    buffered = lines.pop();
+    lines.forEach(handle);
+  }
+  handle(buffered);
+  return result;
+}